@@ -1,5 +1,6 @@
 from typing import Callable
 from django.http import HttpRequest, HttpResponse
+from django.utils.cache import patch_vary_headers
 
 
 class SimpleCORS:
@@ -12,7 +13,7 @@ class SimpleCORS:
         origin = request.headers.get("Origin")
         if origin:
             response["Access-Control-Allow-Origin"] = origin
-            response["Vary"] = "Origin"
+            patch_vary_headers(response, ["Origin"])
         else:
             response.setdefault("Access-Control-Allow-Origin", "*")
 
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Faculty, Organisation
+from .models import Faculty, GraphEdge, GraphFit, Organisation
 
 @admin.register(Faculty)
 class FacultyAdmin(admin.ModelAdmin):
@@ -12,3 +12,15 @@ class FacultyAdmin(admin.ModelAdmin):
 class OrganisationAdmin(admin.ModelAdmin):
     list_display = ("abbreviation", "name", "scope")
     search_fields = ("name", "abbreviation", "mission", "target_members")
+
+
+@admin.register(GraphEdge)
+class GraphEdgeAdmin(admin.ModelAdmin):
+    list_display = ("source_type", "source_id", "rank", "target_type", "target_id", "distance", "build_version")
+    list_filter = ("source_type", "target_type")
+
+
+@admin.register(GraphFit)
+class GraphFitAdmin(admin.ModelAdmin):
+    list_display = ("node_type", "build_version", "node_count", "incremental_updates", "dim", "updated_at")
+    exclude = ("pca_mean", "pca_components", "centroids")
@@ -0,0 +1,164 @@
+"""
+Bulk upsert of faculty / organisation records.
+
+Incoming rows (dicts of model field values) are diffed against one
+prefetched snapshot of the matching rows; then each batch is written in a
+single transaction: one bulk INSERT for new rows and one bulk UPDATE per
+distinct set of changed columns, so an unchanged embedding is never
+rewritten. save() and post_save don't run here, so derived columns
+(Faculty.clean_label) and the dataset versions are maintained explicitly.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Sequence, Tuple, Type
+
+from django.db import models, transaction
+
+from .fields import embeddings_equal
+from .labels import clean_faculty_label
+from .models import Faculty, Organisation
+from .signals import bump_for_fields
+
+# (field, value) that identifies the existing row for an incoming record
+Lookup = Tuple[str, Any]
+
+# SQLite limits host parameters per statement; stay well below it
+_LOOKUP_CHUNK = 500
+
+
+def faculty_lookup(row: Dict[str, Any]) -> Lookup:
+    return ("abbreviation", row.get("abbreviation", ""))
+
+
+def organisation_lookup(row: Dict[str, Any]) -> Lookup:
+    # Prefer abbreviation when present; else fall back to the name
+    if row.get("abbreviation"):
+        return ("abbreviation", row["abbreviation"])
+    return ("name", row.get("name", ""))
+
+
+@dataclass
+class BulkUpsertResult:
+    created: List[int] = field(default_factory=list)
+    updated: List[int] = field(default_factory=list)
+    unchanged: int = 0
+    # Created rows plus updated rows whose embedding changed
+    embedding_changed: List[int] = field(default_factory=list)
+    # Primary key of the row each input dict was written to, in input order
+    row_ids: List[int] = field(default_factory=list)
+    queries: int = 0
+
+    def summary(self) -> str:
+        return f"Created: {len(self.created)}, Updated: {len(self.updated)}, Unchanged: {self.unchanged}"
+
+
+def _snapshot(model: Type[models.Model], lookups: Iterable[Lookup]) -> Tuple[Dict[Lookup, models.Model], int]:
+    # Existing rows for the incoming keys; if several share a key, the oldest one is used
+    by_field: Dict[str, List[Any]] = {}
+    for name, value in set(lookups):
+        by_field.setdefault(name, []).append(value)
+    found: Dict[Lookup, models.Model] = {}
+    queries = 0
+    for name, values in by_field.items():
+        for start in range(0, len(values), _LOOKUP_CHUNK):
+            chunk = values[start : start + _LOOKUP_CHUNK]
+            queries += 1
+            for obj in model.objects.filter(**{f"{name}__in": chunk}).order_by("-pk"):
+                found[(name, getattr(obj, name))] = obj
+    return found, queries
+
+
+def _differs(name: str, current: Any, value: Any) -> bool:
+    if name == "embedding":
+        return not embeddings_equal(current, value)
+    return current != value
+
+
+def _derive(obj: models.Model, changed: set) -> None:
+    # Columns Model.save() would have maintained
+    if isinstance(obj, Faculty) and ("name" in changed or not obj.pk):
+        label = clean_faculty_label(obj.name)
+        if obj.clean_label != label:
+            obj.clean_label = label
+            changed.add("clean_label")
+
+
+def bulk_upsert(
+    model: Type[models.Model],
+    rows: Sequence[Dict[str, Any]],
+    lookup: Callable[[Dict[str, Any]], Lookup],
+    batch_size: int = 500,
+) -> BulkUpsertResult:
+    """
+    Create or update one model row per incoming dict, touching only the
+    columns that changed. A later row with the same key overrides an
+    earlier one.
+    """
+    result = BulkUpsertResult()
+    existing, result.queries = _snapshot(model, (lookup(row) for row in rows))
+    written_fields: set = set()
+    seen: set = set()
+    row_objs: List[models.Model] = []
+
+    for start in range(0, len(rows), batch_size):
+        new_objs: List[models.Model] = []
+        changes: Dict[int, Tuple[models.Model, set]] = {}
+        for row in rows[start : start + batch_size]:
+            key = lookup(row)
+            obj = existing.get(key)
+            if obj is None:
+                obj = model(**row)
+                _derive(obj, set())
+                new_objs.append(obj)
+                existing[key] = obj
+                row_objs.append(obj)
+                continue
+            row_objs.append(obj)
+            changed = {name for name, value in row.items() if _differs(name, getattr(obj, name), value)}
+            for name in changed:
+                setattr(obj, name, row[name])
+            _derive(obj, changed)
+            if obj.pk is None:
+                # Repeated key within this batch: the pending INSERT picks up the values
+                continue
+            seen.add(obj.pk)
+            if changed:
+                changes.setdefault(obj.pk, (obj, set()))[1].update(changed)
+
+        groups: Dict[FrozenSet[str], List[models.Model]] = {}
+        for obj, changed in changes.values():
+            groups.setdefault(frozenset(changed), []).append(obj)
+        if not new_objs and not groups:
+            continue
+        with transaction.atomic():
+            if new_objs:
+                model.objects.bulk_create(new_objs, batch_size=batch_size)
+                result.queries += 1
+            for fields, objs in groups.items():
+                model.objects.bulk_update(objs, sorted(fields), batch_size=batch_size)
+                result.queries += 1
+
+        for obj in new_objs:
+            result.created.append(obj.pk)
+            result.embedding_changed.append(obj.pk)
+        for obj, changed in changes.values():
+            if obj.pk not in result.updated:
+                result.updated.append(obj.pk)
+            if "embedding" in changed and obj.pk not in result.embedding_changed:
+                result.embedding_changed.append(obj.pk)
+            written_fields |= changed
+
+    result.unchanged = len(seen - set(result.updated))
+    result.row_ids = [obj.pk for obj in row_objs]
+    if result.created:
+        bump_for_fields(None)
+    elif written_fields:
+        bump_for_fields(written_fields)
+    return result
+
+
+def bulk_upsert_faculties(rows: Sequence[Dict[str, Any]], batch_size: int = 500) -> BulkUpsertResult:
+    return bulk_upsert(Faculty, rows, faculty_lookup, batch_size)
+
+
+def bulk_upsert_organisations(rows: Sequence[Dict[str, Any]], batch_size: int = 500) -> BulkUpsertResult:
+    return bulk_upsert(Organisation, rows, organisation_lookup, batch_size)
@@ -0,0 +1,87 @@
+from typing import Iterable, List, Tuple
+
+from django.db import transaction
+from django.db.models import Case, CharField, Min, OuterRef, QuerySet, Subquery, Value, When
+
+from .models import Faculty, GraphEdge, Organisation
+
+FACULTY = GraphEdge.FACULTY
+ORGANISATION = GraphEdge.ORGANISATION
+
+
+def replace_edges(source_type: str, edges: Iterable[GraphEdge], build_version: int) -> int:
+    """
+    Replace every edge leaving nodes of `source_type` with `edges` in one
+    transaction (one DELETE plus batched bulk INSERTs). Returns the row count.
+    """
+    rows: List[GraphEdge] = []
+    for edge in edges:
+        edge.source_type = source_type
+        edge.build_version = build_version
+        rows.append(edge)
+    with transaction.atomic():
+        GraphEdge.objects.filter(source_type=source_type).delete()
+        GraphEdge.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def delete_node_edges(node_type: str, node_id: int) -> None:
+    GraphEdge.objects.filter(source_type=node_type, source_id=node_id).delete()
+    GraphEdge.objects.filter(target_type=node_type, target_id=node_id).delete()
+
+
+def _label_of(type_field: str, id_field: str) -> Case:
+    # Graph label of an endpoint: faculty clean_label or organisation name (PK lookups)
+    return Case(
+        When(**{type_field: FACULTY}, then=Subquery(
+            Faculty.objects.filter(pk=OuterRef(id_field)).values("clean_label")[:1]
+        )),
+        When(**{type_field: ORGANISATION}, then=Subquery(
+            Organisation.objects.filter(pk=OuterRef(id_field)).values("name")[:1]
+        )),
+        default=Value(""),
+        output_field=CharField(),
+    )
+
+
+def labelled(queryset: QuerySet) -> QuerySet:
+    """
+    Annotate edges with source_label / target_label.
+    """
+    return queryset.annotate(
+        source_label=_label_of("source_type", "source_id"),
+        target_label=_label_of("target_type", "target_id"),
+    )
+
+
+def outgoing(source_type: str, source_ids: Iterable[int]) -> List[Tuple[int, str, int, str, float]]:
+    """
+    Edges leaving the given nodes, ordered by source then rank, as
+    (source_id, target_type, target_id, target_label, distance).
+    """
+    ids = list(source_ids)
+    if not ids:
+        return []
+    qs = labelled(GraphEdge.objects.filter(source_type=source_type, source_id__in=ids))
+    return list(
+        qs.order_by("source_id", "rank").values_list(
+            "source_id", "target_type", "target_id", "target_label", "distance"
+        )
+    )
+
+
+def incoming_min_distance(source_type: str, target_type: str, target_ids: Iterable[int]) -> List[Tuple[int, float]]:
+    """
+    Nodes of `source_type` with an edge into any of the targets, in id order,
+    each with its minimum distance to them.
+    """
+    ids = list(target_ids)
+    if not ids:
+        return []
+    return list(
+        GraphEdge.objects.filter(source_type=source_type, target_type=target_type, target_id__in=ids)
+        .values("source_id")
+        .annotate(min_distance=Min("distance"))
+        .order_by("source_id")
+        .values_list("source_id", "min_distance")
+    )
@@ -0,0 +1,170 @@
+import base64
+import io
+from typing import Any, Optional
+
+import numpy as np
+from django.conf import settings
+from django.db import models
+
+# Leading tag byte -> stored dtype (NumPy type chars), so blobs are self-describing
+_TAG_TO_DTYPE = {b"f": np.dtype("<f4"), b"e": np.dtype("<f2")}
+_NAME_TO_TAG = {"float32": b"f", "float16": b"e"}
+
+
+def _storage_tag() -> bytes:
+    name = getattr(settings, "EMBEDDING_STORAGE_DTYPE", "float32")
+    try:
+        return _NAME_TO_TAG[name]
+    except KeyError:
+        raise ValueError(f"Unsupported EMBEDDING_STORAGE_DTYPE: {name!r}") from None
+
+
+def coerce_embedding(value: Any) -> Optional[np.ndarray]:
+    """
+    Convert a list/array of numbers to a 1-D float32 array (None stays None).
+    Raises ValueError for anything that is not a flat numeric vector.
+    """
+    if value is None:
+        return None
+    try:
+        arr = np.asarray(value, dtype=np.float32)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Embedding must be a list of numbers: {e}") from None
+    if arr.ndim != 1:
+        raise ValueError("Embedding must be a flat list of numbers")
+    if not np.all(np.isfinite(arr)):
+        raise ValueError("Embedding contains non-finite values")
+    return arr
+
+
+def pack_embedding(value: Any) -> Optional[bytes]:
+    """
+    Pack a vector as a tag byte followed by little-endian float32/float16 data.
+    """
+    arr = coerce_embedding(value)
+    if arr is None:
+        return None
+    tag = _storage_tag()
+    return tag + arr.astype(_TAG_TO_DTYPE[tag], copy=False).tobytes()
+
+
+def unpack_embedding(blob: Any) -> Optional[np.ndarray]:
+    """
+    Decode a packed blob into a float32 array without any text parsing.
+    """
+    if blob is None:
+        return None
+    data = bytes(blob) if not isinstance(blob, bytes) else blob
+    if not data:
+        return None
+    dtype = _TAG_TO_DTYPE.get(data[:1])
+    if dtype is None:
+        raise ValueError("Unknown embedding storage tag")
+    arr = np.frombuffer(data, dtype=dtype, offset=1)
+    return arr.astype(np.float32) if dtype != np.float32 else arr
+
+
+def embeddings_equal(a: Any, b: Any) -> bool:
+    """
+    Compare two vectors at storage precision (so a re-sent float64 list
+    equals its stored float32 copy).
+    """
+    return pack_embedding(a) == pack_embedding(b)
+
+
+class _EmptyValues:
+    # Django tests "value in field.empty_values", which NumPy arrays cannot answer
+    def __contains__(self, value: Any) -> bool:
+        if value is None:
+            return True
+        if isinstance(value, np.ndarray):
+            return value.size == 0
+        if isinstance(value, (bytes, str, list, tuple, dict)):
+            return len(value) == 0
+        return False
+
+
+class EmbeddingField(models.BinaryField):
+    """
+    Stores an embedding vector as packed binary (see pack_embedding) and
+    exposes it in Python as a float32 NumPy array.
+    """
+
+    description = "Packed float32/float16 embedding vector"
+    empty_values = _EmptyValues()
+
+    def from_db_value(self, value, expression, connection):
+        return unpack_embedding(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, np.ndarray):
+            return value
+        if isinstance(value, str):
+            return unpack_embedding(base64.b64decode(value.encode("ascii")))
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return unpack_embedding(value)
+        return coerce_embedding(value)
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes(value)
+        return pack_embedding(value)
+
+    def value_to_string(self, obj):
+        packed = pack_embedding(self.value_from_object(obj))
+        return base64.b64encode(packed).decode("ascii") if packed is not None else None
+
+
+def pack_matrix(value: Any) -> Optional[bytes]:
+    """
+    Serialize an array of any shape in .npy format (float64 kept as is).
+    """
+    if value is None:
+        return None
+    buf = io.BytesIO()
+    np.save(buf, np.asarray(value), allow_pickle=False)
+    return buf.getvalue()
+
+
+def unpack_matrix(blob: Any) -> Optional[np.ndarray]:
+    if blob is None:
+        return None
+    data = bytes(blob) if not isinstance(blob, bytes) else blob
+    if not data:
+        return None
+    return np.load(io.BytesIO(data), allow_pickle=False)
+
+
+class MatrixField(models.BinaryField):
+    """
+    Stores a NumPy array (e.g. PCA components, KMeans centroids) as .npy
+    bytes and exposes it as an ndarray.
+    """
+
+    description = "NumPy array in .npy format"
+    empty_values = _EmptyValues()
+
+    def from_db_value(self, value, expression, connection):
+        return unpack_matrix(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, np.ndarray):
+            return value
+        if isinstance(value, str):
+            return unpack_matrix(base64.b64decode(value.encode("ascii")))
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return unpack_matrix(value)
+        return np.asarray(value)
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes(value)
+        return pack_matrix(value)
+
+    def value_to_string(self, obj):
+        packed = pack_matrix(self.value_from_object(obj))
+        return base64.b64encode(packed).decode("ascii") if packed is not None else None
@@ -0,0 +1,171 @@
+import gzip
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from django.db import transaction
+
+from .edges import FACULTY, ORGANISATION
+from .models import GraphEdge, GraphSnapshot
+from . import read_models
+from .versions import GRAPH, bump_version, current_version
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+def build_graph_payload() -> Dict[str, Any]:
+    """
+    Build the {"nodes": [...], "edges": [...]} graph served by /api/faculties/edges/.
+    """
+    # Faculties: id = cleaned full name (label), keep abbreviation in data
+    faculties = read_models.faculty_nodes()
+    faculty_nodes = [
+        {
+            "id": f.clean_label or abbr,
+            "label": f.clean_label or abbr,
+            "type": "faculty",
+            "cluster": f.cluster,
+            "data": {"abbreviation": abbr, "url": (f.url or "").strip()},
+        }
+        for f in faculties
+        for abbr in [(f.abbreviation or "").strip()]
+        if abbr
+    ]
+
+    # Organisations: id = full name, label = full name
+    orgs = read_models.organisation_nodes()
+    org_nodes = [
+        {
+            "id": (o.name or "").strip(),
+            "label": (o.name or "").strip(),
+            "type": "organisation",
+            "cluster": o.cluster,
+            "data": {"abbreviation": (o.abbreviation or "").strip(), "url": (o.url or "").strip()},
+        }
+        for o in orgs
+        if (o.name or "").strip()
+    ]
+
+    # Edges reference node labels; resolve both endpoint types from the rows above
+    labels = {
+        FACULTY: {f.id: f.clean_label for f in faculties},
+        ORGANISATION: {o.id: (o.name or "").strip() for o in orgs},
+    }
+    edges = []
+    for source_type in (FACULTY, ORGANISATION):
+        rows = (
+            GraphEdge.objects.filter(source_type=source_type)
+            .order_by("source_id", "rank")
+            .values_list("source_id", "target_type", "target_id", "distance")
+        )
+        for source_id, target_type, target_id, distance in rows:
+            src_label = labels[source_type].get(source_id)
+            dst_label = labels.get(target_type, {}).get(target_id)
+            if not src_label or not dst_label:
+                continue
+            edges.append({"from": src_label, "to": dst_label, "distance": float(distance or 0.0)})
+
+    return {"nodes": faculty_nodes + org_nodes, "edges": edges}
+
+
+@dataclass(frozen=True)
+class GraphPayload:
+    version: int
+    etag: str
+    body: bytes
+    body_gzip: bytes
+    body_br: Optional[bytes]
+
+    def encoded(self, encoding: str) -> bytes:
+        if encoding == "br" and self.body_br is not None:
+            return self.body_br
+        if encoding == "gzip":
+            return self.body_gzip
+        return self.body
+
+    @classmethod
+    def from_snapshot(cls, snap: GraphSnapshot) -> "GraphPayload":
+        return cls(
+            version=snap.version,
+            etag=snap.etag,
+            body=bytes(snap.body),
+            body_gzip=bytes(snap.body_gzip),
+            body_br=bytes(snap.body_br) if snap.body_br is not None else None,
+        )
+
+
+def _serialize(version: int) -> GraphPayload:
+    data = build_graph_payload()
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    digest = hashlib.sha256(body).hexdigest()[:16]
+    return GraphPayload(
+        version=version,
+        etag=f'"g{version}-{digest}"',
+        body=body,
+        # mtime=0 keeps the gzip bytes deterministic for identical bodies
+        body_gzip=gzip.compress(body, compresslevel=9, mtime=0),
+        body_br=brotli.compress(body) if brotli is not None else None,
+    )
+
+
+def publish_graph_payload(version: Optional[int] = None) -> GraphPayload:
+    """
+    Serialize the current graph, store it as the snapshot for `version`
+    (default: current graph version) and drop older snapshots.
+    """
+    if version is None:
+        version = current_version(GRAPH)
+    payload = _serialize(version)
+    with transaction.atomic():
+        GraphSnapshot.objects.update_or_create(
+            version=version,
+            defaults={
+                "etag": payload.etag,
+                "body": payload.body,
+                "body_gzip": payload.body_gzip,
+                "body_br": payload.body_br,
+            },
+        )
+        GraphSnapshot.objects.filter(version__lt=version).delete()
+    _remember(payload)
+    return payload
+
+
+def refresh_graph_payload() -> GraphPayload:
+    """
+    Bump the graph version and publish a fresh snapshot. Call after bulk
+    writes (e.g. compute_graph.py) that bypass model save signals.
+    """
+    return publish_graph_payload(bump_version(GRAPH))
+
+
+_cached: Optional[GraphPayload] = None
+_cached_lock = threading.Lock()
+
+
+def _remember(payload: GraphPayload) -> None:
+    global _cached
+    with _cached_lock:
+        if _cached is None or payload.version >= _cached.version:
+            _cached = payload
+
+
+def get_graph_payload() -> GraphPayload:
+    """
+    Return the payload for the current graph version: from process memory,
+    else the stored snapshot, else build and publish it once.
+    """
+    version = current_version(GRAPH)
+    payload = _cached
+    if payload is not None and payload.version == version:
+        return payload
+    snap = GraphSnapshot.objects.filter(version=version).first()
+    if snap is not None:
+        payload = GraphPayload.from_snapshot(snap)
+        _remember(payload)
+        return payload
+    return publish_graph_payload(version)
@@ -0,0 +1,360 @@
+"""
+Incremental graph maintenance for individual upserts.
+
+A full build (compute_graph.py) stores its parameters, PCA basis and KMeans
+centroids in GraphFit. When a few faculties or organisations get new
+embeddings, update_graph_nodes() places just those nodes:
+
+- their own top-k edges are computed against the current embeddings;
+- other nodes' edge rows are recomputed only if they pointed at a changed
+  node or a changed node is now closer than their farthest stored
+  neighbor (for organisations: than their faculty link, when faculties
+  changed);
+- their cluster is the nearest fitted centroid (after projecting with the
+  stored PCA basis when clusters were fitted on PCA features).
+
+Once the number of incrementally placed nodes crosses
+GRAPH_INCREMENTAL_DRIFT x the node count of the last build (or the
+embedding dimensionality changes), a full rebuild runs instead. Updates
+run from a request never rebuild inline: the rebuild is handed to the
+background worker thread and the request returns.
+"""
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .edges import FACULTY, ORGANISATION
+from .models import Faculty, GraphEdge, GraphFit, Organisation
+from .neighbors import exact_knn, exact_nearest
+from .pipeline import (
+    GraphParams,
+    GraphPipeline,
+    NodeSet,
+    l2_normalize_rows,
+    load_nodes,
+    merge_faculty_link,
+    organisation_edge_rows,
+    persist,
+)
+
+logger = logging.getLogger(__name__)
+
+# update_graph_nodes() outcomes
+INCREMENTAL = "incremental"
+REBUILD = "rebuild"
+REBUILD_QUEUED = "rebuild_queued"
+SKIPPED = "skipped"
+
+# One graph writer per process at a time
+_update_lock = threading.Lock()
+
+
+def rebuild_graph(params: GraphParams, log: Callable[[str], None] = logger.info) -> None:
+    """
+    Full rebuild of both node types with the given parameters.
+    """
+    pipeline = GraphPipeline(params, log=log)
+    results = pipeline.run((FACULTY, ORGANISATION), edges=True, clusters=True)
+    persist(results, params, log=log)
+
+
+def _stored_rows(source_type: str) -> Dict[int, List[Tuple[str, int, float]]]:
+    rows: Dict[int, List[Tuple[str, int, float]]] = {}
+    qs = (
+        GraphEdge.objects.filter(source_type=source_type)
+        .order_by("source_id", "rank")
+        .values_list("source_id", "target_type", "target_id", "distance")
+    )
+    for source_id, target_type, target_id, distance in qs:
+        rows.setdefault(source_id, []).append((target_type, target_id, distance))
+    return rows
+
+
+def _positions(nodes: NodeSet, ids: Iterable[int]) -> np.ndarray:
+    pos = {pk: i for i, pk in enumerate(nodes.ids)}
+    return np.asarray(sorted(pos[pk] for pk in ids if pk in pos), dtype=np.int64)
+
+
+def _closer_than(X: np.ndarray, changed: np.ndarray, threshold: np.ndarray) -> np.ndarray:
+    """
+    Mask of rows of X for which some changed row (other than the row
+    itself) is nearer, in cosine distance, than the row's threshold.
+    """
+    if changed.size == 0 or X.shape[0] == 0:
+        return np.zeros(X.shape[0], dtype=bool)
+    dist = 1.0 - X @ X[changed].T
+    dist[changed, np.arange(changed.size)] = np.inf
+    return dist.min(axis=1) < threshold
+
+
+def _write_rows(source_type: str, replace_ids: Set[int], rows: List[GraphEdge], build_version: int) -> None:
+    for edge in rows:
+        edge.source_type = source_type
+        edge.build_version = build_version
+    with transaction.atomic():
+        GraphEdge.objects.filter(source_type=source_type, source_id__in=sorted(replace_ids)).delete()
+        GraphEdge.objects.bulk_create(rows, batch_size=1000)
+
+
+def _edge_objects(source_ids: Sequence[int], rows: Sequence[Sequence[Tuple[str, int, str, float]]]) -> List[GraphEdge]:
+    return [
+        GraphEdge(source_id=source_id, target_type=t_type, target_id=t_id, distance=dist, rank=rank)
+        for source_id, node_edges in zip(source_ids, rows)
+        for rank, (t_type, t_id, _label, dist) in enumerate(node_edges)
+    ]
+
+
+def _update_faculty_rows(facs: NodeSet, X: np.ndarray, changed_ids: Set[int], params: GraphParams, build_version: int) -> int:
+    top = max(0, min(params.k, params.save_top))
+    expected = min(top, max(0, len(facs) - 1))
+    stored = _stored_rows(FACULTY)
+    changed = _positions(facs, changed_ids)
+
+    # Farthest stored distance per row; rows that are short always qualify
+    threshold = np.full(len(facs), np.inf)
+    affected = np.zeros(len(facs), dtype=bool)
+    for i, pk in enumerate(facs.ids):
+        row = stored.get(pk, [])
+        if len(row) >= expected:
+            threshold[i] = row[-1][2] if row else -np.inf
+        if any(t == FACULTY and tid in changed_ids for t, tid, _ in row):
+            affected[i] = True
+    affected |= threshold == np.inf
+    affected |= _closer_than(X, changed, threshold)
+    affected[changed] = True
+
+    rows_pos = np.nonzero(affected)[0]
+    idx, dist = exact_knn(X, top, rows=rows_pos)
+    rows = [
+        [(FACULTY, facs.ids[j], facs.labels[j], float(d)) for j, d in zip(idx[r], dist[r])]
+        for r in range(rows_pos.shape[0])
+    ]
+    source_ids = [facs.ids[i] for i in rows_pos]
+    _write_rows(FACULTY, set(source_ids) | changed_ids, _edge_objects(source_ids, rows), build_version)
+    return len(source_ids)
+
+
+def _update_organisation_rows(
+    orgs: NodeSet,
+    X: np.ndarray,
+    facs: NodeSet,
+    X_fac: np.ndarray,
+    changed_orgs: Set[int],
+    changed_facs: Set[int],
+    params: GraphParams,
+    build_version: int,
+) -> int:
+    top = max(0, int(params.save_top))
+    org_top = max(0, min(params.k, top, len(orgs) - 1))
+    has_facs = X_fac.shape[0] > 0 and X_fac.shape[1] == X.shape[1]
+    # Org-org entries a complete row holds (one slot goes to the faculty link)
+    expected = org_top - 1 if has_facs and org_top >= top and top > 0 else org_top
+    stored = _stored_rows(ORGANISATION)
+    changed = _positions(orgs, changed_orgs)
+
+    org_threshold = np.full(len(orgs), np.inf)
+    fac_threshold = np.full(len(orgs), np.inf)
+    affected = np.zeros(len(orgs), dtype=bool)
+    for i, pk in enumerate(orgs.ids):
+        row = stored.get(pk, [])
+        org_entries = [d for t, _, d in row if t == ORGANISATION]
+        fac_entries = [d for t, _, d in row if t == FACULTY]
+        if len(org_entries) >= expected:
+            org_threshold[i] = max(org_entries) if org_entries else -np.inf
+        if fac_entries:
+            fac_threshold[i] = fac_entries[0]
+        elif not has_facs or top == 0:
+            fac_threshold[i] = -np.inf
+        if any(
+            (t == ORGANISATION and tid in changed_orgs) or (t == FACULTY and tid in changed_facs)
+            for t, tid, _ in row
+        ):
+            affected[i] = True
+    affected |= (org_threshold == np.inf) | (fac_threshold == np.inf)
+    affected |= _closer_than(X, changed, org_threshold)
+    if has_facs and changed_facs:
+        fac_changed = _positions(facs, changed_facs)
+        if fac_changed.size:
+            dist = 1.0 - X @ X_fac[fac_changed].T
+            affected |= dist.min(axis=1) < fac_threshold
+    affected[changed] = True
+
+    rows_pos = np.nonzero(affected)[0]
+    idx, dist = exact_knn(X, org_top, rows=rows_pos)
+    if has_facs:
+        fac_idx, fac_dist = exact_nearest(X[rows_pos], X_fac)
+    else:
+        fac_idx, fac_dist = np.zeros((0,), dtype=np.int64), np.zeros((0,))
+    merged = merge_faculty_link(idx, dist, fac_idx, fac_dist, top)
+    rows = organisation_edge_rows(orgs, facs, *merged)
+    source_ids = [orgs.ids[i] for i in rows_pos]
+    _write_rows(ORGANISATION, set(source_ids) | changed_orgs, _edge_objects(source_ids, rows), build_version)
+    return len(source_ids)
+
+
+def assign_clusters(fit: GraphFit, X: np.ndarray) -> np.ndarray:
+    """
+    Nearest fitted centroid for each normalized row of X.
+    """
+    F = X
+    if fit.pca_components is not None and fit.pca_mean is not None:
+        F = (X - fit.pca_mean) @ fit.pca_components.T
+    d = ((F[:, None, :] - fit.centroids[None, :, :]) ** 2).sum(axis=2)
+    return np.argmin(d, axis=1)
+
+
+def _needs_rebuild(fit: GraphFit, nodes: NodeSet, count: int) -> str:
+    if fit.node_count == 0:
+        return "no previous build"
+    if len(nodes) and nodes.X.shape[1] != fit.dim:
+        return f"embedding dimension changed ({fit.dim} -> {nodes.X.shape[1]})"
+    placed = fit.incremental_updates + count
+    if placed > settings.GRAPH_INCREMENTAL_DRIFT * fit.node_count:
+        return f"drift: {placed} nodes placed incrementally since the build of {fit.node_count}"
+    return ""
+
+
+def update_graph_nodes(
+    node_type: str,
+    node_ids: Iterable[int],
+    log: Callable[[str], None] = logger.info,
+    rebuild_inline: bool = True,
+) -> str:
+    """
+    Bring edges and clusters up to date after the embeddings of `node_ids`
+    changed (or were removed). Returns INCREMENTAL, REBUILD or SKIPPED;
+    without `rebuild_inline` a needed full rebuild is queued on
+    background_updates instead (REBUILD_QUEUED).
+    """
+    from .graph_payload import refresh_graph_payload
+
+    changed_ids = {int(pk) for pk in node_ids}
+    if not changed_ids:
+        return SKIPPED
+    with _update_lock:
+        fit = GraphFit.objects.filter(node_type=node_type).first()
+        params = GraphParams.from_dict(fit.params) if fit is not None else GraphParams()
+        nodes = load_nodes(node_type)
+        reason = "no previous build" if fit is None else _needs_rebuild(fit, nodes, len(changed_ids))
+        if reason and not rebuild_inline:
+            log(f"[{node_type}] Full graph rebuild queued: {reason}")
+            background_updates.put(node_type, changed_ids)
+            return REBUILD_QUEUED
+        if reason:
+            log(f"[{node_type}] Full graph rebuild: {reason}")
+            rebuild_graph(params, log=log)
+            return REBUILD
+
+        X = l2_normalize_rows(nodes.X)
+        facs = nodes if node_type == FACULTY else load_nodes(FACULTY)
+        X_fac = X if node_type == FACULTY else l2_normalize_rows(facs.X)
+        if node_type == FACULTY:
+            touched = _update_faculty_rows(nodes, X, changed_ids, params, fit.build_version)
+            org_fit = GraphFit.objects.filter(node_type=ORGANISATION).first()
+            orgs = load_nodes(ORGANISATION)
+            if org_fit is not None and len(orgs):
+                org_params = GraphParams.from_dict(org_fit.params)
+                touched += _update_organisation_rows(
+                    orgs, l2_normalize_rows(orgs.X), facs, X_fac, set(), changed_ids, org_params, org_fit.build_version
+                )
+        else:
+            touched = _update_organisation_rows(
+                nodes, X, facs, X_fac, changed_ids, set(), params, fit.build_version
+            )
+
+        present = _positions(nodes, changed_ids)
+        if fit.centroids is not None and fit.centroids.shape[0] and present.size:
+            model = Faculty if node_type == FACULTY else Organisation
+            labels = assign_clusters(fit, X[present])
+            for i, label in zip(present.tolist(), labels.tolist()):
+                # Queryset update: the payload is refreshed once below
+                model.objects.filter(pk=nodes.ids[i]).update(cluster=int(label))
+
+        fit.incremental_updates += len(changed_ids)
+        fit.save(update_fields=["incremental_updates", "updated_at"])
+        payload = refresh_graph_payload()
+        log(
+            f"[{node_type}] Placed {len(changed_ids)} node(s) incrementally, "
+            f"rewrote {touched} edge rows; payload v{payload.version}"
+        )
+        return INCREMENTAL
+
+
+class _UpdateQueue:
+    """
+    In-process background worker; ids queued for the same node type while
+    an update runs are coalesced into the next one.
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, Set[int]] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._busy = False
+
+    def put(self, node_type: str, node_ids: Iterable[int]) -> None:
+        with self._cond:
+            self._pending.setdefault(node_type, set()).update(node_ids)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="graph-updates", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: bool(self._pending))
+                # Faculties first: organisation rows link to the current faculty set
+                node_type = FACULTY if FACULTY in self._pending else next(iter(self._pending))
+                ids = self._pending.pop(node_type)
+                self._busy = True
+            close_old_connections()
+            try:
+                update_graph_nodes(node_type, sorted(ids))
+            except Exception:
+                logger.exception("Incremental graph update failed for %s %s", node_type, sorted(ids))
+            finally:
+                close_old_connections()
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+
+background_updates = _UpdateQueue()
+
+
+def schedule_graph_update(node_type: str, node_ids: Iterable[int]) -> None:
+    """
+    Update the graph for changed nodes after the current transaction
+    commits, according to GRAPH_INCREMENTAL_MODE.
+    """
+    ids = [int(pk) for pk in node_ids]
+    mode = settings.GRAPH_INCREMENTAL_MODE
+    if not ids or mode == "off":
+        return
+    if mode == "background":
+        transaction.on_commit(lambda: background_updates.put(node_type, ids))
+        return
+    if mode == "job":
+        from jobs.runner import enqueue
+
+        transaction.on_commit(lambda: enqueue("graph_update", {"node_type": node_type, "node_ids": ids}))
+        return
+
+    def run() -> None:
+        try:
+            # The cheap incremental patch runs in the request, a full rebuild never does
+            update_graph_nodes(node_type, ids, rebuild_inline=False)
+        except Exception:
+            # The upsert itself succeeded; the next full build repairs the graph
+            logger.exception("Incremental graph update failed for %s %s", node_type, ids)
+
+    transaction.on_commit(run)
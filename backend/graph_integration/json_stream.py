@@ -0,0 +1,146 @@
+"""
+Incremental parsing of request bodies that carry many records: a JSON
+array or NDJSON (one JSON value per line). Items are decoded as the body
+is read, in fixed-size chunks, so memory is bounded by the largest item
+rather than the whole upload. The body is read straight from the request,
+past Django's DATA_UPLOAD_MAX_MEMORY_SIZE check, so callers pass their own
+`max_bytes` limit.
+"""
+import codecs
+import json
+import re
+from typing import Any, BinaryIO, Iterator, Optional
+
+NDJSON_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines"}
+
+_WHITESPACE = " \t\r\n"
+_SCALAR_END = re.compile(r"[,\]\s]")
+
+
+class BodyTooLarge(ValueError):
+    pass
+
+
+class _LimitedReader:
+    """
+    File-like view of `stream` that raises BodyTooLarge once more than
+    `limit` bytes have been read.
+    """
+
+    def __init__(self, stream: BinaryIO, limit: int):
+        self.stream = stream
+        self.limit = limit
+        self.consumed = 0
+
+    def _count(self, data: bytes) -> bytes:
+        self.consumed += len(data)
+        if self.consumed > self.limit:
+            raise BodyTooLarge(f"Request body exceeds {self.limit} bytes")
+        return data
+
+    def read(self, size: int = -1) -> bytes:
+        # One byte past the limit is enough to tell that it was exceeded
+        room = self.limit - self.consumed + 1
+        return self._count(self.stream.read(room if size is None or size < 0 else min(size, room)))
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            line = self._count(self.stream.readline(self.limit - self.consumed + 1))
+            if not line:
+                return
+            yield line
+
+
+def iter_ndjson(stream: BinaryIO) -> Iterator[Any]:
+    for number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise ValueError(f"Invalid JSON on line {number}: {e}") from None
+
+
+def iter_json_array(stream: BinaryIO, chunk_size: int = 64 * 1024) -> Iterator[Any]:
+    """
+    Yield the elements of a top-level JSON array one at a time.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def more() -> bool:
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        chunk = stream.read(chunk_size)
+        try:
+            text = utf8.decode(chunk or b"", final=not chunk)
+        except UnicodeDecodeError as e:
+            raise ValueError(f"Invalid UTF-8: {e}") from None
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + text
+        pos = 0
+        return True
+
+    def next_char() -> str:
+        # First non-whitespace character at or after pos ("" at end of input)
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if not more():
+                return ""
+
+    if next_char() != "[":
+        raise ValueError("Expected a JSON array")
+    pos += 1
+    while True:
+        char = next_char()
+        if char == "]":
+            break
+        if not char:
+            raise ValueError("Unexpected end of input in JSON array")
+        if char not in '{["':
+            # A number or literal may continue in the next chunk: wait for its delimiter
+            while not _SCALAR_END.search(buf, pos) and more():
+                pass
+        while True:
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                if more():
+                    continue
+                raise ValueError(f"Invalid JSON: {e}") from None
+            break
+        pos = end
+        yield item
+        sep = next_char()
+        if sep == "]":
+            break
+        if sep != ",":
+            raise ValueError(f"Expected ',' or ']' after array item, found {sep or 'end of input'!r}")
+        pos += 1
+        if next_char() == "]":
+            raise ValueError("Trailing comma in JSON array")
+    pos += 1
+    if next_char() != "":
+        raise ValueError("Unexpected data after the JSON array")
+
+
+def iter_request_items(stream: BinaryIO, content_type: str, max_bytes: Optional[int] = None) -> Iterator[Any]:
+    """
+    Items of an NDJSON body (by Content-Type) or of a JSON array body.
+    With `max_bytes`, reading past that many bytes raises BodyTooLarge.
+    """
+    if max_bytes is not None:
+        stream = _LimitedReader(stream, max_bytes)
+    if (content_type or "").split(";")[0].strip().lower() in NDJSON_TYPES:
+        return iter_ndjson(stream)
+    return iter_json_array(stream)
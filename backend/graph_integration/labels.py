@@ -0,0 +1,10 @@
+import re
+
+_UNIZG_SUFFIX = re.compile(r"\s*\(UNIZG\)\s*$")
+
+
+def clean_faculty_label(name: str) -> str:
+    """
+    Graph label for a faculty: its name without the trailing " (UNIZG)".
+    """
+    return _UNIZG_SUFFIX.sub("", (name or "").strip())
@@ -0,0 +1,76 @@
+from django.db import migrations
+
+import graph_integration.fields
+
+BATCH_SIZE = 200
+
+
+def _json_to_packed(model):
+    def forwards(apps, schema_editor):
+        Model = apps.get_model("graph_integration", model)
+        batch = []
+        for obj in Model.objects.exclude(embedding__isnull=True).only("id", "embedding").iterator():
+            if isinstance(obj.embedding, list) and obj.embedding:
+                obj.embedding_packed = obj.embedding
+                batch.append(obj)
+            if len(batch) >= BATCH_SIZE:
+                Model.objects.bulk_update(batch, ["embedding_packed"])
+                batch = []
+        if batch:
+            Model.objects.bulk_update(batch, ["embedding_packed"])
+    return forwards
+
+
+def _packed_to_json(model):
+    def backwards(apps, schema_editor):
+        Model = apps.get_model("graph_integration", model)
+        batch = []
+        for obj in Model.objects.exclude(embedding_packed__isnull=True).only("id", "embedding_packed").iterator():
+            obj.embedding = obj.embedding_packed.tolist()
+            batch.append(obj)
+            if len(batch) >= BATCH_SIZE:
+                Model.objects.bulk_update(batch, ["embedding"])
+                batch = []
+        if batch:
+            Model.objects.bulk_update(batch, ["embedding"])
+    return backwards
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('graph_integration', '0006_dataversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='faculty',
+            name='embedding_packed',
+            field=graph_integration.fields.EmbeddingField(blank=True, default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='organisation',
+            name='embedding_packed',
+            field=graph_integration.fields.EmbeddingField(blank=True, default=None, null=True),
+        ),
+        migrations.RunPython(_json_to_packed("Faculty"), _packed_to_json("Faculty")),
+        migrations.RunPython(_json_to_packed("Organisation"), _packed_to_json("Organisation")),
+        migrations.RemoveField(
+            model_name='faculty',
+            name='embedding',
+        ),
+        migrations.RemoveField(
+            model_name='organisation',
+            name='embedding',
+        ),
+        migrations.RenameField(
+            model_name='faculty',
+            old_name='embedding_packed',
+            new_name='embedding',
+        ),
+        migrations.RenameField(
+            model_name='organisation',
+            old_name='embedding_packed',
+            new_name='embedding',
+        ),
+    ]
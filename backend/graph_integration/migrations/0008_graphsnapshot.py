@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('graph_integration', '0007_binary_embeddings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GraphSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(unique=True)),
+                ('etag', models.CharField(max_length=64)),
+                ('body', models.BinaryField()),
+                ('body_gzip', models.BinaryField()),
+                ('body_br', models.BinaryField(blank=True, default=None, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:19
+
+import re
+
+from django.db import migrations, models
+
+# Same rule as graph_integration.labels.clean_faculty_label, copied here
+# because migrations must not depend on app code that may change
+_UNIZG_SUFFIX = re.compile(r"\s*\(UNIZG\)\s*$")
+
+
+def clean_faculty_label(name):
+    return _UNIZG_SUFFIX.sub("", (name or "").strip())
+
+
+def fill_clean_label(apps, schema_editor):
+    Faculty = apps.get_model("graph_integration", "Faculty")
+    batch = []
+    for obj in Faculty.objects.only("id", "name").iterator():
+        obj.clean_label = clean_faculty_label(obj.name)
+        batch.append(obj)
+    Faculty.objects.bulk_update(batch, ["clean_label"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('graph_integration', '0008_graphsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='faculty',
+            name='clean_label',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_clean_label, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,126 @@
+import re
+
+from django.db import migrations, models
+
+# Frozen copy of graph_integration.labels.clean_faculty_label as it was when
+# this migration was written, so later changes to it can't alter the migration
+_UNIZG_SUFFIX = re.compile(r"\s*\(UNIZG\)\s*$")
+
+
+def clean_faculty_label(name):
+    return _UNIZG_SUFFIX.sub("", (name or "").strip())
+
+
+def knn_json_to_edges(apps, schema_editor):
+    Faculty = apps.get_model("graph_integration", "Faculty")
+    Organisation = apps.get_model("graph_integration", "Organisation")
+    GraphEdge = apps.get_model("graph_integration", "GraphEdge")
+    DataVersion = apps.get_model("graph_integration", "DataVersion")
+
+    faculties = list(Faculty.objects.only("id", "name", "abbreviation", "knn_edges"))
+    orgs = list(Organisation.objects.only("id", "name", "knn_edges"))
+    fac_by_label = {clean_faculty_label(f.name): f.id for f in faculties if clean_faculty_label(f.name)}
+    fac_by_abbr = {(f.abbreviation or "").strip(): f.id for f in faculties if (f.abbreviation or "").strip()}
+    org_by_label = {(o.name or "").strip(): o.id for o in orgs if (o.name or "").strip()}
+
+    build_version, _ = DataVersion.objects.get_or_create(key="graph_build")
+    build_version.version += 1
+    build_version.save()
+
+    rows = []
+    for source_type, nodes, label_order in (
+        ("faculty", faculties, ("faculty", "organisation")),
+        ("organisation", orgs, ("organisation", "faculty")),
+    ):
+        for node in nodes:
+            rank = 0
+            for e in (node.knn_edges or []):
+                label = (e.get("neighbor_label") or "").strip()
+                target = None
+                if label:
+                    # Prefer a neighbor of the source's own type when labels collide
+                    for target_type in label_order:
+                        lookup = fac_by_label if target_type == "faculty" else org_by_label
+                        if label in lookup:
+                            target = (target_type, lookup[label])
+                            break
+                else:
+                    # Legacy edges written by upload_edges.py
+                    abbr = (e.get("neighbor_abbreviation") or "").strip()
+                    if abbr in fac_by_abbr:
+                        target = ("faculty", fac_by_abbr[abbr])
+                if target is None:
+                    continue
+                try:
+                    distance = float(e.get("distance") or 0.0)
+                except (TypeError, ValueError):
+                    distance = 0.0
+                rows.append(GraphEdge(
+                    source_type=source_type,
+                    source_id=node.id,
+                    target_type=target[0],
+                    target_id=target[1],
+                    distance=distance,
+                    rank=rank,
+                    build_version=build_version.version,
+                ))
+                rank += 1
+    GraphEdge.objects.bulk_create(rows, batch_size=1000)
+
+
+def edges_to_knn_json(apps, schema_editor):
+    Faculty = apps.get_model("graph_integration", "Faculty")
+    Organisation = apps.get_model("graph_integration", "Organisation")
+    GraphEdge = apps.get_model("graph_integration", "GraphEdge")
+
+    labels = {
+        "faculty": {f.id: clean_faculty_label(f.name) for f in Faculty.objects.only("id", "name")},
+        "organisation": {o.id: (o.name or "").strip() for o in Organisation.objects.only("id", "name")},
+    }
+    by_source = {}
+    for e in GraphEdge.objects.order_by("source_type", "source_id", "rank"):
+        label = labels.get(e.target_type, {}).get(e.target_id)
+        if label:
+            by_source.setdefault((e.source_type, e.source_id), []).append(
+                {"neighbor_label": label, "distance": e.distance}
+            )
+    for source_type, Model in (("faculty", Faculty), ("organisation", Organisation)):
+        objs = list(Model.objects.only("id"))
+        for obj in objs:
+            obj.knn_edges = by_source.get((source_type, obj.id), [])
+        Model.objects.bulk_update(objs, ["knn_edges"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('graph_integration', '0009_faculty_clean_label'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GraphEdge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_type', models.CharField(choices=[('faculty', 'Faculty'), ('organisation', 'Organisation')], max_length=16)),
+                ('source_id', models.PositiveBigIntegerField()),
+                ('target_type', models.CharField(choices=[('faculty', 'Faculty'), ('organisation', 'Organisation')], max_length=16)),
+                ('target_id', models.PositiveBigIntegerField()),
+                ('distance', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField(default=0)),
+                ('build_version', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['source_type', 'source_id', 'rank'], name='graphedge_source_idx'), models.Index(fields=['target_type', 'target_id'], name='graphedge_target_idx')],
+            },
+        ),
+        migrations.RunPython(knn_json_to_edges, edges_to_knn_json),
+        migrations.RemoveField(
+            model_name='faculty',
+            name='knn_edges',
+        ),
+        migrations.RemoveField(
+            model_name='organisation',
+            name='knn_edges',
+        ),
+    ]
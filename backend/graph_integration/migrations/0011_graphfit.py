@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:42
+
+import graph_integration.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('graph_integration', '0010_graphedge'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GraphFit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('node_type', models.CharField(choices=[('faculty', 'Faculty'), ('organisation', 'Organisation')], max_length=16, unique=True)),
+                ('build_version', models.PositiveBigIntegerField(default=0)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('dim', models.PositiveIntegerField(default=0)),
+                ('node_count', models.PositiveIntegerField(default=0)),
+                ('incremental_updates', models.PositiveIntegerField(default=0)),
+                ('pca_mean', graph_integration.fields.MatrixField(blank=True, default=None, null=True)),
+                ('pca_components', graph_integration.fields.MatrixField(blank=True, default=None, null=True)),
+                ('centroids', graph_integration.fields.MatrixField(blank=True, default=None, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
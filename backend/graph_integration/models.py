@@ -1,7 +1,12 @@
 from django.db import models
 
+from .fields import EmbeddingField, MatrixField
+from .labels import clean_faculty_label
+
 class Faculty(models.Model):
     name = models.CharField(max_length=255)
+    # Graph label (name without " (UNIZG)"), kept in sync with name on save
+    clean_label = models.CharField(max_length=255, blank=True, default="", db_index=True, editable=False)
     abbreviation = models.CharField(max_length=32)
     domain_areas = models.TextField(blank=True)
     programs = models.TextField(blank=True)
@@ -11,13 +16,19 @@ class Faculty(models.Model):
     typical_outputs = models.TextField(blank=True)
     keywords = models.TextField(blank=True)
     url = models.URLField(max_length=500, blank=True)
-    embedding = models.JSONField(null=True, blank=True, default=None)
+    embedding = EmbeddingField(null=True, blank=True, default=None)
     cluster = models.IntegerField(null=True, blank=True, default=None)
-    knn_edges = models.JSONField(default=list, blank=True)
 
     def __str__(self) -> str:
         return f"{self.abbreviation or ''} {self.name}".strip()
 
+    def save(self, *args, **kwargs):
+        self.clean_label = clean_faculty_label(self.name)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "name" in update_fields and "clean_label" not in update_fields:
+            kwargs["update_fields"] = [*update_fields, "clean_label"]
+        super().save(*args, **kwargs)
+
 class Organisation(models.Model):
     name = models.CharField(max_length=255)
     abbreviation = models.CharField(max_length=64, blank=True)
@@ -33,9 +44,86 @@ class Organisation(models.Model):
     keywords = models.JSONField(default=list, blank=True)
     url = models.URLField(max_length=500, blank=True)
     social = models.JSONField(null=True, blank=True, default=None)
-    embedding = models.JSONField(null=True, blank=True, default=None)
+    embedding = EmbeddingField(null=True, blank=True, default=None)
     cluster = models.IntegerField(null=True, blank=True, default=None)
-    knn_edges = models.JSONField(default=list, blank=True)
 
     def __str__(self) -> str:
         return f"{(self.abbreviation or '').strip()} {self.name}".strip()
+
+
+class GraphEdge(models.Model):
+    """
+    One directed kNN edge between two graph nodes (faculty or organisation),
+    written in bulk per graph rebuild.
+    """
+    FACULTY = "faculty"
+    ORGANISATION = "organisation"
+    NODE_TYPES = [(FACULTY, "Faculty"), (ORGANISATION, "Organisation")]
+
+    source_type = models.CharField(max_length=16, choices=NODE_TYPES)
+    source_id = models.PositiveBigIntegerField()
+    target_type = models.CharField(max_length=16, choices=NODE_TYPES)
+    target_id = models.PositiveBigIntegerField()
+    distance = models.FloatField()
+    rank = models.PositiveSmallIntegerField(default=0)
+    build_version = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["source_type", "source_id", "rank"], name="graphedge_source_idx"),
+            models.Index(fields=["target_type", "target_id"], name="graphedge_target_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.source_type}:{self.source_id} -> {self.target_type}:{self.target_id} ({self.distance:.4f})"
+
+
+class DataVersion(models.Model):
+    """
+    Monotonic counter per derived dataset (e.g. "embeddings", "graph").
+    Bumped by writers so every process can cheaply detect stale caches.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.key}@{self.version}"
+
+
+class GraphSnapshot(models.Model):
+    """
+    Serialized /api/faculties/edges/ payload for one "graph" DataVersion,
+    stored pre-compressed so requests never rebuild it from the ORM.
+    """
+    version = models.PositiveBigIntegerField(unique=True)
+    etag = models.CharField(max_length=64)
+    body = models.BinaryField()
+    body_gzip = models.BinaryField()
+    body_br = models.BinaryField(null=True, blank=True, default=None)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"graph@{self.version} ({len(self.body or b'')} bytes)"
+
+
+class GraphFit(models.Model):
+    """
+    Model state of the last full graph build for one node type: the build
+    parameters, the PCA basis and KMeans centroids. Lets single upserted
+    nodes be placed (edges + cluster) without refitting everything.
+    """
+    node_type = models.CharField(max_length=16, choices=GraphEdge.NODE_TYPES, unique=True)
+    build_version = models.PositiveBigIntegerField(default=0)
+    params = models.JSONField(default=dict, blank=True)
+    dim = models.PositiveIntegerField(default=0)
+    node_count = models.PositiveIntegerField(default=0)
+    # Nodes placed incrementally since the full build (drift measure)
+    incremental_updates = models.PositiveIntegerField(default=0)
+    pca_mean = MatrixField(null=True, blank=True, default=None)
+    pca_components = MatrixField(null=True, blank=True, default=None)
+    centroids = MatrixField(null=True, blank=True, default=None)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.node_type} fit (build {self.build_version}, {self.node_count} nodes, +{self.incremental_updates})"
@@ -0,0 +1,238 @@
+"""
+Cosine k-nearest-neighbor engines over L2-normalized embedding rows.
+
+- exact: blocked similarity matmul (BLAS) + argpartition; memory stays at
+  block_size x n floats regardless of catalogue size.
+- ivf:   inverted file over spherical k-means cells (numpy only); each query
+  scans its nprobe closest cells. Approximate, much faster for large n.
+- hnsw:  hnswlib graph index, if the optional `hnswlib` package is installed.
+
+Every engine returns (indices, distances) of shape (n, k), nearest first,
+with distance = 1 - cosine similarity and the query row itself excluded.
+"""
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+
+EXACT = "exact"
+IVF = "ivf"
+HNSW = "hnsw"
+BACKENDS = (EXACT, IVF, HNSW)
+
+
+@dataclass(frozen=True)
+class KnnOptions:
+    backend: str = EXACT
+    block_size: int = 1024   # exact: query rows per similarity block
+    nlist: int = 0           # ivf: number of cells; 0 = about sqrt(n)
+    nprobe: int = 8          # ivf: cells scanned per query
+    ef: int = 64             # hnsw: search breadth (>= k)
+    m: int = 16              # hnsw: graph degree
+    random_state: int = 42
+
+
+def _merge_topk(
+    best_sims: np.ndarray,
+    best_idx: np.ndarray,
+    sims: np.ndarray,
+    idx: np.ndarray,
+    k: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Keep the k largest similarities of the running best and the new candidates
+    all_sims = np.concatenate([best_sims, sims], axis=1)
+    all_idx = np.concatenate([best_idx, idx], axis=1)
+    if all_sims.shape[1] > k:
+        part = np.argpartition(-all_sims, k - 1, axis=1)[:, :k]
+        all_sims = np.take_along_axis(all_sims, part, axis=1)
+        all_idx = np.take_along_axis(all_idx, part, axis=1)
+    return all_sims, all_idx
+
+
+def _finish(sims: np.ndarray, idx: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    order = np.argsort(-sims, axis=1, kind="stable")
+    sims = np.take_along_axis(sims, order, axis=1)
+    idx = np.take_along_axis(idx, order, axis=1)
+    return idx.astype(np.int64), (1.0 - sims).astype(np.float64)
+
+
+def exact_knn(
+    X: np.ndarray,
+    k: int,
+    block_size: int = 1024,
+    rows: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Exact top-k by cosine similarity, one (block_size x n) matmul at a time.
+    With `rows`, only those rows are queried (against all of X).
+    """
+    n = X.shape[0]
+    rows = np.arange(n) if rows is None else np.asarray(rows, dtype=np.int64)
+    k = int(min(k, n - 1))
+    if k <= 0:
+        return np.zeros((rows.shape[0], 0), dtype=np.int64), np.zeros((rows.shape[0], 0))
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    out_idx = np.empty((rows.shape[0], k), dtype=np.int64)
+    out_sims = np.empty((rows.shape[0], k), dtype=np.float32)
+    for start in range(0, rows.shape[0], block_size):
+        block = rows[start : start + block_size]
+        sims = X[block] @ X.T
+        # Exclude each row itself
+        sims[np.arange(block.shape[0]), block] = -np.inf
+        part = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        out_idx[start : start + block.shape[0]] = part
+        out_sims[start : start + block.shape[0]] = np.take_along_axis(sims, part, axis=1)
+    return _finish(out_sims, out_idx)
+
+
+def exact_nearest(Q: np.ndarray, X: np.ndarray, block_size: int = 4096) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    For every row of Q, the index of its most similar row of X and the
+    cosine distance to it (both inputs normalized).
+    """
+    n = Q.shape[0]
+    if n == 0 or X.shape[0] == 0:
+        return np.zeros((n,), dtype=np.int64), np.zeros((n,))
+    Q = np.ascontiguousarray(Q, dtype=np.float32)
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    idx = np.empty((n,), dtype=np.int64)
+    sims = np.empty((n,), dtype=np.float32)
+    for start in range(0, n, block_size):
+        block = Q[start : start + block_size] @ X.T
+        best = np.argmax(block, axis=1)
+        idx[start : start + block_size] = best
+        sims[start : start + block_size] = block[np.arange(block.shape[0]), best]
+    return idx, (1.0 - sims).astype(np.float64)
+
+
+def _spherical_kmeans(X: np.ndarray, nlist: int, random_state: int, iters: int = 10) -> np.ndarray:
+    """
+    Unit-norm centroids from a few Lloyd iterations on (a sample of) X.
+    """
+    rng = np.random.default_rng(random_state)
+    sample = X if X.shape[0] <= nlist * 64 else X[rng.choice(X.shape[0], nlist * 64, replace=False)]
+    centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        counts = np.bincount(assign, minlength=nlist)
+        # Empty cells keep their previous centroid
+        filled = counts > 0
+        centroids[filled] = sums[filled]
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        norms[norms == 0.0] = 1.0
+        centroids /= norms
+    return centroids
+
+
+def ivf_knn(
+    X: np.ndarray,
+    k: int,
+    nlist: int = 0,
+    nprobe: int = 8,
+    random_state: int = 42,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Approximate top-k: rows are bucketed by nearest centroid, and each
+    query only scores the rows of its nprobe nearest buckets. Work is done
+    per bucket (all queries probing it at once), so it stays vectorized.
+    """
+    n = X.shape[0]
+    k = int(min(k, n - 1))
+    if k <= 0:
+        return np.zeros((n, 0), dtype=np.int64), np.zeros((n, 0))
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    nlist = int(nlist) or max(1, int(round(np.sqrt(n))))
+    nlist = min(nlist, n)
+    nprobe = max(1, min(int(nprobe), nlist))
+
+    centroids = _spherical_kmeans(X, nlist, random_state)
+    csims = X @ centroids.T
+    cell = np.argmax(csims, axis=1)
+    probes = np.argpartition(-csims, nprobe - 1, axis=1)[:, :nprobe] if nprobe < nlist else np.tile(np.arange(nlist), (n, 1))
+
+    best_sims = np.full((n, k), -np.inf, dtype=np.float32)
+    best_idx = np.full((n, k), -1, dtype=np.int64)
+    order = np.argsort(cell, kind="stable")
+    bounds = np.searchsorted(cell[order], np.arange(nlist + 1))
+    for c in range(nlist):
+        members = order[bounds[c] : bounds[c + 1]]
+        if members.size == 0:
+            continue
+        queries = np.nonzero((probes == c).any(axis=1))[0]
+        if queries.size == 0:
+            continue
+        sims = X[queries] @ X[members].T
+        sims[queries[:, None] == members[None, :]] = -np.inf
+        cand = np.broadcast_to(members, sims.shape)
+        best_sims[queries], best_idx[queries] = _merge_topk(best_sims[queries], best_idx[queries], sims, cand, k)
+    # Rows whose probed cells held fewer than k others are searched exactly
+    short = np.nonzero((best_idx < 0).any(axis=1))[0]
+    if short.size:
+        sims = X[short] @ X.T
+        sims[np.arange(short.size), short] = -np.inf
+        part = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        best_idx[short] = part
+        best_sims[short] = np.take_along_axis(sims, part, axis=1)
+    return _finish(best_sims, best_idx)
+
+
+def hnsw_knn(
+    X: np.ndarray,
+    k: int,
+    ef: int = 64,
+    m: int = 16,
+    random_state: int = 42,
+) -> Tuple[np.ndarray, np.ndarray]:
+    try:
+        import hnswlib
+    except ImportError as e:
+        raise RuntimeError("The hnsw backend requires hnswlib. Install with `pip install hnswlib`.") from e
+    n, dim = X.shape
+    k = int(min(k, n - 1))
+    if k <= 0:
+        return np.zeros((n, 0), dtype=np.int64), np.zeros((n, 0))
+    index = hnswlib.Index(space="ip", dim=dim)
+    index.init_index(max_elements=n, ef_construction=max(ef, 100), M=m, random_seed=random_state)
+    index.add_items(np.ascontiguousarray(X, dtype=np.float32), np.arange(n))
+    index.set_ef(max(ef, k + 1))
+    labels, dists = index.knn_query(X, k=k + 1)
+    idx = np.empty((n, k), dtype=np.int64)
+    dist = np.empty((n, k), dtype=np.float64)
+    for i in range(n):
+        keep = labels[i] != i
+        row_idx, row_dist = labels[i][keep][:k], dists[i][keep][:k]
+        idx[i], dist[i] = row_idx, row_dist
+    # hnswlib "ip" distance is already 1 - inner product
+    return idx, dist
+
+
+def knn(X: np.ndarray, k: int, options: KnnOptions = KnnOptions()) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k cosine neighbors of every row of the normalized matrix X.
+    """
+    if options.backend == EXACT:
+        return exact_knn(X, k, options.block_size)
+    if options.backend == IVF:
+        return ivf_knn(X, k, options.nlist, options.nprobe, options.random_state)
+    if options.backend == HNSW:
+        return hnsw_knn(X, k, options.ef, options.m, options.random_state)
+    raise ValueError(f"Unknown kNN backend {options.backend!r}; expected one of {', '.join(BACKENDS)}")
+
+
+def recall_at_k(approx: np.ndarray, exact: np.ndarray) -> float:
+    """
+    Mean fraction of each row's exact neighbors found by the approximate run.
+    """
+    if exact.size == 0:
+        return 1.0
+    hits = sum(len(set(a.tolist()) & set(e.tolist())) for a, e in zip(approx, exact))
+    return hits / float(exact.size)
+
+
+def timed_knn(X: np.ndarray, k: int, options: KnnOptions) -> Tuple[np.ndarray, np.ndarray, float]:
+    started = time.perf_counter()
+    idx, dist = knn(X, k, options)
+    return idx, dist, time.perf_counter() - started
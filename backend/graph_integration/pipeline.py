@@ -0,0 +1,548 @@
+"""
+Staged graph build shared by the graph scripts:
+
+    load -> normalize -> kNN -> cluster -> persist / export
+                      -> reduce (PCA; layout coordinates and cluster features)
+
+Neighbors are found in the full normalized embedding space (see
+neighbors.py for the exact and approximate engines); PCA only feeds the
+plot layout and, optionally, KMeans.
+
+Every stage after load is keyed by a fingerprint of its input plus its own
+parameters, and its arrays are cached on disk (GRAPH_PIPELINE_CACHE_DIR).
+Rerunning with only a different --kmeans therefore reuses the cached
+normalization, PCA and kNN results. Per-stage timings are collected and
+printed by report().
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field, fields
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from .edges import FACULTY, ORGANISATION, replace_edges
+from .models import Faculty, GraphEdge, GraphFit, Organisation
+from .neighbors import KnnOptions, exact_nearest, knn as knn_search
+from .versions import GRAPH_BUILD, bump_version
+
+# Cached files kept per stage; older ones are pruned on write
+_KEEP_PER_STAGE = 8
+# Part of every stage key; bump when the arrays a stage stores change
+_CACHE_FORMAT = 2
+
+
+@dataclass(frozen=True)
+class GraphParams:
+    k: int = 5                    # neighbors computed per node
+    save_top: int = 3             # neighbors stored per node
+    kmeans: int = 5               # KMeans clusters
+    cluster_components: int = 2   # PCA components to cluster in; 0 = normalized embeddings
+    n_init: int = 10
+    random_state: int = 42
+    knn: KnnOptions = field(default_factory=KnnOptions)   # neighbor engine
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "GraphParams":
+        """
+        Inverse of dataclasses.asdict(); unknown keys are ignored.
+        """
+        known = {f.name for f in fields(cls)}
+        values = {key: value for key, value in (data or {}).items() if key in known}
+        if isinstance(values.get("knn"), dict):
+            knn_known = {f.name for f in fields(KnnOptions)}
+            values["knn"] = KnnOptions(**{k: v for k, v in values["knn"].items() if k in knn_known})
+        return cls(**values)
+
+
+@dataclass
+class NodeSet:
+    node_type: str
+    ids: List[int]
+    labels: List[str]        # graph labels: clean faculty name / organisation name
+    identifiers: List[str]   # export keys: faculty abbreviation / organisation abbreviation or name
+    X: np.ndarray
+    fingerprint: str
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+@dataclass
+class NodeResult:
+    nodes: NodeSet
+    layout: np.ndarray
+    clusters: Optional[np.ndarray] = None
+    # Per node: [(target_type, target_id, target_label, distance), ...] nearest first
+    edges: Optional[List[List[Tuple[str, int, str, float]]]] = None
+    # Fitted cluster model: centroids, plus the PCA mean/components when clustering on PCA features
+    fit: Optional[Dict[str, np.ndarray]] = None
+
+
+def _digest(*parts: Any) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            h.update(str(part.dtype).encode())
+            h.update(str(part.shape).encode())
+            h.update(np.ascontiguousarray(part).tobytes())
+        else:
+            h.update(json.dumps(part, sort_keys=True, default=str).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()[:24]
+
+
+def _sklearn(name: str) -> Any:
+    try:
+        if name == "PCA":
+            from sklearn.decomposition import PCA
+            return PCA
+        from sklearn.cluster import KMeans
+        return KMeans
+    except ImportError as e:
+        raise RuntimeError("scikit-learn is required. Install with `pip install scikit-learn`.") from e
+
+
+def l2_normalize_rows(X: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    norms = np.where(norms == 0.0, 1.0, norms)
+    return X / norms
+
+
+def load_nodes(node_type: str) -> NodeSet:
+    """
+    Fetch ids, labels and embeddings (only those columns) in id order.
+    Rows without an embedding, or whose dimensionality differs from the
+    first embedded row, are skipped.
+    """
+    if node_type == FACULTY:
+        rows = Faculty.objects.exclude(embedding__isnull=True).order_by("id").values_list(
+            "id", "clean_label", "abbreviation", "embedding"
+        )
+        records = [(pk, label, (abbr or "").strip(), emb) for pk, label, abbr, emb in rows]
+    else:
+        rows = Organisation.objects.exclude(embedding__isnull=True).order_by("id").values_list(
+            "id", "name", "abbreviation", "embedding"
+        )
+        records = [
+            (pk, (name or "").strip(), (abbr or "").strip() or (name or "").strip(), emb)
+            for pk, name, abbr, emb in rows
+        ]
+    ids: List[int] = []
+    labels: List[str] = []
+    identifiers: List[str] = []
+    vectors: List[np.ndarray] = []
+    dim = 0
+    for pk, label, ident, emb in records:
+        if emb is None or len(emb) == 0:
+            continue
+        if not dim:
+            dim = len(emb)
+        if len(emb) != dim:
+            continue
+        ids.append(pk)
+        labels.append(label)
+        identifiers.append(ident)
+        vectors.append(emb)
+    X = np.vstack(vectors).astype(np.float64) if vectors else np.zeros((0, 0), dtype=np.float64)
+    ids_arr = np.asarray(ids, dtype=np.int64)
+    return NodeSet(node_type, ids, labels, identifiers, X, _digest(node_type, ids_arr, X))
+
+
+def merge_faculty_link(
+    org_idx: np.ndarray,
+    org_dist: np.ndarray,
+    fac_idx: np.ndarray,
+    fac_dist: np.ndarray,
+    top: int,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Merge each organisation's org-org neighbors (nearest first) with its
+    nearest faculty. The faculty link always stays: it takes the farthest
+    org slot when a row is full. Returns (indices, distances, is_faculty),
+    each trimmed to `top` and ordered nearest first.
+    """
+    org_idx, org_dist = org_idx[:, :top], org_dist[:, :top]
+    if fac_idx.shape[0] and top:
+        keep = top - 1 if org_idx.shape[1] >= top else org_idx.shape[1]
+        cand_idx = np.concatenate([org_idx[:, :keep], fac_idx[:, None]], axis=1)
+        cand_dist = np.concatenate([org_dist[:, :keep], fac_dist[:, None]], axis=1)
+        is_fac = np.zeros(cand_idx.shape, dtype=bool)
+        is_fac[:, -1] = True
+    else:
+        cand_idx, cand_dist = org_idx, org_dist
+        is_fac = np.zeros(cand_idx.shape, dtype=bool)
+    # Stable, so org neighbors win distance ties
+    order = np.argsort(cand_dist, axis=1, kind="stable")
+    return (
+        np.take_along_axis(cand_idx, order, axis=1),
+        np.take_along_axis(cand_dist, order, axis=1),
+        np.take_along_axis(is_fac, order, axis=1),
+    )
+
+
+def organisation_edge_rows(
+    orgs: NodeSet,
+    facs: NodeSet,
+    cand_idx: np.ndarray,
+    cand_dist: np.ndarray,
+    is_fac: np.ndarray,
+) -> List[List[Tuple[str, int, str, float]]]:
+    idx, dist, fac = cand_idx.tolist(), cand_dist.tolist(), is_fac.tolist()
+    return [
+        [
+            (FACULTY, facs.ids[j], facs.labels[j], d) if f else (ORGANISATION, orgs.ids[j], orgs.labels[j], d)
+            for j, d, f in zip(idx[i], dist[i], fac[i])
+        ]
+        for i in range(len(idx))
+    ]
+
+
+class StageCache:
+    """
+    Arrays per (stage, key) stored as .npz files; directory None disables it.
+    """
+
+    def __init__(self, directory: Optional[Path]):
+        self.directory = Path(directory) if directory else None
+
+    def _path(self, stage: str, key: str) -> Path:
+        return self.directory / f"{stage}-{key}.npz"
+
+    def load(self, stage: str, key: str) -> Optional[Dict[str, np.ndarray]]:
+        if self.directory is None:
+            return None
+        path = self._path(stage, key)
+        if not path.exists():
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files}
+        except (OSError, ValueError):
+            return None
+        os.utime(path)
+        return arrays
+
+    def save(self, stage: str, key: str, arrays: Dict[str, np.ndarray]) -> None:
+        if self.directory is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fh:
+            np.savez(fh, **arrays)
+        os.replace(tmp, self._path(stage, key))
+        stale = sorted(self.directory.glob(f"{stage}-*.npz"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for path in stale[_KEEP_PER_STAGE:]:
+            path.unlink(missing_ok=True)
+
+
+class GraphPipeline:
+    """
+    Runs the stages for one or both node types with shared parameters,
+    caching stage outputs and recording how long each stage took.
+    """
+
+    def __init__(
+        self,
+        params: GraphParams,
+        cache_dir: Optional[Path] = None,
+        use_cache: bool = True,
+        log: Callable[[str], None] = print,
+    ):
+        self.params = params
+        if cache_dir is None:
+            cache_dir = settings.GRAPH_PIPELINE_CACHE_DIR
+        self.cache = StageCache(cache_dir if use_cache else None)
+        self.log = log
+        self.timings: List[Tuple[str, str, float, bool]] = []
+        self._memo: Dict[str, Dict[str, np.ndarray]] = {}
+        self._nodes: Dict[str, NodeSet] = {}
+
+    # --- stage plumbing ---
+
+    def _stage(
+        self,
+        node_type: str,
+        stage: str,
+        inputs: Sequence[str],
+        stage_params: Dict[str, Any],
+        compute: Callable[[], Dict[str, np.ndarray]],
+    ) -> Tuple[Dict[str, np.ndarray], str]:
+        key = _digest(_CACHE_FORMAT, stage, list(inputs), stage_params)
+        if key in self._memo:
+            return self._memo[key], key
+        started = time.perf_counter()
+        cached = True
+        out = self.cache.load(stage, key)
+        if out is None:
+            cached = False
+            out = compute()
+            self.cache.save(stage, key, out)
+        self._memo[key] = out
+        self.timings.append((node_type, stage, time.perf_counter() - started, cached))
+        return out, key
+
+    def nodes(self, node_type: str) -> NodeSet:
+        if node_type not in self._nodes:
+            started = time.perf_counter()
+            self._nodes[node_type] = load_nodes(node_type)
+            self.timings.append((node_type, "load", time.perf_counter() - started, False))
+        return self._nodes[node_type]
+
+    # --- stages ---
+
+    def normalize(self, nodes: NodeSet) -> Tuple[np.ndarray, str]:
+        out, key = self._stage(
+            nodes.node_type, "normalize", [nodes.fingerprint], {},
+            lambda: {"X": l2_normalize_rows(nodes.X)},
+        )
+        return out["X"], key
+
+    def _reduce_stage(self, nodes: NodeSet, n_components: int) -> Tuple[Dict[str, np.ndarray], str]:
+        X_norm, norm_key = self.normalize(nodes)
+
+        def compute() -> Dict[str, np.ndarray]:
+            n, dim = X_norm.shape
+            # PCA needs at least 2 samples; fall back to zeros like before
+            if n < 2:
+                return {"Z": np.zeros((n, n_components)), "mean": np.zeros(dim), "components": np.zeros((n_components, dim))}
+            comps = max(1, min(n_components, n, dim))
+            PCA = _sklearn("PCA")
+            pca = PCA(n_components=comps, random_state=self.params.random_state)
+            Z = pca.fit_transform(X_norm)
+            # Keep the basis so new nodes can be projected without refitting
+            return {"Z": Z, "mean": pca.mean_, "components": pca.components_}
+
+        return self._stage(
+            nodes.node_type, f"reduce{n_components}", [norm_key],
+            {"n_components": n_components, "random_state": self.params.random_state}, compute,
+        )
+
+    def reduce(self, nodes: NodeSet, n_components: int) -> Tuple[np.ndarray, str]:
+        out, key = self._reduce_stage(nodes, n_components)
+        return out["Z"], key
+
+    def layout(self, nodes: NodeSet) -> np.ndarray:
+        """
+        2D PCA coordinates, used for plotting only.
+        """
+        return self.reduce(nodes, 2)[0]
+
+    def knn(self, nodes: NodeSet) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Indices and cosine distances of each node's k nearest other nodes,
+        in the full normalized embedding space.
+        """
+        X_norm, norm_key = self.normalize(nodes)
+        k = self.params.k
+        options = self.params.knn
+
+        def compute() -> Dict[str, np.ndarray]:
+            indices, distances = knn_search(X_norm, k, options)
+            return {"indices": indices, "distances": distances}
+
+        out, _ = self._stage(nodes.node_type, "knn", [norm_key], {"k": k, **asdict(options)}, compute)
+        return out["indices"], out["distances"]
+
+    def cluster(self, nodes: NodeSet) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        KMeans labels plus the fitted model (centroids, and the PCA basis
+        when clustering on PCA features).
+        """
+        p = self.params
+        fit: Dict[str, np.ndarray] = {}
+        if p.cluster_components > 0:
+            reduced, feature_key = self._reduce_stage(nodes, p.cluster_components)
+            F = reduced["Z"]
+            fit.update(pca_mean=reduced["mean"], pca_components=reduced["components"])
+        else:
+            F, feature_key = self.normalize(nodes)
+
+        def compute() -> Dict[str, np.ndarray]:
+            if F.shape[0] == 0:
+                return {"labels": np.zeros((0,), dtype=np.int64), "centroids": np.zeros((0, F.shape[1]))}
+            k = int(min(p.kmeans, max(1, F.shape[0])))
+            KMeans = _sklearn("KMeans")
+            km = KMeans(n_clusters=k, random_state=p.random_state, n_init=p.n_init)
+            return {"labels": km.fit_predict(F).astype(np.int64), "centroids": km.cluster_centers_}
+
+        out, _ = self._stage(
+            nodes.node_type, "cluster", [feature_key],
+            {"kmeans": p.kmeans, "n_init": p.n_init, "random_state": p.random_state}, compute,
+        )
+        fit["centroids"] = out["centroids"]
+        return out["labels"], fit
+
+    # --- edge materialization ---
+
+    def _faculty_edges(self, nodes: NodeSet) -> List[List[Tuple[str, int, str, float]]]:
+        indices, distances = self.knn(nodes)
+        top = max(0, int(self.params.save_top))
+        return [
+            [(FACULTY, nodes.ids[j], nodes.labels[j], float(d)) for j, d in zip(indices[i][:top], distances[i][:top])]
+            for i in range(len(nodes))
+        ]
+
+    def nearest_faculty(self, orgs: NodeSet) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Index (into the faculty node set) and cosine distance of each
+        organisation's closest faculty; empty when there are no comparable
+        faculty embeddings.
+        """
+        facs = self.nodes(FACULTY)
+        X_org_norm, org_key = self.normalize(orgs)
+        if not len(facs) or facs.X.shape[1] != orgs.X.shape[1]:
+            return np.zeros((0,), dtype=np.int64), np.zeros((0,))
+        X_fac_norm, fac_key = self.normalize(facs)
+
+        def compute() -> Dict[str, np.ndarray]:
+            indices, distances = exact_nearest(X_org_norm, X_fac_norm)
+            return {"indices": indices, "distances": distances}
+
+        out, _ = self._stage(orgs.node_type, "assign", [org_key, fac_key], {}, compute)
+        return out["indices"], out["distances"]
+
+    def _organisation_edges(self, orgs: NodeSet) -> List[List[Tuple[str, int, str, float]]]:
+        """
+        Top save_top org-org neighbors plus the nearest faculty, merged on
+        arrays for all organisations at once (see merge_faculty_link).
+        """
+        indices, distances = self.knn(orgs)
+        top = max(0, int(self.params.save_top))
+        fac_idx, fac_dist = self.nearest_faculty(orgs)
+        merged = merge_faculty_link(indices, distances, fac_idx, fac_dist, top)
+        return organisation_edge_rows(orgs, self.nodes(FACULTY), *merged)
+
+    # --- driver ---
+
+    def run(self, node_types: Sequence[str] = (FACULTY, ORGANISATION), edges: bool = True, clusters: bool = True) -> Dict[str, NodeResult]:
+        results: Dict[str, NodeResult] = {}
+        for node_type in node_types:
+            nodes = self.nodes(node_type)
+            if not len(nodes):
+                self.log(f"[{node_type}] No rows with embeddings found.")
+                continue
+            result = NodeResult(nodes=nodes, layout=self.layout(nodes))
+            if edges:
+                # Run the upstream stages first so "edges" times only materialization
+                self.knn(nodes)
+                if node_type == ORGANISATION:
+                    self.nearest_faculty(nodes)
+                started = time.perf_counter()
+                if node_type == FACULTY:
+                    result.edges = self._faculty_edges(nodes)
+                else:
+                    result.edges = self._organisation_edges(nodes)
+                self.timings.append((node_type, "edges", time.perf_counter() - started, False))
+            if clusters:
+                result.clusters, result.fit = self.cluster(nodes)
+            results[node_type] = result
+        return results
+
+    def report(self) -> None:
+        total = 0.0
+        for node_type, stage, seconds, cached in self.timings:
+            total += seconds
+            self.log(f"[timing] {node_type:<12} {stage:<10} {seconds * 1000:9.1f} ms{' (cached)' if cached else ''}")
+        self.log(f"[timing] {'total':<23} {total * 1000:9.1f} ms")
+
+
+def _save_fit(node_type: str, result: NodeResult, params: GraphParams, build_version: Optional[int]) -> None:
+    # Model state for incremental updates (graph_integration.incremental)
+    defaults: Dict[str, Any] = {
+        "params": asdict(params),
+        "dim": int(result.nodes.X.shape[1]) if len(result.nodes) else 0,
+        "node_count": len(result.nodes),
+        "incremental_updates": 0,
+    }
+    if build_version is not None:
+        defaults["build_version"] = build_version
+    if result.fit is not None:
+        defaults.update(
+            centroids=result.fit["centroids"],
+            pca_mean=result.fit.get("pca_mean"),
+            pca_components=result.fit.get("pca_components"),
+        )
+    GraphFit.objects.update_or_create(node_type=node_type, defaults=defaults)
+
+
+def persist(
+    results: Dict[str, NodeResult],
+    params: Optional[GraphParams] = None,
+    log: Callable[[str], None] = print,
+) -> Optional[int]:
+    """
+    Write clusters and edges for each result (one bulk statement per node
+    type) and publish a fresh graph payload. With `params`, the fitted
+    model is stored as well so later upserts can be placed incrementally.
+    Returns the graph build version when edges were written.
+    """
+    from .graph_payload import refresh_graph_payload
+
+    build_version: Optional[int] = None
+    for node_type, result in results.items():
+        nodes = result.nodes
+        model = Faculty if node_type == FACULTY else Organisation
+        if result.clusters is not None:
+            by_id = dict(zip(nodes.ids, result.clusters.tolist()))
+            objs = list(model.objects.filter(id__in=nodes.ids).only("id", "cluster"))
+            for obj in objs:
+                obj.cluster = int(by_id[obj.id])
+            model.objects.bulk_update(objs, ["cluster"], batch_size=500)
+            log(f"[{node_type}] Updated cluster for {len(objs)} rows")
+        if result.edges is not None:
+            if build_version is None:
+                build_version = bump_version(GRAPH_BUILD)
+            rows = [
+                GraphEdge(source_id=source_id, target_type=t_type, target_id=t_id, distance=dist, rank=rank)
+                for source_id, node_edges in zip(nodes.ids, result.edges)
+                for rank, (t_type, t_id, _label, dist) in enumerate(node_edges)
+            ]
+            count = replace_edges(node_type, rows, build_version)
+            log(f"[{node_type}] Replaced graph edges ({count} rows)")
+        if params is not None:
+            _save_fit(node_type, result, params, build_version if result.edges is not None else None)
+    payload = refresh_graph_payload()
+    log(f"[graph] Published payload v{payload.version} ({len(payload.body)} bytes, gzip {len(payload.body_gzip)} bytes)")
+    return build_version
+
+
+def _write_json(path: Path, data: Any) -> Path:
+    path = Path(path).expanduser().resolve()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as fh:
+        json.dump(data, fh, ensure_ascii=False, indent=2)
+    return path
+
+
+def export_graph(result: NodeResult, path: Path) -> Path:
+    """
+    Per node: identifier, knn_edges [{neighbor_label, distance}], cluster and PCA coordinates.
+    """
+    key = "abbreviation" if result.nodes.node_type == FACULTY else "identifier"
+    data = []
+    for i, ident in enumerate(result.nodes.identifiers):
+        item: Dict[str, Any] = {key: ident}
+        if result.edges is not None:
+            item["knn_edges"] = [
+                {"neighbor_label": label, "distance": dist} for _t, _id, label, dist in result.edges[i]
+            ]
+        if result.clusters is not None:
+            item["cluster"] = int(result.clusters[i])
+        item["pca"] = {"x": float(result.layout[i, 0]), "y": float(result.layout[i, 1])}
+        data.append(item)
+    return _write_json(path, data)
+
+
+def export_clusters(result: NodeResult, path: Path) -> Path:
+    key = "abbreviation" if result.nodes.node_type == FACULTY else "identifier"
+    data = [
+        {key: ident, "cluster": int(result.clusters[i])}
+        for i, ident in enumerate(result.nodes.identifiers)
+    ]
+    return _write_json(path, data)
@@ -0,0 +1,115 @@
+"""
+Column-pruned read models for the graph_integration GET endpoints.
+
+Each row type lists exactly the columns an endpoint returns, so queries go
+through values_list() and never load (or decode) embeddings, social links
+or other unused columns into full model instances.
+"""
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type, TypeVar
+
+from django.db.models import QuerySet
+
+from .models import Faculty, Organisation
+
+RowT = TypeVar("RowT")
+
+
+@dataclass(frozen=True, slots=True)
+class FacultyNode:
+    id: int
+    name: str
+    clean_label: str
+    abbreviation: str
+    url: str
+    cluster: Optional[int]
+
+
+@dataclass(frozen=True, slots=True)
+class FacultyDetail:
+    id: int
+    name: str
+    clean_label: str
+    abbreviation: str
+    url: str
+    cluster: Optional[int]
+    domain_areas: str
+    programs: str
+    research_topics: str
+    methods_and_tech: str
+    affiliations_and_labs: str
+    typical_outputs: str
+    keywords: str
+
+
+@dataclass(frozen=True, slots=True)
+class OrganisationNode:
+    id: int
+    name: str
+    abbreviation: str
+    url: str
+    cluster: Optional[int]
+
+
+@dataclass(frozen=True, slots=True)
+class OrganisationDetail:
+    id: int
+    name: str
+    abbreviation: str
+    url: str
+    cluster: Optional[int]
+    scope: str
+    mission: str
+    domains: List[Any]
+    core_activities: List[Any]
+    flagship_projects: List[Any]
+    target_members: str
+    affiliations: List[Any]
+    partnerships: Any
+    skills_outcomes: List[Any]
+    keywords: List[Any]
+
+
+@lru_cache(maxsize=None)
+def _columns(row_type: type) -> Tuple[str, ...]:
+    return tuple(f.name for f in fields(row_type))
+
+
+def project(queryset: QuerySet, row_type: Type[RowT]) -> List[RowT]:
+    """
+    Fetch only the columns declared on row_type and wrap each row in it.
+    """
+    return [row_type(*values) for values in queryset.values_list(*_columns(row_type))]
+
+
+def faculty_nodes() -> List[FacultyNode]:
+    return project(Faculty.objects.order_by("id"), FacultyNode)
+
+
+def organisation_nodes() -> List[OrganisationNode]:
+    return project(Organisation.objects.order_by("id"), OrganisationNode)
+
+
+def faculty_nodes_by_id(ids: Iterable[int]) -> Dict[int, FacultyNode]:
+    wanted = set(ids)
+    if not wanted:
+        return {}
+    return {row.id: row for row in project(Faculty.objects.filter(id__in=wanted), FacultyNode)}
+
+
+def organisation_nodes_by_id(ids: Iterable[int]) -> Dict[int, OrganisationNode]:
+    wanted = set(ids)
+    if not wanted:
+        return {}
+    return {row.id: row for row in project(Organisation.objects.filter(id__in=wanted), OrganisationNode)}
+
+
+def faculty_detail(**lookup: Any) -> Optional[FacultyDetail]:
+    rows = project(Faculty.objects.filter(**lookup).order_by("id")[:1], FacultyDetail)
+    return rows[0] if rows else None
+
+
+def organisation_detail(**lookup: Any) -> Optional[OrganisationDetail]:
+    rows = project(Organisation.objects.filter(**lookup).order_by("id")[:1], OrganisationDetail)
+    return rows[0] if rows else None
@@ -0,0 +1,83 @@
+"""
+Model field values for faculty / organisation records in the shape of the
+source datasets (unizg_faculties.json, udruge.json), shared by the upload
+scripts and the upsert endpoints.
+"""
+import json
+from typing import Any, Dict, List, Optional, Type
+
+from django.db import models
+
+from .fields import coerce_embedding
+
+# Dataset key -> Faculty field
+FACULTY_KEYS = {
+    "Name": "name",
+    "Abbreviation": "abbreviation",
+    "Domain areas": "domain_areas",
+    "Programs": "programs",
+    "Research topics": "research_topics",
+    "Methods & tech": "methods_and_tech",
+    "Affiliations & labs": "affiliations_and_labs",
+    "Typical outputs": "typical_outputs",
+    "Keywords": "keywords",
+    "URL": "url",
+}
+_ORG_TEXT = ("name", "abbreviation", "scope", "mission", "target_members", "url")
+_ORG_LISTS = ("domains", "core_activities", "flagship_projects", "affiliations", "skills_outcomes", "keywords")
+_ORG_OBJECTS = ("partnerships", "social")
+
+
+def stringify(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        # Join elements as strings, ignoring empties
+        return "; ".join([str(x) for x in value if str(x).strip()])
+    if isinstance(value, (dict,)):
+        # Compact JSON form for dictionaries
+        try:
+            return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        except Exception:
+            return str(value)
+    return str(value)
+
+
+def faculty_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: stringify(record.get(key)).strip() for key, field in FACULTY_KEYS.items()}
+
+
+def organisation_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    row: Dict[str, Any] = {field: stringify(record.get(field)).strip() for field in _ORG_TEXT}
+    for field in _ORG_LISTS:
+        row[field] = record.get(field) or []
+    for field in _ORG_OBJECTS:
+        row[field] = record.get(field, None)
+    return row
+
+
+def with_embedding(row: Dict[str, Any], record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Add the record's "embedding" (validated) to the row if the key is
+    present; an absent key leaves the stored embedding untouched.
+    """
+    if "embedding" in record:
+        row["embedding"] = coerce_embedding(record["embedding"])
+    return row
+
+
+def validate_row(model: Type[models.Model], row: Dict[str, Any], required: List[str]) -> Optional[str]:
+    """
+    First problem with a row (missing key field, over-long text, wrong
+    JSON type), or None.
+    """
+    for field in required:
+        if not row.get(field):
+            return f"Field '{field}' is required"
+    for name, value in row.items():
+        field = model._meta.get_field(name)
+        if isinstance(field, models.CharField) and field.max_length and len(value) > field.max_length:
+            return f"Field '{name}' is longer than {field.max_length} characters"
+        if isinstance(field, models.JSONField) and field.default is list and not isinstance(value, list):
+            return f"Field '{name}' must be a list"
+    return None
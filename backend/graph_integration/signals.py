@@ -0,0 +1,42 @@
+from typing import Iterable, Optional
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .edges import FACULTY, ORGANISATION, delete_node_edges
+from .models import Faculty, Organisation
+from .versions import EMBEDDINGS, GRAPH, bump_on_commit
+
+# Fields mirrored by the in-memory vector index
+_INDEXED_FIELDS = {"embedding", "name", "abbreviation", "url"}
+# Fields serialized into the cached graph payload
+_GRAPH_FIELDS = {"name", "abbreviation", "url", "cluster"}
+
+
+def bump_for_fields(fields: Optional[Iterable[str]]) -> None:
+    """
+    Bump the datasets derived from the written fields (None = all fields),
+    once per transaction. Bulk writers that bypass save() call this
+    themselves.
+    """
+    fields = set(fields) if fields is not None else None
+    keys = []
+    if fields is None or _INDEXED_FIELDS & fields:
+        keys.append(EMBEDDINGS)
+    if fields is None or _GRAPH_FIELDS & fields:
+        keys.append(GRAPH)
+    if keys:
+        bump_on_commit(*keys)
+
+
+@receiver(post_save, sender=Faculty)
+@receiver(post_save, sender=Organisation)
+def _bump_on_save(sender, instance, update_fields=None, **kwargs):
+    bump_for_fields(update_fields)
+
+
+@receiver(post_delete, sender=Faculty)
+@receiver(post_delete, sender=Organisation)
+def _bump_on_delete(sender, instance, **kwargs):
+    delete_node_edges(FACULTY if sender is Faculty else ORGANISATION, instance.pk)
+    bump_on_commit(EMBEDDINGS, GRAPH)
@@ -1,3 +1,235 @@
-from django.test import TestCase
+import gzip
+import importlib.util
+import io
+import json
+from unittest import skipIf, skipUnless
 
-# Create your tests here.
+import numpy as np
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from . import graph_payload, neighbors
+from .json_stream import BodyTooLarge, iter_json_array, iter_ndjson, iter_request_items
+from .models import Faculty, Organisation
+
+
+def _array(body: str, chunk_size: int = 64 * 1024):
+    return list(iter_json_array(io.BytesIO(body.encode("utf-8")), chunk_size=chunk_size))
+
+
+class JsonStreamTests(SimpleTestCase):
+    def test_array_items_across_chunk_boundaries(self):
+        items = [{"Name": "Fakultet ž", "n": i, "tags": ["a", "b"]} for i in range(20)] + [1.5, True, None, "x"]
+        body = json.dumps(items, ensure_ascii=False)
+        for chunk_size in (1, 3, 7, 64 * 1024):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(_array(body, chunk_size), items)
+
+    def test_array_whitespace_and_empty(self):
+        self.assertEqual(_array(" [ ] "), [])
+        self.assertEqual(_array("[\n 1 ,\n 2\n]\n", chunk_size=1), [1, 2])
+
+    def test_malformed_array(self):
+        for body in ("", "{}", "[1, 2", "[1 2]", "[1,]", "[1] x", '[{"a": }]', "[tru]"):
+            with self.subTest(body=body), self.assertRaises(ValueError):
+                _array(body, chunk_size=2)
+
+    def test_invalid_utf8(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.BytesIO(b'["\xff"]')))
+
+    def test_ndjson(self):
+        body = b'{"a": 1}\n\n  {"a": 2}  \n[3]\n'
+        self.assertEqual(list(iter_ndjson(io.BytesIO(body))), [{"a": 1}, {"a": 2}, [3]])
+
+    def test_malformed_ndjson_reports_line(self):
+        with self.assertRaisesMessage(ValueError, "line 2"):
+            list(iter_ndjson(io.BytesIO(b'{"a": 1}\n{"a": \n')))
+
+    def test_content_type_selects_format(self):
+        body = b'{"a": 1}\n{"a": 2}\n'
+        self.assertEqual(len(list(iter_request_items(io.BytesIO(body), "application/x-ndjson; charset=utf-8"))), 2)
+        with self.assertRaises(ValueError):
+            list(iter_request_items(io.BytesIO(body), "application/json"))
+
+    def test_byte_limit(self):
+        body = json.dumps([{"n": i} for i in range(100)]).encode()
+        for content_type in ("application/json", "application/x-ndjson"):
+            data = body if content_type == "application/json" else b"\n".join(b'{"n": 1}' for _ in range(100))
+            with self.subTest(content_type=content_type):
+                self.assertEqual(len(list(iter_request_items(io.BytesIO(data), content_type, len(data)))), 100)
+                with self.assertRaises(BodyTooLarge):
+                    list(iter_request_items(io.BytesIO(data), content_type, len(data) - 1))
+
+
+class BulkUpsertTests(TestCase):
+    def post(self, path, items, content_type="application/json"):
+        if content_type == "application/json":
+            body = json.dumps(items)
+        else:
+            body = "\n".join(json.dumps(item) for item in items)
+        return self.client.post(path, body, content_type=content_type)
+
+    def test_created_updated_unchanged(self):
+        Faculty.objects.create(name="Old", abbreviation="FER")
+        Faculty.objects.create(name="Same", abbreviation="PMF")
+        response = self.post("/api/faculties/bulk-upsert/", [
+            {"Abbreviation": "FER", "Name": "New"},
+            {"Abbreviation": "PMF", "Name": "Same"},
+            {"Abbreviation": "FFZG", "Name": "Filozofski"},
+        ])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data["created"], data["updated"], data["unchanged"]), (1, 1, 1))
+        self.assertEqual([item["status"] for item in data["items"]], ["updated", "unchanged", "created"])
+        self.assertEqual(Faculty.objects.get(abbreviation="FER").name, "New")
+        self.assertEqual(data["items"][2]["id"], Faculty.objects.get(abbreviation="FFZG").pk)
+
+    def test_ndjson_organisations(self):
+        response = self.post(
+            "/api/organisations/bulk-upsert/",
+            [{"name": "BEST Zagreb", "domains": ["tech"]}, {"name": "eSTUDENT"}],
+            content_type="application/x-ndjson",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["created"], 2)
+        self.assertEqual(Organisation.objects.get(name="BEST Zagreb").domains, ["tech"])
+
+    def test_invalid_items_write_nothing(self):
+        response = self.post("/api/faculties/bulk-upsert/", [
+            {"Abbreviation": "OK", "Name": "Fine"},
+            {"Name": "No abbreviation"},
+            "not an object",
+            {"Abbreviation": "EMB", "embedding": ["x"]},
+            {"Abbreviation": "X" * 40},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([e["index"] for e in response.json()["errors"]], [1, 2, 3, 4])
+        self.assertFalse(Faculty.objects.exists())
+
+    def test_malformed_body(self):
+        response = self.client.post("/api/faculties/bulk-upsert/", '[{"Abbreviation": "A"},', content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Faculty.objects.exists())
+
+    @override_settings(BULK_UPSERT_MAX_ITEMS=2)
+    def test_item_limit(self):
+        response = self.post("/api/faculties/bulk-upsert/", [{"Abbreviation": f"F{i}"} for i in range(3)])
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Faculty.objects.exists())
+
+    @override_settings(BULK_UPSERT_MAX_BYTES=100)
+    def test_byte_limit(self):
+        response = self.post("/api/faculties/bulk-upsert/", [{"Abbreviation": f"F{i}", "Name": "x" * 20} for i in range(5)])
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Faculty.objects.exists())
+
+
+class UpsertFacultyTests(TestCase):
+    def test_update_is_a_single_write(self):
+        faculty = Faculty.objects.create(name="Old", abbreviation="FER", url="fer.hr")
+        body = json.dumps({"Abbreviation": "FER", "Name": "New", "URL": "fer.hr", "embedding": [0.6, 0.8]})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post("/api/faculties/upsert/", body, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()["created"])
+        # The incremental graph update may write the cluster afterwards; the record itself is one UPDATE
+        writes = [
+            q["sql"] for q in queries.captured_queries
+            if q["sql"].startswith('UPDATE "graph_integration_faculty"') and ('"name"' in q["sql"] or '"embedding"' in q["sql"])
+        ]
+        self.assertEqual(len(writes), 1)
+        self.assertIn('"embedding"', writes[0])
+        faculty.refresh_from_db()
+        self.assertEqual((faculty.name, faculty.clean_label), ("New", "New"))
+        self.assertTrue(np.allclose(faculty.embedding, [0.6, 0.8]))
+
+
+class GraphSnapshotETagTests(TestCase):
+    URL = "/api/faculties/edges/"
+
+    def setUp(self):
+        # Payloads are memoized per process by graph version
+        graph_payload._cached = None
+        Faculty.objects.create(name="Fakultet elektrotehnike i računarstva (UNIZG)", abbreviation="FER")
+
+    def test_matching_etag_returns_304(self):
+        first = self.client.get(self.URL)
+        self.assertEqual(first.status_code, 200)
+        etag = first["ETag"]
+        for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+            with self.subTest(header=header):
+                response = self.client.get(self.URL, HTTP_IF_NONE_MATCH=header)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response["ETag"], etag)
+                self.assertEqual(response.content, b"")
+        self.assertEqual(self.client.get(self.URL, HTTP_IF_NONE_MATCH='"g0-stale"').status_code, 200)
+
+    def test_graph_change_invalidates_etag(self):
+        etag = self.client.get(self.URL)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            Faculty.objects.create(name="Prirodoslovno-matematički fakultet", abbreviation="PMF")
+        response = self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        labels = {node["label"] for node in json.loads(response.content)["nodes"]}
+        self.assertIn("Prirodoslovno-matematički fakultet", labels)
+
+    def test_compressed_body(self):
+        plain = self.client.get(self.URL)
+        response = self.client.get(self.URL, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response["ETag"], plain["ETag"])
+
+
+def _clustered_unit_vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(12, dim))
+    X = centers[rng.integers(0, len(centers), n)] + 0.35 * rng.normal(size=(n, dim))
+    return (X / np.linalg.norm(X, axis=1, keepdims=True)).astype(np.float32)
+
+
+class KnnTests(SimpleTestCase):
+    K = 10
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.X = _clustered_unit_vectors(800, 32)
+        cls.exact_idx, cls.exact_dist = neighbors.exact_knn(cls.X, cls.K, block_size=64)
+
+    def test_exact_matches_brute_force(self):
+        sims = self.X @ self.X.T
+        np.fill_diagonal(sims, -np.inf)
+        expected = np.sort(1.0 - np.sort(sims, axis=1)[:, ::-1][:, : self.K], axis=1)
+        self.assertTrue(np.allclose(self.exact_dist, expected, atol=1e-5))
+        self.assertFalse((self.exact_idx == np.arange(len(self.X))[:, None]).any())
+        # Sorted nearest first
+        self.assertTrue((np.diff(self.exact_dist, axis=1) >= -1e-7).all())
+
+    def test_ivf_recall(self):
+        idx, dist = neighbors.ivf_knn(self.X, self.K, nprobe=8)
+        self.assertGreaterEqual(neighbors.recall_at_k(idx, self.exact_idx), 0.95)
+        self.assertTrue((np.diff(dist, axis=1) >= -1e-7).all())
+        # Probing every cell is an exhaustive search
+        idx, _ = neighbors.ivf_knn(self.X, self.K, nprobe=10_000)
+        self.assertEqual(neighbors.recall_at_k(idx, self.exact_idx), 1.0)
+
+    @skipUnless(importlib.util.find_spec("hnswlib"), "hnswlib is not installed")
+    def test_hnsw_recall(self):
+        idx, _ = neighbors.hnsw_knn(self.X, self.K, ef=64)
+        self.assertGreaterEqual(neighbors.recall_at_k(idx, self.exact_idx), 0.95)
+
+    @skipIf(importlib.util.find_spec("hnswlib"), "hnswlib is installed")
+    def test_hnsw_without_hnswlib(self):
+        with self.assertRaisesMessage(RuntimeError, "hnswlib"):
+            neighbors.knn(self.X, self.K, neighbors.KnnOptions(backend=neighbors.HNSW))
+
+    def test_small_inputs_and_unknown_backend(self):
+        idx, dist = neighbors.knn(self.X[:3], self.K, neighbors.KnnOptions(backend=neighbors.IVF))
+        self.assertEqual(idx.shape, (3, 2))
+        with self.assertRaises(ValueError):
+            neighbors.knn(self.X, self.K, neighbors.KnnOptions(backend="annoy"))
@@ -0,0 +1,128 @@
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .models import Faculty, Organisation
+from .versions import EMBEDDINGS, current_version
+
+
+class VectorIndex:
+    """
+    Pre-normalized float32 matrix over all Faculty and Organisation embeddings,
+    with matching id/label arrays. Queried with a single matrix-vector product.
+    """
+
+    def __init__(self, version: int, matrix: np.ndarray, items: List[Dict[str, Any]]):
+        self.version = version
+        self.matrix = matrix
+        self.items = items
+        self.ids = np.asarray([item["id"] for item in items], dtype=np.int64)
+        self.labels = [item["label"] for item in items]
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    @property
+    def dim(self) -> int:
+        return int(self.matrix.shape[1]) if self.matrix.ndim == 2 else 0
+
+    def search(self, query: Sequence[float], k: int = 3) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Return up to k (item, cosine distance) pairs, nearest first.
+        """
+        if not self.items or k <= 0:
+            return []
+        q = np.asarray(query, dtype=np.float32).ravel()
+        if q.shape[0] != self.dim:
+            raise ValueError(f"Query has dimension {q.shape[0]}, index has {self.dim}")
+        norm = float(np.linalg.norm(q))
+        if norm != 0.0:
+            q = q / norm
+        sims = self.matrix @ q
+        k = min(int(k), sims.shape[0])
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top], kind="stable")]
+        return [(self.items[i], float(1.0 - sims[i])) for i in top]
+
+
+def _collect_rows() -> Tuple[List[Dict[str, Any]], List[Any]]:
+    items: List[Dict[str, Any]] = []
+    vectors: List[Any] = []
+    fac_rows = Faculty.objects.exclude(embedding__isnull=True).values_list(
+        "id", "name", "clean_label", "abbreviation", "url", "embedding"
+    )
+    for pk, name, label, abbr, url, emb in fac_rows:
+        raw_name = (name or "").strip()
+        items.append({
+            "type": "faculty",
+            "id": pk,
+            # Match graph node id/label: cleaned faculty name (strip trailing " (UNIZG)")
+            "label": label,
+            "name": raw_name,
+            "abbreviation": (abbr or "").strip(),
+            "url": (url or "").strip(),
+        })
+        vectors.append(emb)
+    org_rows = Organisation.objects.exclude(embedding__isnull=True).values_list(
+        "id", "name", "abbreviation", "url", "embedding"
+    )
+    for pk, name, abbr, url, emb in org_rows:
+        items.append({
+            "type": "organisation",
+            "id": pk,
+            "label": (name or "").strip(),
+            "name": (name or "").strip(),
+            "abbreviation": (abbr or "").strip(),
+            "url": (url or "").strip(),
+        })
+        vectors.append(emb)
+    return items, vectors
+
+
+def build_vector_index(version: int = 0) -> VectorIndex:
+    """
+    Load every embedding once and build a normalized index. Rows whose
+    dimensionality differs from the first valid row are skipped.
+    """
+    items, vectors = _collect_rows()
+    kept_items: List[Dict[str, Any]] = []
+    kept_vectors: List[np.ndarray] = []
+    dim = 0
+    for item, emb in zip(items, vectors):
+        if emb is None or len(emb) == 0:
+            continue
+        vec = np.asarray(emb, dtype=np.float32).ravel()
+        if not dim:
+            dim = vec.shape[0]
+        if vec.shape[0] != dim:
+            continue
+        kept_items.append(item)
+        kept_vectors.append(vec)
+    if not kept_vectors:
+        return VectorIndex(version, np.zeros((0, 0), dtype=np.float32), [])
+    matrix = np.vstack(kept_vectors)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0.0] = 1.0
+    matrix /= norms
+    return VectorIndex(version, matrix, kept_items)
+
+
+_index: Optional[VectorIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_vector_index() -> VectorIndex:
+    """
+    Return the process-wide index, rebuilding it when the embeddings
+    version has been bumped (by upserts, upload scripts or graph rebuilds).
+    """
+    global _index
+    version = current_version(EMBEDDINGS)
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    with _index_lock:
+        if _index is None or _index.version != version:
+            _index = build_vector_index(version)
+        return _index
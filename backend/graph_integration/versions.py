@@ -0,0 +1,96 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DataVersion
+
+# Known dataset keys
+EMBEDDINGS = "embeddings"
+GRAPH = "graph"
+GRAPH_BUILD = "graph_build"
+
+# Versions already read in the current request (see cached_versions)
+_request_versions: ContextVar[Optional[Dict[str, int]]] = ContextVar("data_versions", default=None)
+# Keys to bump when this thread's transaction commits (see bump_on_commit)
+_pending = threading.local()
+
+
+@contextmanager
+def cached_versions() -> Iterator[None]:
+    """
+    Within the block, current_version() queries each key at most once;
+    DataVersionMiddleware wraps every request in it.
+    """
+    token = _request_versions.set({})
+    try:
+        yield
+    finally:
+        _request_versions.reset(token)
+
+
+def _read_version(key: str) -> int:
+    value = DataVersion.objects.filter(key=key).values_list("version", flat=True).first()
+    return int(value or 0)
+
+
+def current_version(key: str) -> int:
+    """
+    Return the current version number for a dataset key (0 if never bumped).
+    """
+    cache = _request_versions.get()
+    if cache is None:
+        return _read_version(key)
+    if key not in cache:
+        cache[key] = _read_version(key)
+    return cache[key]
+
+
+def bump_version(key: str) -> int:
+    """
+    Atomically increment the version for a dataset key and return the new value.
+    """
+    with transaction.atomic():
+        updated = DataVersion.objects.filter(key=key).update(
+            version=F("version") + 1, updated_at=timezone.now()
+        )
+        if not updated:
+            try:
+                with transaction.atomic():
+                    DataVersion.objects.create(key=key, version=1)
+            except IntegrityError:
+                # Created concurrently by another writer
+                DataVersion.objects.filter(key=key).update(
+                    version=F("version") + 1, updated_at=timezone.now()
+                )
+    version = _read_version(key)
+    cache = _request_versions.get()
+    if cache is not None:
+        cache[key] = version
+    return version
+
+
+def bump_on_commit(*keys: str) -> None:
+    """
+    Bump `keys` once when the current transaction commits (at once outside
+    a transaction), however many rows it writes. Every call registers a
+    callback; the first to run bumps the collected keys and the rest find
+    nothing left. Keys from a rolled-back transaction are bumped with the
+    next commit, which only costs a spurious refresh.
+    """
+    pending = getattr(_pending, "keys", None)
+    if pending is None:
+        pending = _pending.keys = set()
+    pending.update(keys)
+    transaction.on_commit(_flush_pending)
+
+
+def _flush_pending() -> None:
+    keys = getattr(_pending, "keys", None)
+    _pending.keys = set()
+    for key in sorted(keys or ()):
+        bump_version(key)
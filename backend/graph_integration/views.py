@@ -1,18 +1,28 @@
-from django.http import JsonResponse, HttpRequest
+from django.http import HttpRequest, HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils.cache import patch_vary_headers
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
+from django.conf import settings
+from django.db import transaction
 import json
-import re
 
+from .fields import coerce_embedding
+from . import bulk, read_models, records
+from . import edges as graph_edges
+from .edges import FACULTY, ORGANISATION
+from .graph_payload import get_graph_payload
+from .incremental import schedule_graph_update
+from .json_stream import BodyTooLarge, iter_request_items
+from .labels import clean_faculty_label
 from .models import Faculty, Organisation
 from openai_integration.models import Student
 from django.utils.html import strip_tags
 
 
-def _add_cors_headers(request: HttpRequest, response: JsonResponse) -> JsonResponse:
+def _add_cors_headers(request: HttpRequest, response: HttpResponse) -> HttpResponse:
     origin = request.headers.get("Origin") or "*"
     response["Access-Control-Allow-Origin"] = origin
-    response["Vary"] = "Origin"
+    patch_vary_headers(response, ["Origin"])
     response["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
     acrh = request.headers.get("Access-Control-Request-Headers") or "Content-Type, Authorization"
     response["Access-Control-Allow-Headers"] = acrh
@@ -49,20 +59,24 @@ def upsert_faculty(request: HttpRequest):
         "url": (payload.get("URL") or "").strip(),
     }
 
+    # Optional embedding assignment; the node's edges and cluster follow it
+    if "embedding" in payload:
+        try:
+            defaults["embedding"] = coerce_embedding(payload.get("embedding"))
+        except ValueError as e:
+            return _add_cors_headers(request, JsonResponse({"error": str(e)}, status=400))
+
     obj, created = Faculty.objects.get_or_create(abbreviation=abbreviation, defaults=defaults)
     if not created:
-        changed = False
-        for field, value in defaults.items():
-            if getattr(obj, field) != value:
-                setattr(obj, field, value)
-                changed = True
+        # One UPDATE of the changed columns (a sent embedding is always written)
+        changed = [f for f, v in defaults.items() if f == "embedding" or getattr(obj, f) != v]
+        for field in changed:
+            setattr(obj, field, defaults[field])
         if changed:
-            obj.save()
+            obj.save(update_fields=changed)
 
-    # Optional embedding assignment
     if "embedding" in payload:
-        obj.embedding = payload.get("embedding")
-        obj.save(update_fields=["embedding"])
+        schedule_graph_update(FACULTY, [obj.id])
 
     return _add_cors_headers(
         request,
@@ -75,85 +89,153 @@ def upsert_faculty(request: HttpRequest):
             }
         ),
     )
-from django.shortcuts import render
-
-# Create your views here.
 
 
-@csrf_exempt
-@require_http_methods(["GET", "OPTIONS"])
-def list_faculty_edges(request: HttpRequest):
+def _bulk_upsert(request: HttpRequest, node_type: str):
+    """
+    Shared body of the bulk upsert endpoints: parse the array / NDJSON body
+    item by item, validate every item, then write all of them in one
+    transaction. Nothing is written if any item is invalid.
+    """
     if request.method == "OPTIONS":
         return _add_cors_headers(request, JsonResponse({}))
 
-    # Faculties: id = cleaned full name (label), keep abbreviation in data
-    faculties = list(Faculty.objects.all())
-    def _clean_name(text: str) -> str:
-        return re.sub(r"\s*\(UNIZG\)\s*$", "", (text or "").strip())
-    fac_abbr_to_label = { (f.abbreviation or "").strip(): _clean_name(f.name) for f in faculties if (f.abbreviation or "").strip() }
-    faculty_nodes = [
-        {
-            "id": fac_abbr_to_label.get(abbr, abbr),
-            "label": fac_abbr_to_label.get(abbr, abbr),
-            "type": "faculty",
-            "cluster": f.cluster,
-            "data": {"abbreviation": abbr, "url": (f.url or "").strip()},
-        }
-        for f in faculties
-        for abbr in [(f.abbreviation or "").strip()]
-        if abbr
-    ]
-    faculty_edges = []
-    for f in faculties:
-        src_label = _clean_name(f.name)
-        if not src_label:
-            continue
-        for e in (f.knn_edges or []):
-            dst_label = (e.get("neighbor_label") or "").strip()
-            if not dst_label:
-                # Backward compatibility: map neighbor_abbreviation to label if present
-                abbr = (e.get("neighbor_abbreviation") or "").strip()
-                if abbr:
-                    dst_label = fac_abbr_to_label.get(abbr, abbr)
-            if not dst_label:
+    if node_type == FACULTY:
+        model, to_row, required, upsert = Faculty, records.faculty_row, ["abbreviation"], bulk.bulk_upsert_faculties
+    else:
+        model, to_row, required, upsert = Organisation, records.organisation_row, ["name"], bulk.bulk_upsert_organisations
+    max_items = settings.BULK_UPSERT_MAX_ITEMS
+    max_bytes = settings.BULK_UPSERT_MAX_BYTES
+    too_large = {"error": f"Request body too large (limit {max_bytes} bytes)"}
+    try:
+        declared = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        declared = 0
+    if declared > max_bytes:
+        return _add_cors_headers(request, JsonResponse(too_large, status=413))
+
+    rows = []
+    errors = []
+    try:
+        for index, item in enumerate(iter_request_items(request, request.content_type, max_bytes)):
+            if index >= max_items:
+                return _add_cors_headers(request, JsonResponse(
+                    {"error": f"Too many items (limit {max_items})"}, status=413
+                ))
+            if not isinstance(item, dict):
+                errors.append({"index": index, "error": "Item must be a JSON object"})
+                continue
+            try:
+                row = records.with_embedding(to_row(item), item)
+            except ValueError as e:
+                errors.append({"index": index, "error": str(e)})
                 continue
-            faculty_edges.append(
-                {"from": src_label, "to": dst_label, "distance": float(e.get("distance") or 0.0)}
-            )
-
-    # Organisations: id = full name, label = full name
-    orgs = list(Organisation.objects.all())
-    def _org_id(o: Organisation) -> str:
-        name = (o.name or "").strip()
-        return name
-    org_id_to_label = { _org_id(o): (o.name or "").strip() for o in orgs if _org_id(o) }
-    org_nodes = [
+            problem = records.validate_row(model, row, required)
+            if problem:
+                errors.append({"index": index, "error": problem})
+                continue
+            rows.append(row)
+    except BodyTooLarge:
+        return _add_cors_headers(request, JsonResponse(too_large, status=413))
+    except ValueError as e:
+        return _add_cors_headers(request, JsonResponse({"error": str(e)}, status=400))
+    if errors:
+        return _add_cors_headers(request, JsonResponse({"error": "Validation failed", "errors": errors}, status=400))
+
+    with transaction.atomic():
+        result = upsert(rows)
+        # Edges and clusters follow changed embeddings once the batch commits
+        schedule_graph_update(node_type, result.embedding_changed)
+
+    created, updated = set(result.created), set(result.updated)
+    items = [
         {
-            "id": _org_id(o),
-            "label": (o.name or "").strip(),
-            "type": "organisation",
-            "cluster": o.cluster,
-            "data": {"abbreviation": (o.abbreviation or "").strip(), "url": (o.url or "").strip()},
+            "index": index,
+            "id": pk,
+            "status": "created" if pk in created else "updated" if pk in updated else "unchanged",
         }
-        for o in orgs
-        if _org_id(o)
+        for index, pk in enumerate(result.row_ids)
     ]
-    org_edges = []
-    for o in orgs:
-        src_label = _org_id(o)
-        if not src_label:
-            continue
-        for e in (o.knn_edges or []):
-            dst_label = (e.get("neighbor_label") or "").strip()
-            if not dst_label:
+    return _add_cors_headers(request, JsonResponse({
+        "created": len(result.created),
+        "updated": len(result.updated),
+        "unchanged": result.unchanged,
+        "items": items,
+    }))
+
+
+@csrf_exempt
+@require_http_methods(["POST", "OPTIONS"])
+def bulk_upsert_faculties(request: HttpRequest):
+    return _bulk_upsert(request, FACULTY)
+
+
+@csrf_exempt
+@require_http_methods(["POST", "OPTIONS"])
+def bulk_upsert_organisations(request: HttpRequest):
+    return _bulk_upsert(request, ORGANISATION)
+
+
+from django.shortcuts import render
+
+# Create your views here.
+
+
+def _accepted_encodings(request: HttpRequest) -> set:
+    accepted = set()
+    for part in (request.headers.get("Accept-Encoding") or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0.0:
+                    continue
+            except ValueError:
                 continue
-            org_edges.append(
-                {"from": src_label, "to": dst_label, "distance": float(e.get("distance") or 0.0)}
-            )
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def _etag_matches(request: HttpRequest, etag: str) -> bool:
+    header = request.headers.get("If-None-Match") or ""
+    if header.strip() == "*":
+        return True
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+@csrf_exempt
+@require_http_methods(["GET", "OPTIONS"])
+def list_faculty_edges(request: HttpRequest):
+    if request.method == "OPTIONS":
+        return _add_cors_headers(request, JsonResponse({}))
 
-    nodes = faculty_nodes + org_nodes
-    edges = faculty_edges + org_edges
-    return _add_cors_headers(request, JsonResponse({"nodes": nodes, "edges": edges}))
+    # Served from the versioned, pre-compressed snapshot (see graph_payload)
+    payload = get_graph_payload()
+    if _etag_matches(request, payload.etag):
+        response = HttpResponseNotModified()
+    else:
+        accepted = _accepted_encodings(request)
+        if "br" in accepted and payload.body_br is not None:
+            encoding = "br"
+        elif "gzip" in accepted:
+            encoding = "gzip"
+        else:
+            encoding = ""
+        response = HttpResponse(payload.encoded(encoding), content_type="application/json")
+        if encoding:
+            response["Content-Encoding"] = encoding
+    response["ETag"] = payload.etag
+    response["Cache-Control"] = "public, max-age=0, must-revalidate"
+    response = _add_cors_headers(request, response)
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return response
 
 
 @csrf_exempt
@@ -168,66 +250,48 @@ def get_faculty(request: HttpRequest):
 
     faculty = None
     if raw_name:
-        def _clean_name(text: str) -> str:
-            return re.sub(r"\s*\(UNIZG\)\s*$", "", (text or "").strip())
-        cleaned = _clean_name(raw_name)
-        # Find first faculty whose cleaned name matches provided cleaned name
-        for f in Faculty.objects.all():
-            if _clean_name(f.name) == cleaned:
-                faculty = f
-                break
+        # First faculty whose cleaned name matches (indexed clean_label column)
+        faculty = read_models.faculty_detail(clean_label=clean_faculty_label(raw_name))
     elif abbr:
-        try:
-            faculty = Faculty.objects.get(abbreviation=abbr)
-        except Faculty.DoesNotExist:
-            faculty = None
+        faculty = read_models.faculty_detail(abbreviation=abbr)
 
     if faculty is None:
         return _add_cors_headers(request, JsonResponse({"error": "Faculty not found"}, status=404))
 
-    clean_name = re.sub(r"\s*\(UNIZG\)\s*$", "", (faculty.name or "").strip())
-    # Direct KNN edges of the faculty
+    clean_name = faculty.clean_label
+    # Direct KNN edges of the faculty (indexed on source)
     edges = []
     direct_neighbor_labels = []
-    for e in (faculty.knn_edges or []):
-        # Prefer label; fallback for backward compatibility
-        dst_label = (e.get("neighbor_label") or "").strip()
-        if not dst_label:
-            dst_label = (e.get("neighbor_abbreviation") or "").strip()
+    direct_faculties = []
+    label_to_faculty_id = {}
+    for _, target_type, target_id, dst_label, distance in graph_edges.outgoing(FACULTY, [faculty.id]):
         if not dst_label:
             continue
-        edges.append({"to": dst_label, "distance": float(e.get("distance") or 0.0)})
+        edges.append({"to": dst_label, "distance": float(distance or 0.0)})
         direct_neighbor_labels.append(dst_label)
-
-    # Build lookup maps to resolve labels <-> faculties
-    def _clean_name_local(text: str) -> str:
-        return re.sub(r"\s*\(UNIZG\)\s*$", "", (text or "").strip())
-    all_faculties = list(Faculty.objects.all())
-    label_to_faculty = {}
-    for f in all_faculties:
-        lbl = _clean_name_local(f.name)
-        if lbl:
-            label_to_faculty[lbl] = f
+        if target_type == FACULTY:
+            direct_faculties.append((target_id, dst_label))
+            label_to_faculty_id[dst_label] = target_id
+    direct_faculty_ids = [fid for fid, _ in direct_faculties]
 
     # Collect KNN edges of the neighbors (second-degree edges)
+    second_by_source = {}
+    for source_id, target_type, target_id, dst_label, distance in graph_edges.outgoing(FACULTY, direct_faculty_ids):
+        second_by_source.setdefault(source_id, []).append((target_type, target_id, dst_label, distance))
     neighbor_knn_edges = []
     second_degree_labels = []
-    for neigh_label in direct_neighbor_labels:
-        neigh_fac = label_to_faculty.get(neigh_label)
-        if not neigh_fac:
-            continue
-        for e in (neigh_fac.knn_edges or []):
-            dst_label = (e.get("neighbor_label") or "").strip()
-            if not dst_label:
-                dst_label = (e.get("neighbor_abbreviation") or "").strip()
+    for neigh_id, neigh_label in direct_faculties:
+        for target_type, target_id, dst_label, distance in second_by_source.get(neigh_id, []):
             if not dst_label:
                 continue
             neighbor_knn_edges.append({
                 "from": neigh_label,
                 "to": dst_label,
-                "distance": float(e.get("distance") or 0.0),
+                "distance": float(distance or 0.0),
             })
             second_degree_labels.append(dst_label)
+            if target_type == FACULTY:
+                label_to_faculty_id.setdefault(dst_label, target_id)
 
     # Build a concise list of related faculties (union of direct + second-degree)
     related_faculty_labels = []
@@ -236,9 +300,12 @@ def get_faculty(request: HttpRequest):
         if lbl and lbl not in seen_labels and lbl != clean_name:
             related_faculty_labels.append(lbl)
             seen_labels.add(lbl)
+    related_by_id = read_models.faculty_nodes_by_id(
+        label_to_faculty_id[lbl] for lbl in related_faculty_labels if lbl in label_to_faculty_id
+    )
     faculties_list = []
     for lbl in related_faculty_labels:
-        fac = label_to_faculty.get(lbl)
+        fac = related_by_id.get(label_to_faculty_id.get(lbl))
         faculties_list.append({
             "label": lbl,
             "abbreviation": (fac.abbreviation if fac else "") or "",
@@ -246,33 +313,21 @@ def get_faculty(request: HttpRequest):
             "url": ((fac.url or "").strip() if fac else ""),
         })
 
-    # Related organisations: organisations that reference this faculty or any direct neighbor by label
-    anchor_labels = set([clean_name] + direct_neighbor_labels)
-    orgs = list(Organisation.objects.all())
-    organisations_list = []
-    for o in orgs:
-        min_dist = None
-        matched = False
-        for e in (o.knn_edges or []):
-            dst_label = (e.get("neighbor_label") or "").strip()
-            if not dst_label:
-                continue
-            if dst_label in anchor_labels:
-                matched = True
-                try:
-                    d = float(e.get("distance") or 0.0)
-                except Exception:
-                    d = 0.0
-                if (min_dist is None) or (d < min_dist):
-                    min_dist = d
-        if matched:
-            organisations_list.append({
-                "name": (o.name or "").strip(),
-                "abbreviation": (o.abbreviation or "").strip(),
-                "cluster": o.cluster,
-                "distance": min_dist if min_dist is not None else 0.0,
-                "url": (o.url or "").strip(),
-            })
+    # Related organisations: organisations with an edge into this faculty or any direct faculty neighbor
+    linking = graph_edges.incoming_min_distance(ORGANISATION, FACULTY, [faculty.id] + direct_faculty_ids)
+    orgs_by_id = read_models.organisation_nodes_by_id(org_id for org_id, _ in linking)
+    organisations_list = [
+        {
+            "name": (o.name or "").strip(),
+            "abbreviation": (o.abbreviation or "").strip(),
+            "cluster": o.cluster,
+            "distance": float(min_dist or 0.0),
+            "url": (o.url or "").strip(),
+        }
+        for org_id, min_dist in linking
+        for o in [orgs_by_id.get(org_id)]
+        if o is not None
+    ]
 
     return _add_cors_headers(
         request,
@@ -312,9 +367,8 @@ def get_organisation(request: HttpRequest):
     if not raw_name:
         return _add_cors_headers(request, JsonResponse({"error": "Missing name"}, status=400))
 
-    try:
-        org = Organisation.objects.get(name=raw_name)
-    except Organisation.DoesNotExist:
+    org = read_models.organisation_detail(name=raw_name)
+    if org is None:
         return _add_cors_headers(request, JsonResponse({"error": "Organisation not found"}, status=404))
 
     return _add_cors_headers(
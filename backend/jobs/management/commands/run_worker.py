@@ -0,0 +1,53 @@
+import os
+import signal
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs.registry import task_kinds
+from jobs.runner import claim_next, requeue_stale, run_job
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (graph rebuilds, data uploads, student embeddings)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is empty")
+        parser.add_argument("--poll", type=float, default=None, help="Seconds between polls when idle")
+        parser.add_argument("--kind", action="append", default=None, help=f"Only run these kinds ({', '.join(task_kinds())})")
+        parser.add_argument("--name", default=None, help="Worker name stored on claimed jobs")
+
+    def handle(self, *args, **options):
+        worker = options["name"] or f"{socket.gethostname()}:{os.getpid()}"
+        poll = options["poll"] if options["poll"] is not None else settings.JOBS_POLL_SECONDS
+        kinds = options["kind"]
+        stopping = False
+
+        def stop(signum, _frame):
+            # Finish the current job, then exit
+            nonlocal stopping
+            stopping = True
+            self.stdout.write(f"Received signal {signum}; stopping after the current job")
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        self.stdout.write(f"Worker {worker} started")
+        while not stopping:
+            close_old_connections()
+            requeued = requeue_stale()
+            if requeued:
+                self.stdout.write(f"Requeued or failed {requeued} stale job(s)")
+            job = claim_next(worker, kinds)
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(poll)
+                continue
+            self.stdout.write(f"Running {job.kind}#{job.pk} (attempt {job.attempts}/{job.max_attempts})")
+            job = run_job(job)
+            self.stdout.write(f"{job.kind}#{job.pk}: {job.status}")
+        self.stdout.write(f"Worker {worker} stopped")
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'running'), models.Q(('lock_key', ''), _negated=True)), fields=('lock_key',), name='job_one_running_per_lock'),
+        ),
+    ]
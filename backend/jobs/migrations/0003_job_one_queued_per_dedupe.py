@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:45
+
+from django.db import migrations, models
+
+
+def clear_duplicate_keys(apps, schema_editor):
+    # Jobs queued twice before the constraint existed keep running, only
+    # the newer copies stop being dedupe targets
+    Job = apps.get_model("jobs", "Job")
+    seen = set()
+    for pk, key in Job.objects.filter(status="queued", attempts=0).exclude(dedupe_key="").order_by("id").values_list("id", "dedupe_key"):
+        if key in seen:
+            Job.objects.filter(pk=pk).update(dedupe_key="")
+        seen.add(key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0002_job_one_running_per_lock'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_duplicate_keys, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('attempts', 0), ('status', 'queued'), models.Q(('dedupe_key', ''), _negated=True)), fields=('dedupe_key',), name='job_one_queued_per_dedupe'),
+        ),
+    ]
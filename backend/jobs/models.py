@@ -0,0 +1,80 @@
+from typing import Any, Dict
+
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    One unit of background work (graph rebuild, embedding run, ...) queued
+    in the database and executed by `manage.py run_worker`.
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUSES = [(QUEUED, "Queued"), (RUNNING, "Running"), (SUCCEEDED, "Succeeded"), (FAILED, "Failed")]
+
+    kind = models.CharField(max_length=64)
+    params = models.JSONField(default=dict, blank=True)
+    # Identical queued jobs (same kind + params) are coalesced; empty when
+    # the job was queued without deduplication
+    dedupe_key = models.CharField(max_length=64, blank=True, default="")
+    # Jobs sharing a non-empty lock key never run at the same time
+    lock_key = models.CharField(max_length=128, blank=True, default="")
+    status = models.CharField(max_length=16, choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    progress = models.FloatField(default=0.0)
+    progress_message = models.CharField(max_length=255, blank=True, default="")
+    result = models.JSONField(null=True, blank=True, default=None)
+    error = models.TextField(blank=True, default="")
+    worker = models.CharField(max_length=128, blank=True, default="")
+    run_after = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-id"]
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="job_status_idx"),
+            models.Index(fields=["lock_key", "status"], name="job_lock_idx"),
+            models.Index(fields=["dedupe_key", "status"], name="job_dedupe_idx"),
+        ]
+        constraints = [
+            # Enforced by the database so two workers can never both hold a lock key
+            models.UniqueConstraint(
+                fields=["lock_key"],
+                condition=models.Q(status="running") & ~models.Q(lock_key=""),
+                name="job_one_running_per_lock",
+            ),
+            # A fresh job is only queued once per dedupe key (see runner.enqueue);
+            # retries (attempts > 0) may wait next to a newer identical job
+            models.UniqueConstraint(
+                fields=["dedupe_key"],
+                condition=models.Q(status="queued", attempts=0) & ~models.Q(dedupe_key=""),
+                name="job_one_queued_per_dedupe",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.kind}#{self.pk} ({self.status})"
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.pk,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "progress": self.progress,
+            "progress_message": self.progress_message,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
@@ -0,0 +1,98 @@
+"""
+Job kinds and the context handed to a running job.
+
+A task is a plain function `fn(ctx, **params) -> result` registered with
+@task("kind"). The result must be JSON-serialisable; it is stored on the
+Job row. `lock_key` is formatted with the job params, and jobs with the
+same non-empty key are never run concurrently (e.g. "graph" for anything
+that rewrites edges, "student:{student_id}" per student).
+"""
+import inspect
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from django.utils import timezone
+
+from .models import Job
+
+
+class InvalidParams(ValueError):
+    """
+    Job params that don't fit the task's signature; retrying can't help.
+    """
+
+
+@dataclass(frozen=True)
+class TaskSpec:
+    kind: str
+    fn: Callable[..., Any]
+    lock_key: str = ""
+    max_attempts: int = 3
+    retry_delay: float = 30.0   # seconds before the first retry, doubled each attempt
+
+    def lock_for(self, params: Dict[str, Any]) -> str:
+        try:
+            return self.lock_key.format(**params)
+        except (KeyError, IndexError):
+            return self.lock_key
+
+    def check_params(self, params: Dict[str, Any]) -> None:
+        """
+        Raise InvalidParams unless fn(ctx, **params) would bind.
+        """
+        try:
+            inspect.signature(self.fn).bind(None, **params)
+        except TypeError as e:
+            raise InvalidParams(f"Invalid params for {self.kind!r}: {e}") from None
+
+
+_TASKS: Dict[str, TaskSpec] = {}
+
+
+def task(kind: str, lock_key: str = "", max_attempts: int = 3, retry_delay: float = 30.0):
+    def register(fn: Callable[..., Any]) -> Callable[..., Any]:
+        _TASKS[kind] = TaskSpec(kind, fn, lock_key, max_attempts, retry_delay)
+        return fn
+    return register
+
+
+def get_task(kind: str) -> Optional[TaskSpec]:
+    return _TASKS.get(kind)
+
+
+def task_kinds() -> List[str]:
+    return sorted(_TASKS)
+
+
+class JobContext:
+    """
+    Progress/log sink for a running job. Progress writes are throttled so
+    chatty tasks don't turn into one UPDATE per log line.
+    """
+
+    def __init__(self, job: Job, min_interval: float = 1.0):
+        self.job = job
+        self.min_interval = min_interval
+        self._last_write = 0.0
+
+    def progress(self, fraction: Optional[float] = None, message: str = "", force: bool = False) -> None:
+        if fraction is not None:
+            self.job.progress = max(0.0, min(1.0, float(fraction)))
+        if message:
+            self.job.progress_message = message[:255]
+        now = time.monotonic()
+        if not force and now - self._last_write < self.min_interval:
+            return
+        self._last_write = now
+        Job.objects.filter(pk=self.job.pk).update(
+            progress=self.job.progress,
+            progress_message=self.job.progress_message,
+            heartbeat_at=timezone.now(),
+        )
+
+    def log(self, message: str) -> None:
+        # Script-style output: keep the latest line as the progress message
+        message = str(message).strip()
+        if message:
+            self.progress(message=message.splitlines()[-1])
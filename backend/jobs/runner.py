@@ -0,0 +1,198 @@
+"""
+Database-backed job queue: enqueue from anywhere (views, signals, shell),
+execute in `manage.py run_worker`.
+
+Claiming is a single conditional UPDATE (queued -> running), so several
+workers can poll the same table; a job whose lock key is held by another
+running job is left queued until that one finishes. The lock itself is a
+partial unique index (one RUNNING job per lock key), so it holds under any
+isolation level, not only when the claims happen to be serialized.
+"""
+import hashlib
+import json
+import logging
+import threading
+import traceback
+from datetime import timedelta
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from .models import Job
+from .registry import InvalidParams, JobContext, get_task
+
+logger = logging.getLogger(__name__)
+
+
+def _dedupe_key(kind: str, params: Dict[str, Any]) -> str:
+    raw = json.dumps([kind, params], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def enqueue(kind: str, params: Optional[Dict[str, Any]] = None, dedupe: bool = True) -> Tuple[Job, bool]:
+    """
+    Queue a job of a registered kind. With `dedupe`, an identical job that
+    is still waiting is returned instead of adding another one; the partial
+    unique index job_one_queued_per_dedupe settles concurrent enqueues.
+    Returns (job, created). Raises ValueError for an unknown kind and
+    InvalidParams if `params` don't match the task's arguments.
+    """
+    spec = get_task(kind)
+    if spec is None:
+        raise ValueError(f"Unknown job kind {kind!r}")
+    params = dict(params or {})
+    spec.check_params(params)
+    key = _dedupe_key(kind, params) if dedupe else ""
+    if dedupe:
+        existing = Job.objects.filter(dedupe_key=key, status=Job.QUEUED).order_by("id").first()
+        if existing is not None:
+            return existing, False
+    try:
+        with transaction.atomic():
+            job = Job.objects.create(
+                kind=kind,
+                params=params,
+                dedupe_key=key,
+                lock_key=spec.lock_for(params),
+                max_attempts=spec.max_attempts,
+            )
+    except IntegrityError:
+        # Another request queued the same job between the lookup and the insert
+        existing = Job.objects.filter(dedupe_key=key, status=Job.QUEUED).order_by("id").first()
+        if existing is None:
+            raise
+        return existing, False
+    return job, True
+
+
+def claim_next(worker: str, kinds: Optional[Iterable[str]] = None) -> Optional[Job]:
+    """
+    Atomically move the oldest runnable job to RUNNING and return it.
+    """
+    now = timezone.now()
+    lock_busy = Job.objects.filter(status=Job.RUNNING, lock_key=OuterRef("lock_key")).exclude(lock_key="")
+    runnable = (
+        Job.objects.filter(status=Job.QUEUED, run_after__lte=now)
+        .filter(Q(lock_key="") | ~Exists(lock_busy))
+    )
+    if kinds:
+        runnable = runnable.filter(kind__in=list(kinds))
+    for pk, attempts in runnable.order_by("run_after", "id").values_list("id", "attempts")[:20]:
+        # The lock check in the UPDATE skips keys that are visibly busy; a
+        # claim racing another worker's uncommitted one for the same key is
+        # rejected by job_one_running_per_lock instead
+        try:
+            with transaction.atomic():
+                claimed = (
+                    Job.objects.filter(pk=pk, status=Job.QUEUED)
+                    .filter(Q(lock_key="") | ~Exists(lock_busy))
+                    .update(
+                        status=Job.RUNNING,
+                        worker=worker,
+                        attempts=attempts + 1,
+                        started_at=now,
+                        heartbeat_at=now,
+                        error="",
+                    )
+                )
+        except IntegrityError:
+            continue
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def requeue_stale(timeout: Optional[float] = None) -> int:
+    """
+    Put RUNNING jobs whose worker stopped heartbeating back in the queue,
+    or mark them FAILED once they have used up their attempts (a job that
+    keeps killing its worker must not be retried forever).
+    Returns the number of jobs requeued or failed.
+    """
+    timeout = settings.JOBS_STALE_AFTER_SECONDS if timeout is None else timeout
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.RUNNING, heartbeat_at__lt=now - timedelta(seconds=timeout))
+    failed = stale.filter(attempts__gte=F("max_attempts")).update(
+        status=Job.FAILED,
+        worker="",
+        finished_at=now,
+        error="Worker stopped responding on the last attempt",
+        progress_message="Failed after worker timeout",
+    )
+    requeued = stale.filter(attempts__lt=F("max_attempts")).update(
+        status=Job.QUEUED,
+        worker="",
+        progress_message="Requeued after worker timeout",
+    )
+    if failed:
+        logger.error("%s stale job(s) used up their attempts and were marked failed", failed)
+    return failed + requeued
+
+
+class _Heartbeat(threading.Thread):
+    def __init__(self, job_id: int, interval: float):
+        super().__init__(daemon=True, name=f"job-{job_id}-heartbeat")
+        self.job_id = job_id
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        try:
+            while not self.stopped.wait(self.interval):
+                Job.objects.filter(pk=self.job_id, status=Job.RUNNING).update(heartbeat_at=timezone.now())
+        finally:
+            connection.close()
+
+
+def run_job(job: Job) -> Job:
+    """
+    Execute a claimed job and record the outcome. Failures are retried with
+    exponential backoff until max_attempts is reached; a job whose params
+    don't fit the task fails at once.
+    """
+    spec = get_task(job.kind)
+    heartbeat = _Heartbeat(job.pk, settings.JOBS_HEARTBEAT_SECONDS)
+    heartbeat.start()
+    ctx = JobContext(job)
+    try:
+        if spec is None:
+            raise ValueError(f"Unknown job kind {job.kind!r}")
+        params = job.params or {}
+        spec.check_params(params)
+        result = spec.fn(ctx, **params)
+    except Exception as e:
+        job.error = traceback.format_exc()
+        job.finished_at = timezone.now()
+        if job.attempts < job.max_attempts and spec is not None and not isinstance(e, InvalidParams):
+            delay = spec.retry_delay * (2 ** (job.attempts - 1))
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + timedelta(seconds=delay)
+            job.progress_message = f"Attempt {job.attempts} failed ({e}); retrying in {delay:.0f}s"[:255]
+            logger.warning("Job %s failed (attempt %s/%s): %s", job.pk, job.attempts, job.max_attempts, e)
+        else:
+            job.status = Job.FAILED
+            job.progress_message = f"Failed: {e}"[:255]
+            logger.error("Job %s failed permanently: %s", job.pk, e)
+    else:
+        job.status = Job.SUCCEEDED
+        job.result = result
+        job.progress = 1.0
+        job.finished_at = timezone.now()
+    finally:
+        heartbeat.stopped.set()
+        heartbeat.join()
+    close_old_connections()
+    Job.objects.filter(pk=job.pk).update(
+        status=job.status,
+        result=job.result,
+        error=job.error,
+        progress=job.progress,
+        progress_message=job.progress_message,
+        run_after=job.run_after,
+        finished_at=job.finished_at,
+        heartbeat_at=timezone.now(),
+    )
+    return job
@@ -0,0 +1,99 @@
+"""
+Built-in job kinds. Anything that rewrites graph edges shares the "graph"
+lock so rebuilds, incremental updates and data uploads run one at a time.
+"""
+import io
+import runpy
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from asgiref.sync import async_to_sync
+
+from .registry import JobContext, task
+
+SCRIPTS_DIR = Path(__file__).resolve().parents[1] / "scripts"
+
+
+class _LogWriter(io.TextIOBase):
+    # Forward print() output from the data scripts to the job's progress message
+    def __init__(self, ctx: JobContext):
+        self.ctx = ctx
+
+    def write(self, text: str) -> int:
+        self.ctx.log(text)
+        return len(text)
+
+
+def _run_script(ctx: JobContext, name: str) -> None:
+    script = runpy.run_path(str(SCRIPTS_DIR / name))
+    with redirect_stdout(_LogWriter(ctx)):
+        script["main"]()
+
+
+@task("compute_graph", lock_key="graph", max_attempts=2)
+def compute_graph(
+    ctx: JobContext,
+    params: Optional[Dict[str, Any]] = None,
+    node_types: Optional[List[str]] = None,
+    edges: bool = True,
+    clusters: bool = True,
+    use_cache: bool = True,
+) -> Dict[str, Any]:
+    from graph_integration.edges import FACULTY, ORGANISATION
+    from graph_integration.pipeline import GraphParams, GraphPipeline, persist
+
+    graph_params = GraphParams.from_dict(params or {})
+    types = list(node_types or (FACULTY, ORGANISATION))
+    pipeline = GraphPipeline(graph_params, use_cache=use_cache, log=ctx.log)
+    results = {}
+    for i, node_type in enumerate(types):
+        ctx.progress(0.8 * i / len(types), f"[{node_type}] computing", force=True)
+        results.update(pipeline.run((node_type,), edges=edges, clusters=clusters))
+    ctx.progress(0.8, "Saving edges and clusters", force=True)
+    build_version = persist(results, graph_params, log=ctx.log)
+    return {
+        "build_version": build_version,
+        "nodes": {node_type: len(result.nodes) for node_type, result in results.items()},
+    }
+
+
+@task("graph_update", lock_key="graph")
+def graph_update(ctx: JobContext, node_type: str, node_ids: Iterable[int]) -> Dict[str, Any]:
+    from graph_integration.incremental import update_graph_nodes
+
+    ids = [int(pk) for pk in node_ids]
+    outcome = update_graph_nodes(node_type, ids, log=ctx.log)
+    return {"outcome": outcome, "nodes": len(ids)}
+
+
+@task("upload_faculties", lock_key="graph", max_attempts=2, retry_delay=120.0)
+def upload_faculties(ctx: JobContext) -> Dict[str, Any]:
+    _run_script(ctx, "main.py")
+    return {"message": ctx.job.progress_message}
+
+
+@task("upload_organisations", lock_key="graph", max_attempts=2, retry_delay=120.0)
+def upload_organisations(ctx: JobContext) -> Dict[str, Any]:
+    _run_script(ctx, "upload_organisations.py")
+    return {"message": ctx.job.progress_message}
+
+
+@task("student_embedding", lock_key="student:{student_id}")
+def student_embedding(ctx: JobContext, student_id: int, k: int = 3) -> Dict[str, Any]:
+    from graph_integration.vector_index import get_vector_index
+    from openai_integration.models import Student
+    from openai_integration.student_embedding import aupdate_student_embedding
+
+    student = Student.objects.get(id=student_id)
+    ctx.progress(0.1, "Embedding new messages", force=True)
+    embedding = async_to_sync(aupdate_student_embedding)(student)
+    if embedding is None:
+        return {"student_id": student.id, "name": student.name, "neighbors": []}
+    ctx.progress(0.9, "Searching neighbors", force=True)
+    matches = get_vector_index().search(embedding, k=int(k))
+    return {
+        "student_id": student.id,
+        "name": student.name,
+        "neighbors": [{**item, "distance": dist} for item, dist in matches],
+    }
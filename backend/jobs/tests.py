@@ -0,0 +1,128 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Job
+from .runner import claim_next, enqueue, requeue_stale
+
+
+class EnqueueTests(TestCase):
+    def test_identical_queued_job_is_reused(self):
+        job, created = enqueue("compute_graph", {"use_cache": False})
+        again, created_again = enqueue("compute_graph", {"use_cache": False})
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(again.pk, job.pk)
+        self.assertEqual(enqueue("compute_graph", {"use_cache": True})[1], True)
+        self.assertEqual(enqueue("compute_graph", {"use_cache": False}, dedupe=False)[1], True)
+
+    def test_concurrent_enqueue_returns_the_winner(self):
+        job, _ = enqueue("compute_graph")
+        # The other request's lookup ran before this job was inserted
+        lookup = Job.objects.filter
+        with mock.patch.object(Job.objects, "filter", side_effect=[Job.objects.none(), lookup(pk=job.pk)]):
+            again, created = enqueue("compute_graph")
+        self.assertFalse(created)
+        self.assertEqual(again.pk, job.pk)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_invalid_params(self):
+        with self.assertRaises(ValueError):
+            enqueue("no_such_kind")
+        with self.assertRaises(ValueError):
+            enqueue("compute_graph", {"unknown": 1})
+
+
+class ClaimTests(TestCase):
+    def test_claims_oldest_runnable_job(self):
+        later = Job.objects.create(kind="compute_graph", run_after=timezone.now() + timedelta(hours=1))
+        first = Job.objects.create(kind="compute_graph", params={"a": 1})
+        second = Job.objects.create(kind="compute_graph", params={"a": 2})
+        claimed = claim_next("w1")
+        self.assertEqual(claimed.pk, first.pk)
+        self.assertEqual((claimed.status, claimed.worker, claimed.attempts), (Job.RUNNING, "w1", 1))
+        self.assertEqual(claim_next("w2").pk, second.pk)
+        self.assertIsNone(claim_next("w3"))
+        self.assertEqual(Job.objects.get(pk=later.pk).status, Job.QUEUED)
+
+    def test_lock_key_held_by_running_job(self):
+        graph = Job.objects.create(kind="compute_graph", lock_key="graph")
+        blocked = Job.objects.create(kind="graph_update", lock_key="graph")
+        free = Job.objects.create(kind="student_embedding", lock_key="student:1")
+        self.assertEqual(claim_next("w1").pk, graph.pk)
+        self.assertEqual(claim_next("w2").pk, free.pk)
+        self.assertIsNone(claim_next("w3"))
+        Job.objects.filter(pk=graph.pk).update(status=Job.SUCCEEDED)
+        self.assertEqual(claim_next("w3").pk, blocked.pk)
+
+    def test_database_rejects_second_running_job_per_lock(self):
+        Job.objects.create(kind="compute_graph", lock_key="graph", status=Job.RUNNING)
+        other = Job.objects.create(kind="graph_update", lock_key="graph")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Job.objects.filter(pk=other.pk).update(status=Job.RUNNING)
+        # Jobs without a lock key are not constrained
+        Job.objects.create(kind="compute_graph", status=Job.RUNNING)
+        Job.objects.create(kind="compute_graph", status=Job.RUNNING)
+
+    def test_kinds_filter(self):
+        Job.objects.create(kind="compute_graph")
+        student = Job.objects.create(kind="student_embedding")
+        self.assertEqual(claim_next("w1", kinds=["student_embedding"]).pk, student.pk)
+        self.assertIsNone(claim_next("w1", kinds=["student_embedding"]))
+
+
+class RequeueStaleTests(TestCase):
+    def test_requeues_or_fails_by_attempts(self):
+        old = timezone.now() - timedelta(hours=1)
+        retry = Job.objects.create(kind="compute_graph", status=Job.RUNNING, attempts=1, max_attempts=3, heartbeat_at=old)
+        spent = Job.objects.create(kind="compute_graph", status=Job.RUNNING, attempts=3, max_attempts=3, heartbeat_at=old)
+        alive = Job.objects.create(kind="compute_graph", status=Job.RUNNING, attempts=1, heartbeat_at=timezone.now())
+        with self.assertLogs("jobs.runner", "ERROR"):
+            self.assertEqual(requeue_stale(timeout=60), 2)
+        retry.refresh_from_db()
+        spent.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual((retry.status, retry.worker), (Job.QUEUED, ""))
+        self.assertEqual(spent.status, Job.FAILED)
+        self.assertIsNotNone(spent.finished_at)
+        self.assertEqual(alive.status, Job.RUNNING)
+        self.assertEqual(claim_next("w1").pk, retry.pk)
+
+
+@override_settings(JOBS_API_TOKEN="secret")
+class JobViewTests(TestCase):
+    BODY = '{"kind": "compute_graph", "params": {}}'
+
+    def test_requires_authentication(self):
+        job = Job.objects.create(kind="compute_graph")
+        self.assertEqual(self.client.post("/api/jobs/", self.BODY, content_type="application/json").status_code, 401)
+        self.assertEqual(self.client.get("/api/jobs/").status_code, 401)
+        self.assertEqual(self.client.get(f"/api/jobs/{job.pk}/").status_code, 401)
+        response = self.client.get("/api/jobs/", HTTP_AUTHORIZATION="Bearer wrong")
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(Job.objects.exclude(pk=job.pk).exists())
+
+    def test_token(self):
+        response = self.client.post(
+            "/api/jobs/", self.BODY, content_type="application/json", HTTP_AUTHORIZATION="Bearer secret"
+        )
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["job"]["id"]
+        response = self.client.get(f"/api/jobs/{job_id}/", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.json()["job"]["status"], Job.QUEUED)
+
+    @override_settings(JOBS_API_TOKEN="")
+    def test_staff_session(self):
+        user = User.objects.create_user("student", password="x")
+        self.client.force_login(user)
+        self.assertEqual(self.client.get("/api/jobs/").status_code, 401)
+        user.is_staff = True
+        user.save()
+        self.assertEqual(self.client.get("/api/jobs/").status_code, 200)
+        # With no token configured, no bearer token is accepted
+        self.client.logout()
+        self.assertEqual(self.client.get("/api/jobs/", HTTP_AUTHORIZATION="Bearer ").status_code, 401)
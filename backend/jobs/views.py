@@ -0,0 +1,105 @@
+import hmac
+import json
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from .models import Job
+from .registry import task_kinds
+from .runner import enqueue
+
+
+def _add_cors_headers(request: HttpRequest, response: HttpResponse) -> HttpResponse:
+    origin = request.headers.get("Origin") or "*"
+    response["Access-Control-Allow-Origin"] = origin
+    patch_vary_headers(response, ["Origin"])
+    response["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
+    acrh = request.headers.get("Access-Control-Request-Headers") or "Content-Type, Authorization"
+    response["Access-Control-Allow-Headers"] = acrh
+    response["Access-Control-Max-Age"] = "86400"
+    return response
+
+
+def _authorized(request: HttpRequest) -> bool:
+    """
+    Staff users (session login), or "Authorization: Bearer <JOBS_API_TOKEN>"
+    when a token is configured. Jobs spend API credits and CPU, and their
+    params and errors are internal.
+    """
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated and user.is_staff:
+        return True
+    token = settings.JOBS_API_TOKEN
+    header = request.headers.get("Authorization", "")
+    if not token or not header.startswith("Bearer "):
+        return False
+    return hmac.compare_digest(header[len("Bearer "):].strip().encode(), token.encode())
+
+
+def _unauthorized(request: HttpRequest) -> HttpResponse:
+    response = JsonResponse({"error": "Authentication required"}, status=401)
+    response["WWW-Authenticate"] = "Bearer"
+    return _add_cors_headers(request, response)
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST", "OPTIONS"])
+def jobs(request: HttpRequest):
+    """
+    GET: recent jobs (?status=&kind=&limit=). POST {"kind", "params"}: queue a job.
+    """
+    if request.method == "OPTIONS":
+        return _add_cors_headers(request, JsonResponse({}))
+    if not _authorized(request):
+        return _unauthorized(request)
+
+    if request.method == "GET":
+        qs = Job.objects.all()
+        status = request.GET.get("status")
+        kind = request.GET.get("kind")
+        if status:
+            qs = qs.filter(status=status)
+        if kind:
+            qs = qs.filter(kind=kind)
+        try:
+            limit = max(1, min(int(request.GET.get("limit", 50)), 500))
+        except ValueError:
+            return _add_cors_headers(request, JsonResponse({"error": "Invalid limit"}, status=400))
+        return _add_cors_headers(request, JsonResponse({"jobs": [job.as_dict() for job in qs[:limit]]}))
+
+    try:
+        payload = json.loads((request.body or b"").decode("utf-8") or "{}")
+    except json.JSONDecodeError:
+        return _add_cors_headers(request, JsonResponse({"error": "Invalid JSON"}, status=400))
+
+    kind = payload.get("kind")
+    if kind not in task_kinds():
+        return _add_cors_headers(request, JsonResponse(
+            {"error": f"Field 'kind' must be one of: {', '.join(task_kinds())}"}, status=400
+        ))
+    params = payload.get("params") or {}
+    if not isinstance(params, dict):
+        return _add_cors_headers(request, JsonResponse({"error": "Field 'params' must be an object"}, status=400))
+
+    try:
+        job, created = enqueue(kind, params)
+    except ValueError as e:
+        return _add_cors_headers(request, JsonResponse({"error": str(e)}, status=400))
+    return _add_cors_headers(request, JsonResponse({"job": job.as_dict(), "created": created}, status=202))
+
+
+@csrf_exempt
+@require_http_methods(["GET", "OPTIONS"])
+def job_status(request: HttpRequest, job_id: int):
+    if request.method == "OPTIONS":
+        return _add_cors_headers(request, JsonResponse({}))
+    if not _authorized(request):
+        return _unauthorized(request)
+    try:
+        job = Job.objects.get(pk=job_id)
+    except Job.DoesNotExist:
+        return _add_cors_headers(request, JsonResponse({"error": "Job not found"}, status=404))
+    return _add_cors_headers(request, JsonResponse({"job": job.as_dict()}))
@@ -1,12 +1,33 @@
 from django.contrib import admin
+from django.db.models import Count
+
+from .models import Student, StudentEmbeddingChunk, StudentMessage
+
+
+class StudentMessageInline(admin.TabularInline):
+    model = StudentMessage
+    fields = ("created_at", "role", "content")
+    readonly_fields = ("created_at", "role", "content")
+    extra = 0
+    can_delete = False
 
-from .models import Student
 
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
-    list_display = ("name", "messages_count")
-    readonly_fields = ("messages_count",)
+    list_display = ("name", "messages_count", "embedded_message_count")
+    readonly_fields = ("messages_count", "embedded_message_count", "embedding_weight")
+    inlines = [StudentMessageInline]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(_messages_count=Count("chat_messages"))
 
     def messages_count(self, obj: Student) -> int:
-        return len(obj.messages or [])
+        return obj._messages_count
     messages_count.short_description = "Messages"
+
+
+@admin.register(StudentEmbeddingChunk)
+class StudentEmbeddingChunkAdmin(admin.ModelAdmin):
+    list_display = ("student", "start_index", "end_index", "weight", "created_at")
+    list_select_related = ("student",)
+    exclude = ("embedding",)
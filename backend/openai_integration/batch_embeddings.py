@@ -0,0 +1,231 @@
+"""
+Concurrent batch embedding for the upload scripts.
+
+Texts missing from the embedding cache are packed into batches bounded by
+both input count and (estimated) token count, and the batches are sent
+`concurrency` at a time from a thread pool. 429s and transient server
+errors are retried with exponential backoff; a Retry-After header pauses
+every worker, not just the one that was throttled. Each finished batch is
+written to the embedding cache straight away, so the cache doubles as the
+checkpoint: a rerun after a crash only sends what is still missing.
+
+Pool threads only make HTTP requests. Cache writes and progress messages
+happen on the calling thread, so the pool never opens its own SQLite
+connections and a `log` callback that writes to the database (a job's
+ctx.log) is never called from a worker thread.
+
+Point OPENAI_BASE_URL at scripts/fake_embeddings_server.py to exercise
+this without the real API.
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+
+from .embedding_cache import EmbeddingCache, get_embedding_cache
+from .tokens import token_counter
+
+try:
+    import openai
+except Exception:  # pragma: no cover
+    openai = None
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying
+_RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def plan_batches(
+    texts: Sequence[str],
+    count_tokens: Callable[[str], int],
+    max_inputs: int,
+    max_tokens: int,
+) -> List[List[str]]:
+    """
+    Split texts, in order, into batches of at most max_inputs texts and
+    max_tokens estimated tokens (a single oversized text gets its own batch).
+    """
+    batches: List[List[str]] = []
+    batch: List[str] = []
+    tokens = 0
+    for text in texts:
+        n = count_tokens(text)
+        if batch and (len(batch) >= max_inputs or tokens + n > max_tokens):
+            batches.append(batch)
+            batch, tokens = [], 0
+        batch.append(text)
+        tokens += n
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def retry_after_seconds(headers) -> Optional[float]:
+    """
+    Delay requested by the server: retry-after-ms, or Retry-After in
+    seconds or as an HTTP date.
+    """
+    if headers is None:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_delay(error: Exception) -> Optional[float]:
+    """
+    None if the error is not retryable, else the server-requested delay
+    (0.0 when the server did not ask for one).
+    """
+    if openai is None:
+        return None
+    if isinstance(error, openai.APIConnectionError):
+        return 0.0
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code not in _RETRY_STATUSES:
+            return None
+        return retry_after_seconds(error.response.headers) or 0.0
+    return None
+
+
+class BatchEmbedder:
+    """
+    Embed many texts through the cache with bounded concurrency and retries.
+    """
+
+    def __init__(
+        self,
+        client,
+        model: str,
+        concurrency: Optional[int] = None,
+        max_inputs: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        max_retries: int = 6,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        cache: Optional[EmbeddingCache] = None,
+        log: Callable[[str], None] = logger.info,
+    ):
+        # Retries are handled here, so the SDK's own retry loop is disabled
+        self.client = client.with_options(max_retries=0) if hasattr(client, "with_options") else client
+        self.model = model
+        self.concurrency = max(1, concurrency or settings.EMBEDDING_BATCH_CONCURRENCY)
+        self.max_inputs = max(1, max_inputs or settings.EMBEDDING_BATCH_MAX_INPUTS)
+        self.max_tokens = max(1, max_tokens or settings.EMBEDDING_BATCH_MAX_TOKENS)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.cache = cache or get_embedding_cache()
+        self.log = log
+        self.count_tokens = token_counter(model)
+        self.retries = 0
+        self._pause_until = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _wait_for_pause(self) -> None:
+        while not self._stop.is_set():
+            with self._lock:
+                remaining = self._pause_until - time.monotonic()
+            if remaining <= 0:
+                return
+            self._stop.wait(remaining)
+
+    def _request(self, batch: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            self._wait_for_pause()
+            if self._stop.is_set():
+                raise RuntimeError("Embedding run aborted")
+            try:
+                resp = self.client.embeddings.create(model=self.model, input=batch)
+            except Exception as e:
+                requested = _retry_delay(e)
+                if requested is None or attempt >= self.max_retries:
+                    raise
+                if requested:
+                    # The server said how long to wait; add a little jitter so workers don't stampede
+                    delay = min(self.max_backoff, requested) * (1.0 + random.random() / 10)
+                else:
+                    delay = min(self.max_backoff, self.backoff * (2 ** attempt)) * (0.5 + random.random() / 2)
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+                    # Throttling applies to the whole key, so every worker backs off
+                    if requested:
+                        self._pause_until = max(self._pause_until, time.monotonic() + delay)
+                logger.warning(
+                    "Embedding batch of %s failed (%s); retry %s in %.1fs", len(batch), e.__class__.__name__, attempt, delay
+                )
+                if not requested:
+                    self._stop.wait(delay)
+                continue
+            data = sorted(resp.data or [], key=lambda d: d.index)
+            if len(data) != len(batch) or not all(getattr(d, "embedding", None) for d in data):
+                raise RuntimeError(f"Embedding count mismatch. Expected {len(batch)}, got {len(data)}")
+            return [d.embedding for d in data]
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        """
+        Vectors for all texts, in input order.
+        """
+        texts = list(texts)
+        vectors = self.cache.get_many(self.model, texts)
+        pending = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if not pending:
+            return vectors  # type: ignore[return-value]
+
+        batches = plan_batches(pending, self.count_tokens, self.max_inputs, self.max_tokens)
+        self.log(f"Embedding {len(pending)} new texts in {len(batches)} batches ({self.concurrency} concurrent)")
+        fresh: Dict[str, List[float]] = {}
+        done = 0
+        self._stop.clear()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embed") as pool:
+            futures = {pool.submit(self._request, batch): batch for batch in batches}
+            not_done = set(futures)
+            while not_done:
+                finished, not_done = wait(not_done, return_when=FIRST_EXCEPTION)
+                failed = [f for f in finished if f.exception() is not None]
+                if failed:
+                    # Let in-flight batches finish (and checkpoint them below), skip the rest
+                    self._stop.set()
+                    for other in not_done:
+                        other.cancel()
+                    finished |= wait(not_done).done
+                    not_done = set()
+                for future in finished:
+                    if future.cancelled() or future.exception() is not None:
+                        continue
+                    batch = futures[future]
+                    result = future.result()
+                    # Checkpoint: later batches can fail without losing this one
+                    self.cache.put_many(self.model, batch, result)
+                    # Same float32 values a later cache hit returns
+                    for text, vec in zip(batch, result):
+                        fresh[text] = np.asarray(vec, dtype=np.float32).tolist()
+                    done += len(batch)
+                    self.log(f"Embedded {done}/{len(pending)} new texts")
+                if failed:
+                    raise failed[0].exception()
+        return [v if v is not None else fresh[t] for t, v in zip(texts, vectors)]
@@ -0,0 +1,147 @@
+"""
+Bounded conversation context for assistant replies.
+
+A reply sees the system prompt, the student's rolling summary and as many
+of the most recent messages as fit in CHAT_CONTEXT_TOKEN_BUDGET (counted
+locally, see tokens.py). Messages older than the last CHAT_HISTORY_TURNS
+turns are folded into the summary CHAT_SUMMARY_EVERY_TURNS turns at a time
+by a small model; the fold runs alongside reply generation, so per-turn
+input stays bounded without adding a round trip to the reply path.
+
+Between folds the sent history only grows at the end, so consecutive
+requests share their prefix (see prompts.py). When the budget forces
+older messages out, they are dropped a whole fold step at a time, so the
+prefix moves every few turns rather than on every turn.
+"""
+import logging
+import time
+from dataclasses import dataclass
+from typing import List
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import Student, StudentMessage
+from .prompts import HISTORY_SUMMARY, REPLY_MODEL, UNIZG_SYSTEM, PromptTemplate, summary_text
+from .tokens import token_counter
+from .usage import record_usage
+
+logger = logging.getLogger(__name__)
+
+# Per-message framing tokens (role, separators) in the Responses API input
+_MESSAGE_OVERHEAD = 4
+# Longest slice of a single message fed to the summarizer
+_SUMMARY_MESSAGE_CHARS = 2000
+
+
+@dataclass(frozen=True)
+class ReplyContext:
+    chat_history: List[dict]
+    summary: str
+    tokens: int           # estimated input tokens of the request
+    omitted: int = 0      # unsummarized messages left out to fit the budget
+
+
+def count_tokens(text: str) -> int:
+    return token_counter(REPLY_MODEL)(text or "")
+
+
+def _first_kept(costs: List[int], available: int, step: int) -> int:
+    """
+    Index of the first message to send: the fewest leading messages are
+    dropped to fit `available` tokens, rounded up to a multiple of `step`
+    (unless that would drop them all) so the cut stays put for a few turns.
+    """
+    total = sum(costs)
+    drop = 0
+    while drop < len(costs) and total > available:
+        total -= costs[drop]
+        drop += 1
+    if drop == 0:
+        return 0
+    rounded = -(-drop // step) * step
+    return rounded if rounded < len(costs) else drop
+
+
+def build_reply_context(student: Student, input_text: str, prompt: PromptTemplate = UNIZG_SYSTEM) -> ReplyContext:
+    """
+    Summary plus the newest unsummarized messages that fit the token
+    budget after the system prompt, summary and new input are counted.
+    """
+    qs = StudentMessage.objects.filter(student_id=student.pk).order_by("created_at", "id")
+    total = qs.count()
+    summarized = min(student.summarized_message_count, total)
+    summary = student.history_summary if summarized else ""
+    step = 2 * max(1, settings.CHAT_SUMMARY_EVERY_TURNS)
+    # Never read more than the verbatim window plus one pending fold; if folding
+    # falls behind, skip ahead in whole steps so the first message sent stays fixed
+    window = 2 * settings.CHAT_HISTORY_TURNS + step
+    start = summarized + max(0, -(-(total - summarized - window) // step) * step)
+    candidates = [row.as_item() for row in qs[start:total]]
+
+    used = prompt.tokens + count_tokens(input_text) + _MESSAGE_OVERHEAD
+    if summary:
+        used += count_tokens(summary_text(summary)) + _MESSAGE_OVERHEAD
+    costs = [count_tokens(m["content"]) + _MESSAGE_OVERHEAD for m in candidates]
+    first = _first_kept(costs, settings.CHAT_CONTEXT_TOKEN_BUDGET - used, step)
+    kept = candidates[first:]
+    return ReplyContext(
+        chat_history=kept,
+        summary=summary,
+        tokens=used + sum(costs[first:]),
+        omitted=total - summarized - len(kept),
+    )
+
+
+def _summary_input(summary: str, messages: List[dict]) -> str:
+    lines = [f"Current summary:\n{summary or '(none)'}", "", "New messages:"]
+    for message in messages:
+        speaker = "Assistant" if message["role"] == StudentMessage.AGENT else "Student"
+        lines.append(f"{speaker}: {message['content'][:_SUMMARY_MESSAGE_CHARS]}")
+    return "\n".join(lines)
+
+
+def _messages_between(student: Student, start: int, end: int) -> List[dict]:
+    qs = StudentMessage.objects.filter(student_id=student.pk).order_by("created_at", "id")
+    return list(qs.values("role", "content")[start:end])
+
+
+async def afold_history(student: Student, client) -> bool:
+    """
+    Fold messages older than the verbatim window into the student's
+    summary once at least CHAT_SUMMARY_EVERY_TURNS turns are pending.
+    Runs after the new user message is stored; that message is the
+    request's input, not history, so it is left out of the window.
+    Returns True if the summary advanced. Never raises: a failed fold
+    only means the next request carries a few more verbatim messages.
+    """
+    try:
+        total = await StudentMessage.objects.filter(student_id=student.pk).acount()
+        start = student.summarized_message_count
+        end = total - 1 - 2 * settings.CHAT_HISTORY_TURNS
+        if end - start < 2 * settings.CHAT_SUMMARY_EVERY_TURNS:
+            return False
+        messages = await sync_to_async(_messages_between)(student, start, end)
+        started = time.perf_counter()
+        resp = await client.responses.create(
+            model=settings.CHAT_SUMMARY_MODEL,
+            instructions=HISTORY_SUMMARY.text,
+            input=_summary_input(student.history_summary, messages),
+            max_output_tokens=settings.CHAT_SUMMARY_MAX_TOKENS,
+        )
+        record_usage("summary", resp.usage, time.perf_counter() - started)
+        summary = (resp.output_text or "").strip()
+        if not summary:
+            return False
+        # Only advance from the state we summarized (a concurrent fold may have won)
+        updated = await Student.objects.filter(pk=student.pk, summarized_message_count=start).aupdate(
+            history_summary=summary,
+            summarized_message_count=end,
+        )
+    except Exception:
+        logger.exception("Folding conversation history failed for student %s", student.pk)
+        return False
+    if updated:
+        student.history_summary = summary
+        student.summarized_message_count = end
+    return bool(updated)
@@ -0,0 +1,192 @@
+"""
+Persistent embedding cache keyed by (model, sha256(text)).
+
+Backed by a local SQLite file shared by the web process and the upload
+scripts, so unchanged texts (faculty/organisation records, repeated
+student conversations) are never sent to the embeddings API twice.
+Entries are evicted least-recently-used once the stored vectors exceed
+EMBEDDING_CACHE_MAX_BYTES.
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    model TEXT NOT NULL,
+    text_sha256 TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (model, text_sha256)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS embedding_cache_last_used ON embedding_cache (last_used);
+"""
+
+# SQLite limits host parameters per statement; stay well below it
+_LOOKUP_CHUNK = 500
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    SQLite-backed (model, text hash) -> float32 vector store with LRU
+    eviction and per-process hit/miss counters.
+    """
+
+    def __init__(self, path: Path, max_bytes: int):
+        self.path = Path(path)
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets the server and scripts share the file
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _count(self, hits: int, misses: int) -> None:
+        with self._stats_lock:
+            self.hits += hits
+            self.misses += misses
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """
+        Cached vectors for texts (None where missing), in input order.
+        """
+        keys = [text_key(t) for t in texts]
+        found: Dict[str, bytes] = {}
+        conn = self._connect()
+        unique = list(dict.fromkeys(keys))
+        for i in range(0, len(unique), _LOOKUP_CHUNK):
+            chunk = unique[i : i + _LOOKUP_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT text_sha256, vector FROM embedding_cache WHERE model = ? AND text_sha256 IN ({marks})",
+                [model, *chunk],
+            ).fetchall()
+            found.update(rows)
+        if found:
+            now = time.time()
+            conn.executemany(
+                "UPDATE embedding_cache SET last_used = ? WHERE model = ? AND text_sha256 = ?",
+                [(now, model, key) for key in found],
+            )
+        out: List[Optional[List[float]]] = [
+            np.frombuffer(found[k], dtype="<f4").tolist() if k in found else None for k in keys
+        ]
+        hits = sum(1 for v in out if v is not None)
+        self._count(hits, len(out) - hits)
+        return out
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        return self.get_many(model, [text])[0]
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        now = time.time()
+        rows = []
+        for text, vec in zip(texts, vectors):
+            blob = np.asarray(vec, dtype="<f4").tobytes()
+            rows.append((model, text_key(text), blob, len(blob), now))
+        if not rows:
+            return
+        conn = self._connect()
+        conn.executemany(
+            "INSERT OR REPLACE INTO embedding_cache (model, text_sha256, vector, size, last_used) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        self._evict(conn)
+
+    def put(self, model: str, text: str, vector: Sequence[float]) -> None:
+        self.put_many(model, [text], [vector])
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM embedding_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries down to 90% of the budget
+        target = int(self.max_bytes * 0.9)
+        excess = total - target
+        conn.execute(
+            """
+            DELETE FROM embedding_cache WHERE (model, text_sha256) IN (
+                SELECT model, text_sha256 FROM (
+                    SELECT model, text_sha256,
+                           SUM(size) OVER (ORDER BY last_used, text_sha256) AS running
+                    FROM embedding_cache
+                ) WHERE running - size < ?
+            )
+            """,
+            [excess],
+        )
+
+    def embed(
+        self,
+        model: str,
+        texts: Sequence[str],
+        embed_fn: Callable[[List[str]], List[List[float]]],
+        batch_size: int = 64,
+    ) -> List[List[float]]:
+        """
+        Vectors for all texts, calling embed_fn (in batches) only for cache
+        misses and storing what it returns.
+        """
+        vectors = self.get_many(model, texts)
+        missing: Dict[str, List[int]] = {}
+        for i, vec in enumerate(vectors):
+            if vec is None:
+                missing.setdefault(texts[i], []).append(i)
+        pending = list(missing)
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start : start + batch_size]
+            fresh = embed_fn(batch)
+            if len(fresh) != len(batch):
+                raise RuntimeError(f"Embedding count mismatch. Expected {len(batch)}, got {len(fresh)}")
+            self.put_many(model, batch, fresh)
+            for text, vec in zip(batch, fresh):
+                # Same float32 values a later cache hit would return
+                stored = np.asarray(vec, dtype=np.float32).tolist()
+                for i in missing[text]:
+                    vectors[i] = stored
+        return vectors  # type: ignore[return-value]
+
+    def stats(self) -> Dict[str, int]:
+        conn = self._connect()
+        entries, size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embedding_cache"
+        ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    Process-wide cache configured by EMBEDDING_CACHE_PATH / EMBEDDING_CACHE_MAX_BYTES.
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache(settings.EMBEDDING_CACHE_PATH, settings.EMBEDDING_CACHE_MAX_BYTES)
+    return _cache
@@ -0,0 +1,57 @@
+from django.db import migrations
+
+import graph_integration.fields
+
+BATCH_SIZE = 200
+
+
+def json_to_packed(apps, schema_editor):
+    Student = apps.get_model("openai_integration", "Student")
+    batch = []
+    for obj in Student.objects.exclude(embedding__isnull=True).only("id", "embedding").iterator():
+        if isinstance(obj.embedding, list) and obj.embedding:
+            obj.embedding_packed = obj.embedding
+            batch.append(obj)
+        if len(batch) >= BATCH_SIZE:
+            Student.objects.bulk_update(batch, ["embedding_packed"])
+            batch = []
+    if batch:
+        Student.objects.bulk_update(batch, ["embedding_packed"])
+
+
+def packed_to_json(apps, schema_editor):
+    Student = apps.get_model("openai_integration", "Student")
+    batch = []
+    for obj in Student.objects.exclude(embedding_packed__isnull=True).only("id", "embedding_packed").iterator():
+        obj.embedding = obj.embedding_packed.tolist()
+        batch.append(obj)
+        if len(batch) >= BATCH_SIZE:
+            Student.objects.bulk_update(batch, ["embedding"])
+            batch = []
+    if batch:
+        Student.objects.bulk_update(batch, ["embedding"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('openai_integration', '0003_student_embedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='embedding_packed',
+            field=graph_integration.fields.EmbeddingField(blank=True, default=None, null=True),
+        ),
+        migrations.RunPython(json_to_packed, packed_to_json),
+        migrations.RemoveField(
+            model_name='student',
+            name='embedding',
+        ),
+        migrations.RenameField(
+            model_name='student',
+            old_name='embedding_packed',
+            new_name='embedding',
+        ),
+    ]
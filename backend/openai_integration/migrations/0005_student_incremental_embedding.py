@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:33
+
+import django.db.models.deletion
+import graph_integration.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('openai_integration', '0004_student_binary_embedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='embedded_message_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='embedding_weight',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.CreateModel(
+            name='StudentEmbeddingChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_index', models.PositiveIntegerField()),
+                ('end_index', models.PositiveIntegerField()),
+                ('weight', models.FloatField()),
+                ('embedding', graph_integration.fields.EmbeddingField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='embedding_chunks', to='openai_integration.student')),
+            ],
+            options={
+                'ordering': ['student', 'start_index', 'id'],
+                'indexes': [models.Index(fields=['student', 'start_index'], name='studentchunk_student_idx')],
+            },
+        ),
+    ]
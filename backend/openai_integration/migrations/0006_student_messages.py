@@ -0,0 +1,94 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:55
+
+import django.db.models.deletion
+import django.utils.timezone
+from datetime import datetime, timezone
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def _parse_time(value, fallback):
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except (TypeError, ValueError):
+        return fallback
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def json_to_rows(apps, schema_editor):
+    Student = apps.get_model("openai_integration", "Student")
+    StudentMessage = apps.get_model("openai_integration", "StudentMessage")
+    batch = []
+    for student in Student.objects.only("id", "messages").iterator():
+        # Keep conversation order even where timestamps are missing or out of order
+        previous = datetime(2000, 1, 1, tzinfo=timezone.utc)
+        for item in student.messages or []:
+            # Malformed or empty items still get a row: embedded_message_count
+            # and the StudentEmbeddingChunk ranges are positions in this list
+            # (chunking and the prompt builder skip empty content anyway)
+            if not isinstance(item, dict):
+                item = {}
+            created_at = max(_parse_time(item.get("created_at"), previous), previous)
+            previous = created_at
+            batch.append(StudentMessage(
+                student_id=student.id,
+                role=item.get("role") if item.get("role") in ("user", "agent") else "user",
+                content=str(item.get("content") or ""),
+                created_at=created_at,
+            ))
+            if len(batch) >= BATCH_SIZE:
+                StudentMessage.objects.bulk_create(batch)
+                batch = []
+    if batch:
+        StudentMessage.objects.bulk_create(batch)
+
+
+def rows_to_json(apps, schema_editor):
+    Student = apps.get_model("openai_integration", "Student")
+    StudentMessage = apps.get_model("openai_integration", "StudentMessage")
+    conversations = {}
+    for message in StudentMessage.objects.order_by("student_id", "created_at", "id").iterator():
+        conversations.setdefault(message.student_id, []).append({
+            "role": message.role,
+            "content": message.content,
+            "created_at": message.created_at.isoformat(),
+        })
+    batch = []
+    for student in Student.objects.filter(id__in=list(conversations)).only("id").iterator():
+        student.messages = conversations[student.id]
+        batch.append(student)
+        if len(batch) >= 200:
+            Student.objects.bulk_update(batch, ["messages"])
+            batch = []
+    if batch:
+        Student.objects.bulk_update(batch, ["messages"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('openai_integration', '0005_student_incremental_embedding'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('user', 'User'), ('agent', 'Agent')], max_length=8)),
+                ('content', models.TextField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_messages', to='openai_integration.student')),
+            ],
+            options={
+                'ordering': ['student', 'created_at', 'id'],
+                'indexes': [models.Index(fields=['student', 'created_at', 'id'], name='studentmessage_student_idx')],
+            },
+        ),
+        migrations.RunPython(json_to_rows, rows_to_json),
+        migrations.RemoveField(
+            model_name='student',
+            name='messages',
+        ),
+    ]
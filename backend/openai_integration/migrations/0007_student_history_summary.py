@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('openai_integration', '0006_student_messages'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='history_summary',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='summarized_message_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
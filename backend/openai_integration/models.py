@@ -1,8 +1,8 @@
 from django.db import models
-from django.core.exceptions import ValidationError
-from django.db.models import JSONField
+from django.utils import timezone
 from typing import Literal, List, Optional
-from pydantic import BaseModel, Field, ValidationError as PydValidationError, RootModel
+from pydantic import BaseModel, Field, RootModel
+from graph_integration.fields import EmbeddingField
 
 
 class MessageItem(BaseModel):
@@ -17,14 +17,62 @@ class Conversation(RootModel[List[MessageItem]]):
 
 class Student(models.Model):
     name = models.CharField(max_length=255)
-    messages = JSONField(default=list, blank=True)
-    embedding = JSONField(null=True, blank=True, default=None)
+    embedding = EmbeddingField(null=True, blank=True, default=None)
+    # Incremental profile embedding: the first embedded_message_count
+    # messages are covered by embedding_chunks, and `embedding` is their
+    # (decayed) weighted mean with total weight `embedding_weight`
+    embedded_message_count = models.PositiveIntegerField(default=0)
+    embedding_weight = models.FloatField(default=0.0)
+    # Rolling summary of the first summarized_message_count messages; replies
+    # see this plus the recent messages instead of the whole conversation
+    history_summary = models.TextField(blank=True, default="")
+    summarized_message_count = models.PositiveIntegerField(default=0)
 
     def __str__(self) -> str:
         return self.name
 
-    def clean(self):
-        try:
-            Conversation.model_validate(self.messages)
-        except PydValidationError as e:
-            raise ValidationError({"messages": str(e)})
+
+class StudentMessage(models.Model):
+    """
+    One conversation turn. Rows are only ever appended, so a turn costs one
+    INSERT regardless of conversation length.
+    """
+    USER = "user"
+    AGENT = "agent"
+    ROLES = [(USER, "User"), (AGENT, "Agent")]
+
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name="chat_messages")
+    role = models.CharField(max_length=8, choices=ROLES)
+    content = models.TextField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["student", "created_at", "id"]
+        indexes = [models.Index(fields=["student", "created_at", "id"], name="studentmessage_student_idx")]
+
+    def __str__(self) -> str:
+        return f"{self.student_id} {self.role}: {self.content[:40]}"
+
+    def as_item(self) -> dict:
+        # The {"role", "content", "created_at"} shape of MessageItem
+        return {"role": self.role, "content": self.content, "created_at": self.created_at.isoformat()}
+
+
+class StudentEmbeddingChunk(models.Model):
+    """
+    Embedding of one contiguous slice of a student's messages (positions
+    start_index..end_index-1 in conversation order, or part of one long message).
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name="embedding_chunks")
+    start_index = models.PositiveIntegerField()
+    end_index = models.PositiveIntegerField()
+    weight = models.FloatField()
+    embedding = EmbeddingField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["student", "start_index", "id"]
+        indexes = [models.Index(fields=["student", "start_index"], name="studentchunk_student_idx")]
+
+    def __str__(self) -> str:
+        return f"{self.student_id}[{self.start_index}:{self.end_index}]"
@@ -0,0 +1,152 @@
+"""
+Prompt templates and request layout for the assistant.
+
+Template texts are fixed at import, so they are compacted and their token
+counts computed once. Reply requests put everything that rarely changes
+first, in a fixed order: instructions and tools, then the rolling summary,
+then older history, and only then the newest turns. From one turn to the
+next the request therefore starts with a byte-identical prefix, which is
+what provider-side prompt caching matches on; prompt_cache_key keeps one
+conversation's requests on the same cache. Per-turn material (retrieved
+records) goes last, right before the user's message.
+"""
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Any, Dict, List, Optional, Sequence
+
+from .tokens import token_counter
+
+REPLY_MODEL = "gpt-4.1"
+# Part of the cached prefix: keep the list and its order fixed and send it on every
+# request. Whether the model may search is per turn (tool_choice, see retrieval.py).
+REPLY_TOOLS = [{"type": "web_search"}]
+
+_UNIZG_SYSTEM_TEXT = """You are Explore UNIZG Assistant, a friendly guide for students on the Explore UNIZG website (University of Zagreb). Default language: Croatian. If the user writes in English, reply in English until they switch back. Tone: warm, brief, helpful, lightly suggestive, with occasional emojis. Goal: help users quickly find information about the University of Zagreb and its faculties, job openings and applications, job recommendations, student & networking events (career fairs, hackathons, workshops, meetups), and student organizations (with links to their profiles).
+Behavior guidelines
+First reply, in Croatian: „Hej 👋 Dobrodošao na Explore UNIZG! Ovdje možeš pronaći poslove, događaje i studentske udruge te informacije o fakultetima i poslodavcima. Pregled poslova, Događaji ovog tjedna, Studentske udruge, Fakulteti, Pitaj me što te zanima.“ In English: “Hi! I can help you find jobs, events, and student organizations at the University of Zagreb. What would you like to explore first?”
+Ask up to 3 concise questions to tailor help, only what's needed, e.g. „Koji studij ili smjer te zanima?“, „Tražiš praksu, studentski posao ili juniorsku full-time poziciju?“, „Jel imaš karijerne ciljeve?“, „Koje vještine želiš istaknuti (npr. Python, marketing, dizajn)?“
+If the question is unclear, ask the user to clarify and repeat the short list of what you can help with from the first reply.
+Keep answers short and don't repeat yourself: small paragraphs and bullet points (3–5 items); point to links for more information.
+When relevant, include a plain text action hint like [Izradi AI životopis] to suggest creating an AI CV (UI handled elsewhere).
+If the user asks for profiles, provide clear links or slugs they can open on the site (e.g., faculty/employer/student org profiles).
+If something isn’t available, say so briefly and suggest another path.
+Never claim you can save data, schedule tasks, or perform background or external actions. If asked to, politely decline and continue with guidance only.
+Formatting: Use plain text only. Do NOT use Markdown bold or italics. Never output asterisks (*).
+Links: Include at most one link only when essential; otherwise use short plain slugs (e.g., fer.unizg.hr) without markdown. Never add tracking parameters or query strings. Do not use markdown link syntax []().
+You may use web search when helpful, but restrict sources to www.unizg.hr and szzg.unizg.hr.
+"""
+
+SUMMARY_INSTRUCTIONS_TEXT = """You maintain a running summary of a chat between a student and the Explore UNIZG assistant (University of Zagreb).
+Update the existing summary with the new messages. Keep what matters for later replies: the student's study field, interests, skills, goals, preferred language, things already recommended or linked, and open questions. Drop greetings and repetition.
+Write plain text in the conversation's language, at most about 150 words."""
+
+
+def _compact(text: str) -> str:
+    # Trailing spaces and runs of blank lines cost tokens without changing the prompt
+    lines: List[str] = []
+    for line in text.strip().splitlines():
+        line = line.rstrip()
+        if line or (lines and lines[-1]):
+            lines.append(line)
+    return "\n".join(lines)
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    name: str
+    text: str
+    model: str = REPLY_MODEL
+
+    @cached_property
+    def tokens(self) -> int:
+        return token_counter(self.model)(self.text)
+
+
+UNIZG_SYSTEM = PromptTemplate("unizg_system", _compact(_UNIZG_SYSTEM_TEXT))
+HISTORY_SUMMARY = PromptTemplate("history_summary", _compact(SUMMARY_INSTRUCTIONS_TEXT))
+
+_SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+_RECORDS_PREFIX = (
+    "Records from the Explore UNIZG database that may answer the next message. "
+    "Prefer them over general knowledge and link to their URL when useful:\n\n"
+)
+
+
+def prompt_cache_key(student_id: int) -> str:
+    return f"unizg-student-{student_id}"
+
+
+def summary_text(summary: str) -> str:
+    return _SUMMARY_PREFIX + summary
+
+
+def history_items(history: List[dict]) -> List[dict]:
+    """
+    Convert our stored conversation [{'role': 'user'|'agent', 'content': '...'}]
+    to the Responses API item shape.
+    """
+    items: List[dict] = []
+    for item in history or []:
+        role = item.get("role")
+        content = item.get("content", "")
+        if not isinstance(content, str) or not content:
+            continue
+        mapped_role = "assistant" if role == "agent" else "user"
+        items.append({
+            "role": mapped_role,
+            "content": [
+                # Use output_text for assistant turns, input_text for user turns
+                {"type": "output_text" if mapped_role == "assistant" else "input_text", "text": content}
+            ],
+        })
+    return items
+
+
+def _developer_item(text: str) -> dict:
+    return {"role": "developer", "content": [{"type": "input_text", "text": text}]}
+
+
+def reply_input(
+    input_text: str,
+    chat_history: List[dict],
+    summary: str = "",
+    snippets: Sequence[str] = (),
+) -> List[dict]:
+    items: List[dict] = []
+    if summary:
+        # Older turns, folded by context.afold_history
+        items.append(_developer_item(summary_text(summary)))
+    items.extend(history_items(chat_history))
+    if snippets:
+        items.append(_developer_item(_RECORDS_PREFIX + "\n\n".join(snippets)))
+    return [
+        *items,
+        {
+            "role": "user",
+            "content": [{"type": "input_text", "text": input_text}],
+        },
+    ]
+
+
+def reply_request(
+    input_text: str,
+    chat_history: List[dict],
+    summary: str = "",
+    cache_key: Optional[str] = None,
+    snippets: Sequence[str] = (),
+    web_search: bool = True,
+) -> Dict[str, Any]:
+    """
+    Keyword arguments for client.responses.create() for one reply.
+    """
+    request: Dict[str, Any] = {
+        "model": REPLY_MODEL,
+        "instructions": UNIZG_SYSTEM.text,
+        "input": reply_input(input_text, chat_history, summary, snippets),
+        # Tools stay in the prefix either way; "none" keeps the model from searching
+        "tools": REPLY_TOOLS,
+        "tool_choice": "auto" if web_search else "none",
+    }
+    if cache_key:
+        request["prompt_cache_key"] = cache_key
+    return request
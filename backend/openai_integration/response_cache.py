@@ -0,0 +1,226 @@
+"""
+Semantic cache of assistant answers for opening questions.
+
+Many conversations open with the same greeting or with near-identical
+questions about faculties. Answers given without any prior conversation
+are kept in memory, partitioned by language (hr/en), and served again for
+the opening turn of another conversation when its normalized text matches exactly
+or its embedding (the one computed for local retrieval) is within
+RESPONSE_CACHE_MIN_SIMILARITY of a cached question. Each partition is an
+LRU of at most RESPONSE_CACHE_MAX_ENTRIES entries that expire after
+RESPONSE_CACHE_TTL_SECONDS. The cache is per process.
+"""
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+
+from .usage import record_response_cache
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_CROATIAN_CHARS = set("čćžšđ")
+_CROATIAN_WORDS = {
+    "bok", "hej", "pozdrav", "je", "su", "i", "u", "na", "za", "od", "koji", "koja", "koje", "što", "sto",
+    "gdje", "kako", "kada", "mogu", "li", "se", "da", "ne", "ima", "fakultet", "fakulteti", "studij",
+    "posao", "udruge", "udruga", "hvala", "molim", "zanima", "me", "mi",
+}
+_ENGLISH_WORDS = {
+    "hi", "hello", "hey", "the", "is", "are", "and", "in", "on", "for", "of", "what", "which", "where",
+    "how", "when", "can", "do", "does", "i", "you", "a", "an", "to", "faculty", "faculties", "study",
+    "job", "jobs", "organisation", "organization", "thanks", "please", "about", "me", "my",
+}
+
+
+def normalize_question(text: str) -> str:
+    # Case, punctuation, emoji and spacing don't change the question
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def detect_language(normalized: str) -> str:
+    """
+    "hr" or "en" (the assistant's default language is Croatian).
+    """
+    if _CROATIAN_CHARS & set(normalized):
+        return "hr"
+    words = normalized.split()
+    en = sum(word in _ENGLISH_WORDS for word in words)
+    hr = sum(word in _CROATIAN_WORDS for word in words)
+    return "en" if en > hr else "hr"
+
+
+@dataclass
+class _Entry:
+    answer: str
+    vector: Optional[np.ndarray]
+    expires_at: float
+
+
+@dataclass(frozen=True)
+class CachedAnswer:
+    answer: str
+    similarity: float   # 1.0 for an exact text match
+    exact: bool
+
+
+class _Partition:
+    def __init__(self) -> None:
+        self.entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # Stacked unit vectors of the entries that have one; rebuilt lazily
+        self._keys: List[str] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    def invalidate(self) -> None:
+        self._matrix = None
+
+    def matrix(self):
+        if self._matrix is None:
+            self._keys = [key for key, entry in self.entries.items() if entry.vector is not None]
+            vectors = [self.entries[key].vector for key in self._keys]
+            self._matrix = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+        return self._keys, self._matrix
+
+
+def _unit(vector: Optional[Sequence[float]]) -> Optional[np.ndarray]:
+    if vector is None or len(vector) == 0:
+        return None
+    vec = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm else None
+
+
+class ResponseCache:
+    """
+    In-memory (language, question) -> answer store with exact and
+    nearest-neighbour lookup, TTL expiry and LRU eviction.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, min_similarity: float):
+        self.max_entries = int(max_entries)
+        self.ttl = float(ttl)
+        self.min_similarity = float(min_similarity)
+        self._partitions: Dict[str, _Partition] = {}
+        self._lock = threading.Lock()
+
+    def _partition(self, language: str) -> _Partition:
+        return self._partitions.setdefault(language, _Partition())
+
+    def _purge(self, partition: _Partition, now: float) -> None:
+        expired = [key for key, entry in partition.entries.items() if entry.expires_at <= now]
+        for key in expired:
+            del partition.entries[key]
+        if expired:
+            partition.invalidate()
+
+    def get(self, text: str, vector: Optional[Sequence[float]] = None) -> Optional[CachedAnswer]:
+        """
+        Answer cached for `text`: exact normalized match first, then the
+        most similar cached question if it clears the threshold.
+        """
+        normalized = normalize_question(text)
+        if not normalized or self.max_entries <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            partition = self._partition(detect_language(normalized))
+            self._purge(partition, now)
+            entry = partition.entries.get(normalized)
+            if entry is not None:
+                partition.entries.move_to_end(normalized)
+                return CachedAnswer(entry.answer, 1.0, True)
+            query = _unit(vector)
+            keys, matrix = partition.matrix()
+            if query is None or not keys or matrix.shape[1] != query.shape[0]:
+                return None
+            sims = matrix @ query
+            best = int(np.argmax(sims))
+            if float(sims[best]) < self.min_similarity:
+                return None
+            partition.entries.move_to_end(keys[best])
+            return CachedAnswer(partition.entries[keys[best]].answer, float(sims[best]), False)
+
+    def put(self, text: str, answer: str, vector: Optional[Sequence[float]] = None) -> None:
+        normalized = normalize_question(text)
+        if not normalized or not answer or self.max_entries <= 0:
+            return
+        with self._lock:
+            partition = self._partition(detect_language(normalized))
+            partition.entries[normalized] = _Entry(answer, _unit(vector), time.monotonic() + self.ttl)
+            partition.entries.move_to_end(normalized)
+            while len(partition.entries) > self.max_entries:
+                partition.entries.popitem(last=False)
+            partition.invalidate()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._partitions.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {language: len(p.entries) for language, p in self._partitions.items()}
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(
+                    settings.RESPONSE_CACHE_MAX_ENTRIES,
+                    settings.RESPONSE_CACHE_TTL_SECONDS,
+                    settings.RESPONSE_CACHE_MIN_SIMILARITY,
+                )
+    return _cache
+
+
+def eligible(chat_history: Sequence[dict], summary: str = "") -> bool:
+    """
+    Whether a turn may use the cache: only a conversation's opening turn
+    (no earlier messages, no summary). Cached answers were written for an
+    opener, so a follow-up with the same words ("a upisi?") must not get one.
+    """
+    return not chat_history and not summary
+
+
+def lookup_exact(text: str, chat_history: Sequence[dict], summary: str = "") -> Optional[CachedAnswer]:
+    """
+    Exact normalized match only. It needs no embedding, so it can answer
+    before retrieval has embedded the turn; a miss is left to lookup().
+    """
+    if not eligible(chat_history, summary):
+        return None
+    started = time.perf_counter()
+    hit = get_response_cache().get(text)
+    if hit is not None:
+        record_response_cache("exact", hit.similarity, time.perf_counter() - started)
+    return hit
+
+
+def lookup(text: str, chat_history: Sequence[dict], summary: str = "", vector=None) -> Optional[CachedAnswer]:
+    if not eligible(chat_history, summary):
+        record_response_cache("skipped")
+        return None
+    started = time.perf_counter()
+    hit = get_response_cache().get(text, vector)
+    if hit is None:
+        record_response_cache("miss", elapsed=time.perf_counter() - started)
+    else:
+        record_response_cache("exact" if hit.exact else "semantic", hit.similarity, time.perf_counter() - started)
+    return hit
+
+
+def remember(text: str, chat_history: Sequence[dict], summary: str, answer: str, vector=None) -> None:
+    # Only answers that depend on nothing but the question are reused
+    if not eligible(chat_history, summary):
+        return
+    get_response_cache().put(text, answer, vector)
@@ -0,0 +1,145 @@
+"""
+Local grounding for assistant replies.
+
+The user's turn is embedded (through the embedding cache) and looked up in
+the in-process Faculty/Organisation vector index; the closest records are
+turned into short text snippets for the prompt. Live web search is only
+withheld when the best local match is strong and the turn is not about
+something the records can't answer (jobs, events, deadlines), so questions
+about faculties and student organisations we already hold skip the search
+round trip.
+"""
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from graph_integration.models import Faculty, Organisation
+from graph_integration.vector_index import get_vector_index
+
+from .usage import record_retrieval
+from .utils import agenerate_text_embedding
+
+logger = logging.getLogger(__name__)
+
+# Longest slice of one text field in a snippet
+_FIELD_CHARS = 300
+
+# Word stems (hr/en) of questions about jobs, events and dates: live information that
+# Faculty/Organisation records don't hold, so web search stays available
+_LIVE_TOPIC = re.compile(
+    r"\b(posa|posl|prak|zaposl|natje|rok|upis|stipend|doga|sajm|sajam|radion|hack|hak|konferenc|"
+    r"job|intern|career|deadline|event|fair|workshop|meetup|conference|scholarship|apply|applica|enrol)",
+    re.IGNORECASE,
+)
+
+_FACULTY_FIELDS = [
+    ("Programs", "programs"),
+    ("Research", "research_topics"),
+    ("Areas", "domain_areas"),
+    ("Labs", "affiliations_and_labs"),
+    ("Keywords", "keywords"),
+]
+_ORGANISATION_FIELDS = [
+    ("Scope", "scope"),
+    ("Mission", "mission"),
+    ("Activities", "core_activities"),
+    ("Projects", "flagship_projects"),
+    ("Members", "target_members"),
+    ("Keywords", "keywords"),
+]
+
+
+@dataclass(frozen=True)
+class Retrieval:
+    snippets: List[str] = field(default_factory=list)
+    top_similarity: float = 0.0
+    web_search: bool = True   # offer the web_search tool for this turn
+    elapsed: float = 0.0
+    # The turn's embedding, reused by the response cache
+    embedding: Optional[List[float]] = None
+
+
+def _field_text(value: Any) -> str:
+    if isinstance(value, (list, tuple)):
+        value = ", ".join(str(v).strip() for v in value if str(v).strip())
+    text = " ".join(str(value or "").split())
+    if len(text) > _FIELD_CHARS:
+        text = text[:_FIELD_CHARS].rsplit(" ", 1)[0] + " …"
+    return text
+
+
+def _snippet(kind: str, row: Dict[str, Any], fields: Iterable) -> str:
+    title = row["name"].strip()
+    if row.get("abbreviation"):
+        title += f" ({row['abbreviation'].strip()})"
+    lines = [f"{kind}: {title}"]
+    if row.get("url"):
+        lines.append(f"URL: {row['url'].strip()}")
+    for label, name in fields:
+        text = _field_text(row.get(name))
+        if text:
+            lines.append(f"{label}: {text}")
+    return "\n".join(lines)
+
+
+def _load_snippets(hits: List[Dict[str, Any]]) -> List[str]:
+    # One query per record type, then back into similarity order
+    faculty_ids = [item["id"] for item in hits if item["type"] == "faculty"]
+    organisation_ids = [item["id"] for item in hits if item["type"] == "organisation"]
+    rows: Dict[tuple, str] = {}
+    if faculty_ids:
+        names = ["id", "name", "abbreviation", "url"] + [name for _, name in _FACULTY_FIELDS]
+        for row in Faculty.objects.filter(id__in=faculty_ids).values(*names):
+            rows[("faculty", row["id"])] = _snippet("Faculty", row, _FACULTY_FIELDS)
+    if organisation_ids:
+        names = ["id", "name", "abbreviation", "url"] + [name for _, name in _ORGANISATION_FIELDS]
+        for row in Organisation.objects.filter(id__in=organisation_ids).values(*names):
+            rows[("organisation", row["id"])] = _snippet("Student organisation", row, _ORGANISATION_FIELDS)
+    return [rows[key] for key in ((item["type"], item["id"]) for item in hits) if key in rows]
+
+
+def needs_web_search(text: str, top_similarity: float) -> bool:
+    """
+    Whether the model should still be allowed to search the web this turn.
+    """
+    return top_similarity < settings.CHAT_RETRIEVAL_LOCAL_ONLY_SIMILARITY or bool(_LIVE_TOPIC.search(text))
+
+
+def _search(embedding: List[float]) -> List[tuple]:
+    index = get_vector_index()
+    return index.search(embedding, k=settings.CHAT_RETRIEVAL_TOP_K)
+
+
+async def aretrieve(text: str) -> Retrieval:
+    """
+    Snippets for the records closest to `text`, and whether the turn still
+    needs web search (see needs_web_search). Any failure (no embeddings, API error, dimension
+    mismatch) falls back to web search without snippets.
+    """
+    if settings.CHAT_RETRIEVAL_MODE == "off":
+        return Retrieval()
+    started = time.perf_counter()
+    embedding = None
+    try:
+        embedding = await agenerate_text_embedding(text)
+        matches = await sync_to_async(_search)(embedding)
+        hits = [item for item, dist in matches if 1.0 - dist >= settings.CHAT_RETRIEVAL_MIN_SIMILARITY]
+        snippets = await sync_to_async(_load_snippets)(hits) if hits else []
+    except Exception as e:
+        logger.warning("Local retrieval failed, falling back to web search: %s", e)
+        matches, snippets = [], []
+    top = 1.0 - matches[0][1] if matches else 0.0
+    result = Retrieval(
+        snippets=snippets,
+        top_similarity=top,
+        web_search=not snippets or needs_web_search(text, top),
+        elapsed=time.perf_counter() - started,
+        embedding=embedding,
+    )
+    record_retrieval(result.elapsed, result.top_similarity, result.web_search)
+    return result
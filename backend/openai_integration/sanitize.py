@@ -0,0 +1,183 @@
+"""
+Post-processing of assistant text: no bold/italic asterisks, no query
+strings on URLs, at most one clickable URL (later ones shrink to their
+domain) and no markdown link syntax.
+
+URLs and markdown links are rewritten in a single left-to-right pass
+(_link_tokens) using module-level compiled patterns, and StreamingSanitizer
+applies the same rewrite to a stream of deltas without ever splitting a
+URL or link across output chunks. Plain string operations replace urllib
+parsing for the two URL edits needed. No Django imports, so
+scripts/bench_sanitize.py can load it directly.
+"""
+import re
+from typing import Iterator, Optional, Tuple
+
+_URL_PATTERN = re.compile(r"https?://[^\s)]+")
+# Markdown links [text](url): single-line text and a bounded length, so a stray "["
+# only holds back a stream until a newline or a few hundred characters have passed
+_LINK_TEXT_MAX = 200
+_LINK_URL_MAX = 2048
+_MD_LINK_PATTERN = re.compile(
+    rf"\[([^\]\n]{{1,{_LINK_TEXT_MAX}}})\]\((https?://[^\s)]{{1,{_LINK_URL_MAX}}})\)"
+)
+_DOMAIN_OR_SLUG = re.compile(r"^[\w.-]+(\.[\w.-]+)+(\/[\w./-]*)?$")
+# A "[" at the end of the text that more deltas could still turn into a link (within
+# the same bounds; "https://" counts towards the URL part)
+_PENDING_LINK = re.compile(
+    rf"\[(?:[^\]\n]{{0,{_LINK_TEXT_MAX}}}|[^\]\n]{{1,{_LINK_TEXT_MAX}}}\]"
+    rf"|[^\]\n]{{1,{_LINK_TEXT_MAX}}}\]\([^\s)]{{0,{_LINK_URL_MAX + 8}}})\Z"
+)
+
+
+def _strip_query(url: str) -> str:
+    # Drop all query parameters entirely for cleaner links (the fragment stays)
+    query = url.find("?")
+    fragment = url.find("#")
+    if query == -1 or (fragment != -1 and fragment < query):
+        # An empty fragment is dropped, as urlunsplit would
+        return url[:-1] if fragment == len(url) - 1 else url
+    return url[:query] + (url[fragment:] if fragment != -1 and fragment + 1 < len(url) else "")
+
+
+def _netloc(url: str) -> str:
+    start = url.find("://") + 3
+    end = start
+    while end < len(url) and url[end] not in "/?#":
+        end += 1
+    return url[start:end] or "link"
+
+
+def _link_tokens(text: str) -> Iterator[re.Match]:
+    """
+    Markdown links and bare URLs, left to right and non-overlapping: the
+    matches of the two patterns combined as one alternation. Each pattern
+    is searched separately because a literal prefix ("[" / "http") lets
+    the regex engine skip ahead, which an alternation cannot.
+    """
+    url = _URL_PATTERN.search(text)
+    link = _MD_LINK_PATTERN.search(text) if "[" in text else None
+    while url is not None or link is not None:
+        token = link if link is not None and (url is None or link.start() < url.start()) else url
+        yield token
+        pos = token.end()
+        # A pending match that starts after this token is still the next one
+        if url is not None and url.start() < pos:
+            url = _URL_PATTERN.search(text, pos)
+        if link is not None and link.start() < pos:
+            link = _MD_LINK_PATTERN.search(text, pos)
+
+
+def _sanitize(text: str, first_url: Optional[str]) -> Tuple[str, Optional[str]]:
+    """
+    Sanitize one piece of text given the first URL seen so far (if any);
+    returns the sanitized text and the (possibly newly found) first URL.
+    """
+    # Remove all asterisks to avoid bold/italics markers
+    sanitized = text.replace("*", "") if "*" in text else text
+    if "://" not in sanitized:
+        return sanitized, first_url
+
+    out = []
+    pos = 0
+    for m in _link_tokens(sanitized):
+        is_link = m.re is _MD_LINK_PATTERN
+        url = m.group(2) if is_link else m.group(0)
+        if first_url is None:
+            first_url = url
+        out.append(sanitized[pos : m.start()])
+        pos = m.end()
+        if is_link:
+            # Markdown link: keep the visible text if it looks like a domain/slug
+            visible = m.group(1).strip()
+            if _DOMAIN_OR_SLUG.match(visible):
+                out.append(visible)
+                continue
+        clean = _strip_query(url)
+        out.append(clean if url == first_url else _netloc(clean))
+    if not out:
+        return sanitized, first_url
+    out.append(sanitized[pos:])
+    return "".join(out), first_url
+
+
+def sanitize_assistant_text(text: str) -> str:
+    """
+    Post-process the model output:
+      - remove bold markers (asterisks)
+      - strip UTM params from URLs
+      - limit to at most one clickable URL; replace extra URLs with their domain
+    """
+    if not isinstance(text, str):
+        return ""
+    return _sanitize(text, None)[0]
+
+
+def _last_space(text: str, end: int) -> int:
+    i = end - 1
+    while i >= 0 and not text[i].isspace():
+        i -= 1
+    return i
+
+
+class StreamingSanitizer:
+    """
+    Incremental sanitize_assistant_text for streamed replies.
+
+    Deltas are buffered and released only up to the last whitespace outside
+    a possibly unfinished markdown link, so URLs and links are never split
+    across chunks. The concatenated output equals
+    sanitize_assistant_text(full_text).strip().
+    """
+
+    def __init__(self) -> None:
+        self._buffer = ""
+        self._first_url: Optional[str] = None
+        self._started = False
+
+    def _emit(self, piece: str) -> str:
+        if not self._started:
+            piece = piece.lstrip()
+            if not piece:
+                return ""
+            self._started = True
+        out, self._first_url = _sanitize(piece, self._first_url)
+        return out
+
+    def feed(self, delta: str) -> str:
+        """
+        Add a model delta; return the sanitized text that is safe to send now.
+        """
+        # Asterisk removal is context-free, so do it up front
+        if delta and "*" in delta:
+            delta = delta.replace("*", "")
+        buf = self._buffer = self._buffer + (delta or "")
+        limit = len(buf)
+        if "[" in buf:
+            pending = _PENDING_LINK.search(buf)
+            if pending:
+                limit = pending.start()
+        cut = _last_space(buf, limit)
+        if cut > 0 and "](" in buf:
+            # Whitespace inside a complete link's text is not a cut point
+            spans = [m.span() for m in _MD_LINK_PATTERN.finditer(buf)]
+            for start, end in reversed(spans):
+                if end <= cut:
+                    break
+                if start < cut:
+                    cut = _last_space(buf, start)
+        while cut > 0 and buf[cut - 1].isspace():
+            cut -= 1
+        if cut <= 0:
+            return ""
+        piece, self._buffer = buf[:cut], buf[cut:]
+        return self._emit(piece)
+
+    def finish(self) -> str:
+        """
+        Flush whatever is left once the model is done.
+        """
+        piece, self._buffer = self._buffer.rstrip(), ""
+        if not piece:
+            return ""
+        return self._emit(piece)
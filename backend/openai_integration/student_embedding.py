@@ -0,0 +1,192 @@
+"""
+Incremental student-profile embeddings.
+
+Instead of re-embedding the whole conversation on every call, only the
+messages added since the last update are embedded, in chunks of at most
+STUDENT_EMBEDDING_CHUNK_CHARS characters. Each chunk vector is stored
+(StudentEmbeddingChunk) and folded into a running weighted mean on the
+Student, weighted by chunk length and optionally decayed by
+STUDENT_EMBEDDING_DECAY per chunk so recent messages count more.
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from .models import Student, StudentEmbeddingChunk, StudentMessage
+from .utils import agenerate_text_embeddings
+
+
+@dataclass(frozen=True)
+class PlannedChunk:
+    start_index: int
+    end_index: int
+    text: str
+
+
+def _split_long(text: str, max_chars: int) -> List[str]:
+    # Cut at the last whitespace before the limit where possible
+    pieces: List[str] = []
+    while len(text) > max_chars:
+        cut = text.rfind(" ", 0, max_chars + 1)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(text[:cut].strip())
+        text = text[cut:].strip()
+    if text:
+        pieces.append(text)
+    return [p for p in pieces if p]
+
+
+def plan_chunks(messages: Sequence[dict], start: int, max_chars: int) -> List[PlannedChunk]:
+    """
+    Group `messages` (the conversation from position `start` on) into
+    chunks of at most max_chars characters (joined like the
+    full-conversation text was); a single longer message is split into
+    several chunks. Chunk indices are conversation positions.
+    """
+    chunks: List[PlannedChunk] = []
+    parts: List[str] = []
+    size = 0
+    chunk_start = start
+
+    def flush(end: int) -> None:
+        nonlocal parts, size, chunk_start
+        if parts:
+            chunks.append(PlannedChunk(chunk_start, end, "\n\n".join(parts)))
+        parts, size, chunk_start = [], 0, end
+
+    for i, message in enumerate(messages, start=start):
+        content = (message or {}).get("content") or ""
+        content = content.strip() if isinstance(content, str) else ""
+        if not content:
+            continue
+        if len(content) > max_chars:
+            flush(i)
+            for piece in _split_long(content, max_chars):
+                chunks.append(PlannedChunk(i, i + 1, piece))
+            chunk_start = i + 1
+            continue
+        extra = len(content) + (2 if parts else 0)
+        if parts and size + extra > max_chars:
+            flush(i)
+            extra = len(content)
+        parts.append(content)
+        size += extra
+    flush(start + len(messages))
+    return chunks
+
+
+def _load_messages(student: Student, start: int) -> List[dict]:
+    # Conversation positions start.. in order, as {"role", "content"} dicts
+    qs = StudentMessage.objects.filter(student=student).order_by("created_at", "id")
+    return list(qs.values("role", "content")[start:])
+
+
+def fold_embeddings(
+    mean: Optional[np.ndarray],
+    weight: float,
+    vectors: Sequence[Sequence[float]],
+    weights: Sequence[float],
+    decay: float,
+) -> Tuple[np.ndarray, float]:
+    """
+    Fold chunk vectors, in order, into a running weighted mean:
+    W' = decay * W + w,  mean' = (decay * W * mean + w * v) / W'.
+    """
+    total = np.zeros(len(vectors[0]), dtype=np.float64)
+    if mean is not None and weight > 0:
+        total = np.asarray(mean, dtype=np.float64) * weight
+    for vec, w in zip(vectors, weights):
+        total = total * decay + np.asarray(vec, dtype=np.float64) * w
+        weight = weight * decay + w
+    return (total / weight).astype(np.float32), float(weight)
+
+
+def _apply_update(
+    student: Student,
+    expected_count: int,
+    reset: bool,
+    message_count: int,
+    chunks: Sequence[PlannedChunk],
+    vectors: Sequence[Sequence[float]],
+) -> bool:
+    """
+    Persist new chunks and the updated aggregate in one transaction.
+    Returns False (and reloads the student) if another request already
+    advanced the profile.
+    """
+    with transaction.atomic():
+        count, mean, weight = (
+            Student.objects.select_for_update()
+            .values_list("embedded_message_count", "embedding", "embedding_weight")
+            .get(pk=student.pk)
+        )
+        if count != expected_count:
+            student.refresh_from_db(fields=["embedding", "embedded_message_count", "embedding_weight"])
+            return False
+        if reset:
+            StudentEmbeddingChunk.objects.filter(student=student).delete()
+            mean, weight = None, 0.0
+        if chunks:
+            weights = [float(len(c.text)) for c in chunks]
+            mean, weight = fold_embeddings(mean, weight, vectors, weights, settings.STUDENT_EMBEDDING_DECAY)
+            StudentEmbeddingChunk.objects.bulk_create([
+                StudentEmbeddingChunk(
+                    student=student,
+                    start_index=c.start_index,
+                    end_index=c.end_index,
+                    weight=w,
+                    embedding=v,
+                )
+                for c, v, w in zip(chunks, vectors, weights)
+            ])
+        Student.objects.filter(pk=student.pk).update(
+            embedding=mean,
+            embedded_message_count=message_count,
+            embedding_weight=weight,
+        )
+    student.embedding = mean
+    student.embedded_message_count = message_count
+    student.embedding_weight = weight
+    return True
+
+
+async def aupdate_student_embedding(student: Student) -> Optional[np.ndarray]:
+    """
+    Bring the student's profile embedding up to date with their messages,
+    embedding only messages added since the last call. Returns the
+    aggregate vector, or None if the conversation has no text.
+    """
+    expected = student.embedded_message_count
+    total = await StudentMessage.objects.filter(student=student).acount()
+    start = expected
+    # Conversation shrank or the aggregate is missing: rebuild from scratch
+    reset = start > total or (start > 0 and student.embedding is None)
+    if reset:
+        start = 0
+    if start == total:
+        return student.embedding
+
+    # Only the messages not yet folded into the profile are read
+    messages = await sync_to_async(_load_messages)(student, start)
+    chunks = plan_chunks(messages, start, settings.STUDENT_EMBEDDING_CHUNK_CHARS)
+    total = start + len(messages)
+
+    vectors: List[List[float]] = []
+    if chunks:
+        vectors = await agenerate_text_embeddings([c.text for c in chunks])
+        current = student.embedding
+        if not reset and current is not None and current.shape[0] != len(vectors[0]):
+            # Embedding model changed dimensionality: re-embed everything
+            reset = True
+            messages = await sync_to_async(_load_messages)(student, 0)
+            total = len(messages)
+            chunks = plan_chunks(messages, 0, settings.STUDENT_EMBEDDING_CHUNK_CHARS)
+            vectors = await agenerate_text_embeddings([c.text for c in chunks])
+
+    await sync_to_async(_apply_update)(student, expected, reset, total, chunks, vectors)
+    return student.embedding
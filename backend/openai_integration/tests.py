@@ -1,3 +1,115 @@
-from django.test import TestCase
+import asyncio
+import random
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, override_settings
+
+from . import embedding_cache, utils
+from .sanitize import StreamingSanitizer, sanitize_assistant_text
+
+
+def _stream(text: str, sizes) -> str:
+    sanitizer = StreamingSanitizer()
+    out = []
+    pos = 0
+    for size in sizes:
+        out.append(sanitizer.feed(text[pos : pos + size]))
+        pos += size
+    out.append(sanitizer.feed(text[pos:]))
+    out.append(sanitizer.finish())
+    return "".join(out)
+
+
+class SanitizeTests(SimpleTestCase):
+    def test_removes_asterisks_and_query_strings(self):
+        text = "**FER** je super: https://www.fer.hr/studij?utm_source=x"
+        self.assertEqual(sanitize_assistant_text(text), "FER je super: https://www.fer.hr/studij")
+
+    def test_keeps_only_first_url(self):
+        text = "Vidi [FER](https://www.fer.hr/a) i https://www.pmf.unizg.hr/b"
+        out = sanitize_assistant_text(text)
+        self.assertEqual(out.count("https://"), 1)
+        self.assertIn("pmf.unizg.hr", out)
+        self.assertNotIn("](", out)
+
+
+class StreamingSanitizerTests(SimpleTestCase):
+    # Fragments that exercise links, URLs and brackets split at awkward places
+    PIECES = [
+        "Hej ", "[", "](", ")", "]", " ", "\n", "**", "https://", "fer.hr", "?utm_source=x",
+        "a" * 60, "x" * 190, "[FER](https://www.fer.hr/?a=1) ", "[t\nx](https://a.hr) ",
+        "[1] ", "b" * 300, "https://" + "c" * 2040,
+    ]
+
+    def test_stream_equals_single_pass(self):
+        rng = random.Random(7)
+        for _ in range(500):
+            text = "".join(rng.choice(self.PIECES) for _ in range(rng.randint(1, 6)))
+            sizes = [rng.randint(1, 40) for _ in range(len(text) // 10 + 1)]
+            with self.subTest(text=text[:80], sizes=sizes[:10]):
+                self.assertEqual(_stream(text, sizes), sanitize_assistant_text(text).strip())
+
+    def test_one_character_deltas(self):
+        text = "Pogledaj [FER](https://www.fer.hr/?utm_source=x) ili https://www.unizg.hr/upisi?a=1 za više."
+        self.assertEqual(_stream(text, [1] * len(text)), sanitize_assistant_text(text).strip())
+
+    def test_never_splits_a_url(self):
+        sanitizer = StreamingSanitizer()
+        self.assertEqual(sanitizer.feed("Vidi https://www.fer"), "Vidi")
+        self.assertEqual(sanitizer.feed(".hr/studij za"), " https://www.fer.hr/studij")
+        self.assertEqual(sanitizer.finish(), " za")
+
+    def test_unclosed_bracket_does_not_stall(self):
+        sanitizer = StreamingSanitizer()
+        released = "".join(sanitizer.feed(word + " ") for word in ("Vidi [1 za detalje.\n" + "riječ " * 50).split(" "))
+        self.assertIn("riječ", released)
+
+
+class _FakeEmbeddings:
+    def __init__(self):
+        self.requests = []
+
+    async def create(self, model, input):
+        self.requests.append(list(input))
+        return SimpleNamespace(data=[
+            SimpleNamespace(index=i, embedding=[float(len(text)), 1.0]) for i, text in enumerate(input)
+        ])
+
+
+class AsyncEmbeddingBatchTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings_override = override_settings(
+            EMBEDDING_CACHE_PATH=Path(tmp.name) / "cache.sqlite3",
+            EMBEDDING_BATCH_MAX_INPUTS=3,
+            EMBEDDING_BATCH_MAX_TOKENS=50,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Fresh process-wide cache on the temporary file
+        patcher = mock.patch.object(embedding_cache, "_cache", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.api = _FakeEmbeddings()
+        client = mock.patch.object(utils, "_get_async_openai_client", return_value=SimpleNamespace(embeddings=self.api))
+        client.start()
+        self.addCleanup(client.stop)
+
+    def test_batches_by_count_and_tokens(self):
+        texts = [f"poruka {i}" for i in range(7)] + ["duga poruka " * 30, "poruka 0"]
+        vectors = asyncio.run(utils.agenerate_text_embeddings(texts))
+        self.assertEqual([v[0] for v in vectors], [float(len(t)) for t in texts])
+        sent = [text for request in self.api.requests for text in request]
+        self.assertEqual(sorted(sent), sorted(set(texts)))
+        self.assertTrue(all(len(request) <= 3 for request in self.api.requests))
+        self.assertIn(["duga poruka " * 30], self.api.requests)
+
+    def test_cached_texts_are_not_sent(self):
+        asyncio.run(utils.agenerate_text_embeddings(["a", "b"]))
+        self.api.requests.clear()
+        asyncio.run(utils.agenerate_text_embeddings(["a", "b", "c"]))
+        self.assertEqual(self.api.requests, [["c"]])
@@ -0,0 +1,24 @@
+"""
+Local token counting for request budgeting: tiktoken when it is installed
+(optional dependency), otherwise a conservative character-based estimate.
+"""
+from functools import lru_cache
+from typing import Callable
+
+# Rough characters per token for the fallback estimate
+_CHARS_PER_TOKEN = 3.0
+
+
+@lru_cache(maxsize=None)
+def token_counter(model: str) -> Callable[[str], int]:
+    try:
+        import tiktoken
+
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception:
+        # Conservative estimate; Croatian text tokenizes worse than English
+        return lambda text: int(len(text) / _CHARS_PER_TOKEN) + 1
@@ -0,0 +1,140 @@
+"""
+Token usage of the assistant's Responses API calls.
+
+Each call logs input tokens split into cached and uncached (from
+usage.input_tokens_details.cached_tokens), output tokens, total latency
+and, for streamed replies, time to first token. Local retrieval logs its
+latency and whether the turn still needed web search, and the response
+cache logs each lookup. Running per-process totals are kept as well, so
+the prompt-cache hit rate, the share of turns answered without web search
+and the response-cache hit rate can be read off the log or from
+usage_totals().
+"""
+import logging
+import threading
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class UsageTotals:
+    requests: int = 0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+    seconds: float = 0.0
+
+    @property
+    def cache_hit_rate(self) -> float:
+        return self.cached_tokens / self.input_tokens if self.input_tokens else 0.0
+
+
+@dataclass
+class RetrievalTotals:
+    turns: int = 0
+    without_web_search: int = 0
+    seconds: float = 0.0
+
+    @property
+    def local_share(self) -> float:
+        return self.without_web_search / self.turns if self.turns else 0.0
+
+
+@dataclass
+class ResponseCacheTotals:
+    lookups: int = 0
+    exact: int = 0
+    semantic: int = 0
+    skipped: int = 0   # follow-up turns, which never use the cache
+
+    @property
+    def hit_rate(self) -> float:
+        return (self.exact + self.semantic) / self.lookups if self.lookups else 0.0
+
+
+_totals: Dict[str, UsageTotals] = {}
+_retrieval = RetrievalTotals()
+_response_cache = ResponseCacheTotals()
+_lock = threading.Lock()
+
+
+def record_usage(kind: str, usage: Any, elapsed: float, first_token: Optional[float] = None) -> None:
+    """
+    Record one response's usage; `kind` is "reply", "reply_web_search"
+    (web search was offered) or "summary".
+    Responses without usage (e.g. from a stub) are ignored.
+    """
+    if usage is None:
+        return
+    input_tokens = getattr(usage, "input_tokens", 0) or 0
+    details = getattr(usage, "input_tokens_details", None)
+    cached = getattr(details, "cached_tokens", 0) or 0
+    output_tokens = getattr(usage, "output_tokens", 0) or 0
+    with _lock:
+        totals = _totals.setdefault(kind, UsageTotals())
+        totals.requests += 1
+        totals.input_tokens += input_tokens
+        totals.cached_tokens += cached
+        totals.output_tokens += output_tokens
+        totals.seconds += elapsed
+        hit_rate = totals.cache_hit_rate
+    logger.info(
+        "%s usage: input=%d (cached=%d, uncached=%d) output=%d time=%.2fs first_token=%s; cache hit rate %.0f%%",
+        kind,
+        input_tokens,
+        cached,
+        input_tokens - cached,
+        output_tokens,
+        elapsed,
+        f"{first_token:.2f}s" if first_token is not None else "-",
+        hit_rate * 100,
+    )
+
+
+def record_retrieval(elapsed: float, top_similarity: float, web_search: bool) -> None:
+    with _lock:
+        _retrieval.turns += 1
+        _retrieval.without_web_search += 0 if web_search else 1
+        _retrieval.seconds += elapsed
+        share = _retrieval.local_share
+    logger.info(
+        "retrieval: time=%.2fs top_similarity=%.3f web_search=%s; turns without web search %.0f%%",
+        elapsed,
+        top_similarity,
+        "on" if web_search else "off",
+        share * 100,
+    )
+
+
+def record_response_cache(outcome: str, similarity: float = 0.0, elapsed: float = 0.0) -> None:
+    """
+    `outcome` is "exact", "semantic", "miss" or "skipped".
+    """
+    with _lock:
+        if outcome == "skipped":
+            _response_cache.skipped += 1
+            return
+        _response_cache.lookups += 1
+        if outcome in ("exact", "semantic"):
+            setattr(_response_cache, outcome, getattr(_response_cache, outcome) + 1)
+        hit_rate = _response_cache.hit_rate
+    logger.info(
+        "response cache: %s similarity=%.3f time=%.1fms; hit rate %.0f%%",
+        outcome,
+        similarity,
+        elapsed * 1000,
+        hit_rate * 100,
+    )
+
+
+def usage_totals() -> Dict[str, Dict[str, Any]]:
+    with _lock:
+        totals = {
+            kind: {**asdict(t), "cache_hit_rate": round(t.cache_hit_rate, 4)}
+            for kind, t in _totals.items()
+        }
+        totals["retrieval"] = {**asdict(_retrieval), "local_share": round(_retrieval.local_share, 4)}
+        totals["response_cache"] = {**asdict(_response_cache), "hit_rate": round(_response_cache.hit_rate, 4)}
+        return totals
@@ -1,11 +1,20 @@
-from datetime import datetime, timezone
 from typing import Any, Dict, List
-from .models import Student, MessageItem, Conversation
+from .models import Student, StudentMessage, MessageItem
+from .batch_embeddings import plan_batches
+from .embedding_cache import get_embedding_cache
+from .context import afold_history, build_reply_context
+from .prompts import UNIZG_SYSTEM, prompt_cache_key, reply_request
+from .sanitize import StreamingSanitizer, sanitize_assistant_text
+from .tokens import token_counter
+from .usage import record_usage
+import asyncio
 import os
-from openai import OpenAI
-import re
-import urllib.parse
-from typing import Sequence
+import time
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from openai import AsyncOpenAI, OpenAI
+from typing import AsyncIterator, Optional, Sequence
 
 
 def append_message_and_build_payload(student: Student, text: str) -> Dict[str, Any]:
@@ -13,35 +22,51 @@ def append_message_and_build_payload(student: Student, text: str) -> Dict[str, A
     Append the new user message to the student's conversation and
     return a payload for the agent with:
       - input_as_text: the new message text
-      - chat_history: prior messages (simple shape)
+      - chat_history: the most recent prior messages that fit the context budget
+      - summary: rolling summary of the older ones ("" if none yet)
+      - cache_key: prompt cache key for this conversation
     """
     if not isinstance(text, str) or not text.strip():
         raise ValueError("text must be a non-empty string")
 
     # prior history (simple shape) – exclude the new message
-    prior_history: List[dict] = list(student.messages or [])
+    context = build_reply_context(student, text)
 
-    # validate existing history
-    Conversation.model_validate(prior_history)
+    # validate + append (one INSERT; earlier messages are never rewritten)
+    user_msg = MessageItem(role="user", content=text.strip())
+    StudentMessage.objects.create(student=student, role=user_msg.role, content=user_msg.content)
 
-    now_iso = datetime.now(timezone.utc).isoformat()
-    user_msg = MessageItem(role="user", content=text.strip(), created_at=now_iso)
+    return {
+        "input_as_text": text,
+        "chat_history": context.chat_history,
+        "summary": context.summary,
+        "cache_key": prompt_cache_key(student.pk),
+    }
 
-    # append + validate + persist
-    updated_messages = prior_history + [user_msg.model_dump(mode="json")]
-    Conversation.model_validate(updated_messages)
+async def aappend_message_and_build_payload(student: Student, text: str) -> Dict[str, Any]:
+    """
+    Async variant of append_message_and_build_payload.
+    """
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError("text must be a non-empty string")
 
-    student.messages = updated_messages
-    student.full_clean()
-    student.save(update_fields=["messages"])
+    context = await sync_to_async(build_reply_context)(student, text)
+
+    user_msg = MessageItem(role="user", content=text.strip())
+    await StudentMessage.objects.acreate(student=student, role=user_msg.role, content=user_msg.content)
 
     return {
         "input_as_text": text,
-        "chat_history": prior_history,
+        "chat_history": context.chat_history,
+        "summary": context.summary,
+        "cache_key": prompt_cache_key(student.pk),
     }
 
 # === Standard OpenAI SDK integration (Option A) ===
 
+# Kept for callers that read the prompt text directly; see prompts.py
+UNIZG_SYSTEM_PROMPT = UNIZG_SYSTEM.text
+
 _openai_client: OpenAI | None = None
 
 def _get_openai_client() -> OpenAI:
@@ -58,152 +83,196 @@ def _get_openai_client() -> OpenAI:
     return _openai_client
 
 
-UNIZG_SYSTEM_PROMPT = """You are Explore UNIZG Assistant, a friendly guide for students on the Explore UNIZG website (University of Zagreb). Default language: Croatian. If the user writes in English, reply in English until they switch back. Tone: warm, brief, helpful, lightly suggestive, with occasional emojis. Goal: help users quickly find what they need: information about the University of Zagreb and its faculties, job openings and applications, job recommendations, student & networking events (career fairs, hackathons, workshops, meetups), and student organizations (with links to their profiles). No data storage or tools. Do not claim to save anything or perform background actions.
-Behavior guidelines
-Start with a short welcome (1–2 sentences) and offer quick options.
-Ask up to 3 concise questions to tailor help (study field, job type, location, key skills).
-Keep answers short: small paragraphs and bullet points (3–5 items).
-When relevant, include a plain text action hint like [Izradi AI životopis] to suggest creating an AI CV (UI handled elsewhere).
-If the user asks for profiles, provide clear links or slugs they can open on the site (e.g., faculty/employer/student org profiles).
-If something isn’t available, say so briefly and suggest another path.
-Never promise saving data, scheduling, or external calls.
-Formatting: Use plain text only. Do NOT use Markdown bold or italics. Never output asterisks (*).
-Links: Include at most one link only when essential; otherwise use short plain slugs (e.g., fer.unizg.hr) without markdown. Never add tracking parameters or query strings. Do not use markdown link syntax []().
-You may use web search when helpful, but restrict sources to www.unizg.hr and szzg.unizg.hr.
-
-💡 Personalizirane preporuke
-MUST template first reply (Croatian): „Hej 👋 Dobrodošao na Explore UNIZG! Ovdje možeš pronaći poslove, događaje i studentske udruge te informacije o fakultetima i poslodavcima. Pregled poslova, Događaji ovog tjedna, Studentske udruge, Fakulteti, Pitaj me što te zanima.“
-Follow-up questions (ask only what’s needed):
-„Koji studij ili smjer te zanima?“
-„Tražiš praksu, studentski posao ili juniorsku full-time poziciju?“
-"Jel imaš karijerne ciljeve?"
-„Koje vještine želiš istaknuti (npr. Python, marketing, dizajn)?“
-If user switches to English, respond like this: “Hi! I can help you find jobs, events, and student organizations at the University of Zagreb. What would you like to explore first?”
-
-Important: Never claim you can save data, schedule tasks, or perform background or external actions. If asked to do so, politely decline and proceed with guidance only.
-
-Dont repeat yourself.
-Keep it short, rather send links for more information.
-
-When having doubts about the user's question, ask them to clarify and specify what you can do.
-MUST template: Ovdje možeš pronaći poslove, događaje i studentske udruge te informacije o fakultetima i poslodavcima. Pregled poslova, Događaji ovog tjedna, Studentske udruge, Fakulteti, Pitaj me što te zanima.
-"""
-
-def _history_to_response_items(history: List[dict]) -> List[dict]:
-    """
-    Convert our stored conversation [{'role': 'user'|'agent', 'content': '...'}]
-    to the Responses API item shape.
-    """
-    items: List[dict] = []
-    for item in history or []:
-        role = item.get("role")
-        content = item.get("content", "")
-        if not isinstance(content, str) or not content:
-            continue
-        mapped_role = "assistant" if role == "agent" else "user"
-        items.append({
-            "role": mapped_role,
-            "content": [
-                # Use output_text for assistant turns, input_text for user turns
-                {"type": "output_text" if mapped_role == "assistant" else "input_text", "text": content}
-            ],
-        })
-    return items
-
-
-def _strip_query(url: str) -> str:
-    try:
-        parts = urllib.parse.urlsplit(url)
-        # Drop all query parameters entirely for cleaner links
-        return urllib.parse.urlunsplit((parts.scheme, parts.netloc, parts.path, "", parts.fragment))
-    except Exception:
-        return url
+_async_openai_client: AsyncOpenAI | None = None
+
+def _get_async_openai_client() -> AsyncOpenAI:
+    """
+    Async counterpart of _get_openai_client for the async views; one client
+    (and connection pool) is shared by all in-flight requests.
+    """
+    global _async_openai_client
+    if _async_openai_client is None:
+        api_key = os.environ.get("OPENAI_API_KEY", "")
+        if not api_key:
+            raise RuntimeError("OPENAI_API_KEY is not set in environment")
+        _async_openai_client = AsyncOpenAI(api_key=api_key)
+    return _async_openai_client
+
 
+def _usage_kind(web_search: bool) -> str:
+    return "reply_web_search" if web_search else "reply"
 
-def sanitize_assistant_text(text: str) -> str:
+
+def generate_unizg_reply(
+    input_text: str,
+    chat_history: List[dict],
+    summary: str = "",
+    cache_key: Optional[str] = None,
+    snippets: Sequence[str] = (),
+    web_search: bool = True,
+) -> str:
     """
-    Post-process the model output:
-      - remove bold markers (asterisks)
-      - strip UTM params from URLs
-      - limit to at most one clickable URL; replace extra URLs with their domain
+    Call OpenAI Responses API with our system prompt and conversation context.
+    `snippets` are locally retrieved records for this turn; the model may
+    only use the web_search tool when `web_search` is set.
+    Returns the assistant's text reply.
     """
-    if not isinstance(text, str):
-        return ""
-    # Remove all asterisks to avoid bold/italics markers
-    sanitized = text.replace("*", "")
+    client = _get_openai_client()
 
-    url_pattern = r"https?://[^\s)]+"
-    urls = re.findall(url_pattern, sanitized)
-    if not urls:
-        # Also normalize markdown-style links even if no URL regex was matched earlier
-        pass
+    started = time.perf_counter()
+    resp = client.responses.create(**reply_request(input_text, chat_history, summary, cache_key, snippets, web_search))
+    record_usage(_usage_kind(web_search), resp.usage, time.perf_counter() - started)
+    raw = resp.output_text or ""
+    return sanitize_assistant_text(raw)
 
-    first_url = urls[0] if urls else None
 
-    def replace_url(match: re.Match) -> str:
-        url = match.group(0)
-        clean = _strip_query(url)
-        if first_url and url == first_url:
-            return clean
-        netloc = urllib.parse.urlsplit(clean).netloc or "link"
-        return netloc
+async def agenerate_unizg_reply(
+    input_text: str,
+    chat_history: List[dict],
+    summary: str = "",
+    cache_key: Optional[str] = None,
+    snippets: Sequence[str] = (),
+    web_search: bool = True,
+) -> str:
+    """
+    Async variant of generate_unizg_reply using the AsyncOpenAI client.
+    """
+    client = _get_async_openai_client()
 
-    if urls:
-        sanitized = re.sub(url_pattern, replace_url, sanitized)
+    started = time.perf_counter()
+    resp = await client.responses.create(**reply_request(input_text, chat_history, summary, cache_key, snippets, web_search))
+    record_usage(_usage_kind(web_search), resp.usage, time.perf_counter() - started)
+    raw = resp.output_text or ""
+    return sanitize_assistant_text(raw)
 
-    # Convert markdown links [text](url) to either the visible text (if looks like domain/slug)
-    # or to the cleaned URL. This also helps remove leftover brackets/parentheses.
-    md_link_pattern = re.compile(r"\[([^\]]+)\]\((https?://[^\s)]+)\)")
 
-    def replace_md_link(m: re.Match) -> str:
-        visible = m.group(1).strip()
-        url = _strip_query(m.group(2))
-        # If visible looks like a domain or slug, prefer it; else show the cleaned URL
-        if re.match(r"^[\w.-]+(\.[\w.-]+)+(\/[\w./-]*)?$", visible):
-            return visible
-        return url
+async def stream_unizg_reply(
+    input_text: str,
+    chat_history: List[dict],
+    summary: str = "",
+    cache_key: Optional[str] = None,
+    snippets: Sequence[str] = (),
+    web_search: bool = True,
+) -> AsyncIterator[str]:
+    """
+    Streaming variant of generate_unizg_reply: yields sanitized text chunks
+    as the model produces them. Raises RuntimeError if the response fails.
+    """
+    client = _get_async_openai_client()
+    sanitizer = StreamingSanitizer()
 
-    sanitized = md_link_pattern.sub(replace_md_link, sanitized)
-    return sanitized
+    started = time.perf_counter()
+    first_token: Optional[float] = None
+    stream = await client.responses.create(**reply_request(input_text, chat_history, summary, cache_key, snippets, web_search), stream=True)
+    try:
+        async for event in stream:
+            if event.type == "response.output_text.delta":
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                chunk = sanitizer.feed(event.delta)
+                if chunk:
+                    yield chunk
+            elif event.type == "response.completed":
+                record_usage(_usage_kind(web_search), event.response.usage, time.perf_counter() - started, first_token)
+            elif event.type in ("response.failed", "error"):
+                error = getattr(getattr(event, "response", None), "error", None) or getattr(event, "message", "")
+                raise RuntimeError(f"Response failed: {error}")
+    finally:
+        await stream.close()
+    chunk = sanitizer.finish()
+    if chunk:
+        yield chunk
+
+
+async def aappend_agent_reply(student: Student, reply: str) -> dict:
+    """
+    Validate the assistant reply and append it to the student's
+    conversation. Returns the stored message.
+    """
+    agent_msg = MessageItem(role="agent", content=reply)
+    row = await StudentMessage.objects.acreate(student=student, role=agent_msg.role, content=agent_msg.content)
+    return row.as_item()
 
 
-def generate_unizg_reply(input_text: str, chat_history: List[dict]) -> str:
+async def afold_student_history(student: Student) -> bool:
     """
-    Call OpenAI Responses API with our system prompt and conversation context.
-    Returns the assistant's text reply.
+    Fold older turns into the student's rolling summary when enough have
+    piled up (see context.afold_history). Safe to run next to a reply.
     """
-    client = _get_openai_client()
+    try:
+        client = _get_async_openai_client()
+    except RuntimeError:
+        return False
+    return await afold_history(student, client)
 
-    messages: List[dict] = [
-        *_history_to_response_items(chat_history),
-        {
-            "role": "user",
-            "content": [{"type": "input_text", "text": input_text}],
-        },
-    ]
-
-    resp = client.responses.create(
-        model="gpt-4.1",
-        input=messages,
-        instructions=UNIZG_SYSTEM_PROMPT,
-        tools=[{"type": "web_search"}],
-    )
-    raw = resp.output_text or ""
-    return sanitize_assistant_text(raw)
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+def _embed_batch(texts: List[str]) -> List[List[float]]:
+    client = _get_openai_client()
+    resp = client.embeddings.create(model=EMBEDDING_MODEL, input=texts)
+    if len(resp.data or []) != len(texts) or not all(getattr(d, "embedding", None) for d in resp.data):
+        raise RuntimeError("Embedding API returned no embedding")
+    return [item.embedding for item in sorted(resp.data, key=lambda d: d.index)]
 
 
 def generate_text_embedding(text: str) -> List[float]:
     """
-    Generate an OpenAI embedding vector for the provided text.
+    Generate an OpenAI embedding vector for the provided text
+    (served from the embedding cache when the text was seen before).
     """
     if not isinstance(text, str) or not text.strip():
         raise ValueError("text must be a non-empty string")
-    client = _get_openai_client()
-    resp = client.embeddings.create(model="text-embedding-3-small", input=[text])
-    if not resp.data or not getattr(resp.data[0], "embedding", None):
-        raise RuntimeError("Embedding API returned no embedding")
-    # Ensure plain float list for JSON serialization
-    emb: Sequence[float] = resp.data[0].embedding
-    return [float(x) for x in emb]
+    return get_embedding_cache().embed(EMBEDDING_MODEL, [text], _embed_batch)[0]
 
 
+async def agenerate_text_embeddings(texts: List[str]) -> List[List[float]]:
+    """
+    Async batch embedding: cached texts are served locally, the rest are
+    split like the upload scripts' batches (EMBEDDING_BATCH_MAX_INPUTS texts
+    and EMBEDDING_BATCH_MAX_TOKENS tokens per request) and sent
+    EMBEDDING_BATCH_CONCURRENCY at a time.
+    """
+    if not texts or any(not isinstance(t, str) or not t.strip() for t in texts):
+        raise ValueError("texts must be non-empty strings")
+    cache = get_embedding_cache()
+    vectors = await sync_to_async(cache.get_many, thread_sensitive=False)(EMBEDDING_MODEL, texts)
+    missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+    if missing:
+        client = _get_async_openai_client()
+        batches = plan_batches(
+            missing,
+            token_counter(EMBEDDING_MODEL),
+            max(1, settings.EMBEDDING_BATCH_MAX_INPUTS),
+            max(1, settings.EMBEDDING_BATCH_MAX_TOKENS),
+        )
+        limit = asyncio.Semaphore(max(1, settings.EMBEDDING_BATCH_CONCURRENCY))
+
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            async with limit:
+                resp = await client.embeddings.create(model=EMBEDDING_MODEL, input=batch)
+            if len(resp.data or []) != len(batch) or not all(getattr(d, "embedding", None) for d in resp.data):
+                raise RuntimeError("Embedding API returned no embedding")
+            fresh = [item.embedding for item in sorted(resp.data, key=lambda d: d.index)]
+            await sync_to_async(cache.put_many, thread_sensitive=False)(EMBEDDING_MODEL, batch, fresh)
+            return fresh
+
+        results = await asyncio.gather(*(embed_batch(b) for b in batches))
+        # Same float32 values a later cache hit returns
+        by_text = {
+            t: np.asarray(v, dtype=np.float32).tolist()
+            for batch, fresh in zip(batches, results)
+            for t, v in zip(batch, fresh)
+        }
+        vectors = [v if v is not None else by_text[t] for t, v in zip(texts, vectors)]
+    return vectors
+
+
+async def agenerate_text_embedding(text: str) -> List[float]:
+    """
+    Async variant of generate_text_embedding.
+    """
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError("text must be a non-empty string")
+    return (await agenerate_text_embeddings([text]))[0]
@@ -1,19 +1,93 @@
 from django.shortcuts import render
-from django.http import JsonResponse, HttpRequest
+from django.db import DatabaseError
+from django.http import JsonResponse, HttpRequest, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST, require_http_methods
+import asyncio
 import json
-from datetime import datetime, timezone
-from typing import Optional
-from .models import Student, MessageItem, Conversation
-from .utils import append_message_and_build_payload, generate_unizg_reply, generate_text_embedding
-from graph_integration.models import Faculty, Organisation
-import numpy as np
-import re
+from typing import Any, AsyncIterator, Dict, List, Optional
+from asgiref.sync import sync_to_async
+from .models import Student, StudentMessage
+from .utils import (
+    aappend_agent_reply,
+    aappend_message_and_build_payload,
+    afold_student_history,
+    agenerate_unizg_reply,
+    stream_unizg_reply,
+)
+from . import response_cache
+from .retrieval import Retrieval, aretrieve
+from .student_embedding import aupdate_student_embedding
+from graph_integration.vector_index import get_vector_index
+from jobs.runner import enqueue
+
+def _sse(event: str, data: Dict[str, Any]) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+def _remember_reply(payload: Dict[str, Any], reply: str) -> None:
+    response_cache.remember(
+        payload["input_as_text"], payload["chat_history"], payload["summary"], reply, payload["retrieval"].embedding
+    )
+
+
+def _reply_args(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "input_text": payload["input_as_text"],
+        "chat_history": payload["chat_history"],
+        "summary": payload["summary"],
+        "cache_key": payload["cache_key"],
+        "snippets": payload["retrieval"].snippets,
+        "web_search": payload["retrieval"].web_search,
+    }
+
+
+async def _stream_reply_events(student: Student, payload: Dict[str, Any]) -> AsyncIterator[bytes]:
+    """
+    Server-sent events for a streamed reply: "start", then one "delta" per
+    sanitized chunk, then "done" once the reply is saved (or "error").
+    A cached answer is sent as a single delta.
+    """
+    yield _sse("start", {"student_id": student.id})
+    cached = payload["cached"]
+    if cached is not None:
+        try:
+            await aappend_agent_reply(student, cached.answer)
+        except Exception as e:
+            yield _sse("error", {"error": f"Failed to save message: {e}"})
+            return
+        yield _sse("delta", {"text": cached.answer})
+        yield _sse("done", {"answer": cached.answer, "student_id": student.id, "cached": True})
+        return
+    # Summarize older turns while the reply streams
+    fold = asyncio.create_task(afold_student_history(student))
+    parts: List[str] = []
+    try:
+        try:
+            async for chunk in stream_unizg_reply(**_reply_args(payload)):
+                parts.append(chunk)
+                yield _sse("delta", {"text": chunk})
+        except Exception as e:
+            yield _sse("error", {"error": f"Assistant error: {e}"})
+            return
+
+        agent_reply = "".join(parts).strip()
+        if agent_reply:
+            _remember_reply(payload, agent_reply)
+        agent_reply = agent_reply or "..."
+        try:
+            await aappend_agent_reply(student, agent_reply)
+        except Exception as e:
+            yield _sse("error", {"error": f"Failed to save message: {e}"})
+            return
+        yield _sse("done", {"answer": agent_reply, "student_id": student.id})
+    finally:
+        await fold
+
 
 @csrf_exempt
 @require_http_methods(["POST", "OPTIONS"])
-def process_message(request: HttpRequest):
+async def process_message(request: HttpRequest):
     def _add_cors_headers(response: JsonResponse) -> JsonResponse:
         origin = request.headers.get("Origin") or "*"
         response["Access-Control-Allow-Origin"] = origin
@@ -35,55 +109,75 @@ def process_message(request: HttpRequest):
     text: Optional[str] = payload.get("text")
     if not isinstance(text, str) or not text.strip():
         return _add_cors_headers(JsonResponse({"error": "Field 'text' is required"}, status=400))
+    stream = payload.get("stream") is True
 
     # Resolve student (create if not provided)
     student_id = payload.get("student_id")
     if student_id is not None:
         try:
-            student = Student.objects.get(id=student_id)
+            student = await Student.objects.aget(id=student_id)
         except Student.DoesNotExist:
             return _add_cors_headers(JsonResponse({"error": "Invalid student_id"}, status=404))
     else:
-        student = Student.objects.create(name="anonymous")
+        student = await Student.objects.acreate(name="anonymous")
 
+    # Look the turn up in the local index while the message is stored
+    retrieval = asyncio.create_task(aretrieve(text.strip()))
     try:
-        payload = append_message_and_build_payload(student, text.strip())
+        payload = await aappend_message_and_build_payload(student, text.strip())
     except Exception as e:
+        retrieval.cancel()
         return _add_cors_headers(JsonResponse({"error": f"Invalid message or history: {e}"}, status=400))
-
-    now_iso = datetime.now(timezone.utc).isoformat()
-    messages = list(student.messages or [])
-
-    # Generate real assistant reply via OpenAI Responses API
-    try:
-        agent_reply = generate_unizg_reply(payload["input_as_text"], payload["chat_history"]).strip() or "..."
-    except Exception as e:
-        return _add_cors_headers(JsonResponse({"error": f"Assistant error: {e}"}, status=500))
-    try:
-        agent_msg = MessageItem(role="agent", content=agent_reply, created_at=now_iso)
-        messages.append(agent_msg.model_dump(mode="json"))
-    except Exception as e:
-        return _add_cors_headers(JsonResponse({"error": f"Invalid agent reply: {e}"}, status=500))
-
-    # Validate full conversation
-    try:
-        Conversation.model_validate(messages)
-    except Exception as e:
-        return _add_cors_headers(JsonResponse({"error": f"Invalid conversation: {e}"}, status=400))
-
-    student.messages = messages
+    # Opening questions seen before are answered from memory; an exact repeat
+    # doesn't wait for the embedding, near-duplicates need it
+    cached = response_cache.lookup_exact(payload["input_as_text"], payload["chat_history"], payload["summary"])
+    if cached is not None:
+        retrieval.cancel()
+        payload["retrieval"] = Retrieval()
+    else:
+        payload["retrieval"] = await retrieval
+        cached = response_cache.lookup(
+            payload["input_as_text"], payload["chat_history"], payload["summary"], payload["retrieval"].embedding
+        )
+    payload["cached"] = cached
+
+    if stream:
+        # Forward deltas as they arrive (served incrementally under asgi.py)
+        response = StreamingHttpResponse(_stream_reply_events(student, payload), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return _add_cors_headers(response)
+
+    if cached is not None:
+        agent_reply = cached.answer
+    else:
+        # Generate real assistant reply via OpenAI Responses API; older turns are summarized alongside
+        fold = asyncio.create_task(afold_student_history(student))
+        try:
+            agent_reply = (await agenerate_unizg_reply(**_reply_args(payload))).strip()
+        except Exception as e:
+            return _add_cors_headers(JsonResponse({"error": f"Assistant error: {e}"}, status=500))
+        finally:
+            await fold
+        if agent_reply:
+            _remember_reply(payload, agent_reply)
+        agent_reply = agent_reply or "..."
+
+    # Append-only: one INSERT for the reply
     try:
-        student.full_clean()
-        student.save(update_fields=["messages"])
+        await aappend_agent_reply(student, agent_reply)
     except Exception as e:
         return _add_cors_headers(JsonResponse({"error": f"Failed to save message: {e}"}, status=500))
 
-    return _add_cors_headers(JsonResponse({"answer": agent_reply, "student_id": student.id}))
+    body = {"answer": agent_reply, "student_id": student.id}
+    if cached is not None:
+        body["cached"] = True
+    return _add_cors_headers(JsonResponse(body))
 
 
 @csrf_exempt
 @require_http_methods(["POST", "OPTIONS"])
-def embed_student_and_knn(request: HttpRequest):
+async def embed_student_and_knn(request: HttpRequest):
     def _add_cors_headers(response: JsonResponse) -> JsonResponse:
         origin = request.headers.get("Origin") or "*"
         response["Access-Control-Allow-Origin"] = origin
@@ -107,7 +201,7 @@ def embed_student_and_knn(request: HttpRequest):
     student_id = payload.get("student_id")
     if student_id is not None:
         try:
-            student = Student.objects.get(id=student_id)
+            student = await Student.objects.aget(id=student_id)
         except Student.DoesNotExist:
             return _add_cors_headers(JsonResponse({"error": "Invalid student_id"}, status=404))
     else:
@@ -115,86 +209,35 @@ def embed_student_and_knn(request: HttpRequest):
         if not isinstance(name, str) or not name.strip():
             return _add_cors_headers(JsonResponse({"error": "Field 'name' is required"}, status=400))
         try:
-            student = Student.objects.get(name=name.strip())
+            student = await Student.objects.aget(name=name.strip())
         except Student.DoesNotExist:
             return _add_cors_headers(JsonResponse({"error": "Student not found"}, status=404))
 
-    hist = list(student.messages or [])
-    if not hist:
+    if not await StudentMessage.objects.filter(student=student).aexists():
         return _add_cors_headers(JsonResponse({"error": "No messages for this student"}, status=400))
 
-    # Concatenate message contents in order
-    parts = []
-    for item in hist:
-        content = (item or {}).get("content") or ""
-        if isinstance(content, str) and content.strip():
-            parts.append(content.strip())
-    full_text = "\n\n".join(parts).strip()
-    if not full_text:
-        return _add_cors_headers(JsonResponse({"error": "No textual content to embed"}, status=400))
+    # Optionally hand the embedding + search to the job worker and return at once
+    if payload.get("background"):
+        job, _ = await sync_to_async(enqueue)("student_embedding", {"student_id": student.id})
+        return _add_cors_headers(JsonResponse({"student_id": student.id, "job_id": job.id, "status": job.status}, status=202))
 
-    # Generate and save embedding for the student
+    # Embed only messages added since the last call and fold them into the profile
     try:
-        embedding = generate_text_embedding(full_text)
+        embedding = await aupdate_student_embedding(student)
+    except DatabaseError as e:
+        return _add_cors_headers(JsonResponse({"error": f"Failed to save embedding: {e}"}, status=500))
     except Exception as e:
         return _add_cors_headers(JsonResponse({"error": f"Embedding error: {e}"}, status=500))
-    student.embedding = embedding
-    try:
-        student.full_clean()
-        student.save(update_fields=["embedding"])
-    except Exception as e:
-        return _add_cors_headers(JsonResponse({"error": f"Failed to save embedding: {e}"}, status=500))
+    if embedding is None:
+        return _add_cors_headers(JsonResponse({"error": "No textual content to embed"}, status=400))
 
-    # Prepare neighbor search across faculties and organisations (cosine on L2-normalized vectors)
-    def _l2_norm(vec: np.ndarray) -> np.ndarray:
-        n = np.linalg.norm(vec)
-        if n == 0.0:
-            return vec
-        return vec / n
-
-    query = _l2_norm(np.asarray(embedding, dtype=float))
-
-    items = []
-    # Faculties
-    for f in Faculty.objects.exclude(embedding__isnull=True):
-        emb = f.embedding or []
-        if not isinstance(emb, list) or not emb:
-            continue
-        vec = _l2_norm(np.asarray(emb, dtype=float))
-        sim = float(np.dot(query, vec))
-        dist = float(1.0 - sim)
-        # Match graph node id/label: cleaned faculty name (strip trailing " (UNIZG)")
-        raw_name = (f.name or "").strip()
-        label = re.sub(r"\s*\(UNIZG\)\s*$", "", raw_name)
-        items.append({
-            "type": "faculty",
-            "id": f.id,
-            "label": label,
-            "name": raw_name,
-            "abbreviation": (f.abbreviation or "").strip(),
-            "url": (f.url or "").strip(),
-            "distance": dist,
-        })
-    # Organisations
-    for o in Organisation.objects.exclude(embedding__isnull=True):
-        emb = o.embedding or []
-        if not isinstance(emb, list) or not emb:
-            continue
-        vec = _l2_norm(np.asarray(emb, dtype=float))
-        sim = float(np.dot(query, vec))
-        dist = float(1.0 - sim)
-        items.append({
-            "type": "organisation",
-            "id": o.id,
-            "label": (o.name or "").strip(),
-            "name": (o.name or "").strip(),
-            "abbreviation": (o.abbreviation or "").strip(),
-            "url": (o.url or "").strip(),
-            "distance": dist,
-        })
-
-    items_sorted = sorted(items, key=lambda x: x["distance"])
-    top_k = items_sorted[:3]
+    # Neighbor search across faculties and organisations (cosine on the pre-normalized index)
+    try:
+        index = await sync_to_async(get_vector_index)()
+        matches = index.search(embedding, k=3)
+    except ValueError as e:
+        return _add_cors_headers(JsonResponse({"error": f"Neighbor search error: {e}"}, status=500))
+    top_k = [{**item, "distance": dist} for item, dist in matches]
 
     return _add_cors_headers(JsonResponse({
         "student_id": student.id,
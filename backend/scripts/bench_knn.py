@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Recall vs latency of the kNN engines in graph_integration/neighbors.py.
+
+Exact blocked cosine search is the ground truth; every other mode is
+scored by recall@k against it. The old approach (kNN on the 2D PCA
+projection) is included as a baseline row.
+
+    python scripts/bench_knn.py --n 20000 --dim 1536 --k 5
+    python scripts/bench_knn.py --from-db organisation
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+PROJECT_ROOT = BACKEND_DIR.parent
+for _path in (str(PROJECT_ROOT), str(BACKEND_DIR)):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+from graph_integration.neighbors import EXACT, HNSW, IVF, KnnOptions, exact_knn, recall_at_k, timed_knn  # noqa: E402
+
+
+def synthetic(n: int, dim: int, topics: int, seed: int) -> np.ndarray:
+    """
+    Unit vectors scattered around `topics` random directions, roughly like
+    text embeddings of a catalogue with a few themes.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((topics, dim)).astype(np.float32)
+    X = centers[rng.integers(0, topics, n)] + 0.8 * rng.standard_normal((n, dim)).astype(np.float32)
+    X /= np.linalg.norm(X, axis=1, keepdims=True)
+    return X
+
+
+def from_db(node_type: str) -> np.ndarray:
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+    import django
+
+    django.setup()
+    from graph_integration.pipeline import l2_normalize_rows, load_nodes
+
+    nodes = load_nodes(node_type)
+    return l2_normalize_rows(nodes.X).astype(np.float32)
+
+
+def pca2d_knn(X: np.ndarray, k: int) -> np.ndarray:
+    # Neighbors on the 2D projection, as the graph used to be built
+    Xc = X - X.mean(axis=0)
+    _, _, vt = np.linalg.svd(Xc[: min(len(Xc), 5000)], full_matrices=False)
+    Z = Xc @ vt[:2].T
+    sq = (Z ** 2).sum(axis=1)
+    out: List[np.ndarray] = []
+    for start in range(0, len(Z), 1024):
+        d = sq[start : start + 1024, None] - 2.0 * Z[start : start + 1024] @ Z.T + sq[None, :]
+        d[np.arange(d.shape[0]), np.arange(start, start + d.shape[0])] = np.inf
+        out.append(np.argpartition(d, k - 1, axis=1)[:, :k])
+    return np.vstack(out)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark exact vs approximate kNN engines (recall@k and latency)")
+    parser.add_argument("--n", type=int, default=20000, help="Synthetic vectors (default: 20000)")
+    parser.add_argument("--dim", type=int, default=1536, help="Synthetic dimensionality (default: 1536)")
+    parser.add_argument("--topics", type=int, default=50, help="Synthetic topic centers (default: 50)")
+    parser.add_argument("--from-db", choices=["faculty", "organisation"], default=None, help="Use stored embeddings instead")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16], help="ivf probe counts to try")
+    parser.add_argument("--nlist", type=int, default=0, help="ivf cells, 0 = sqrt(n)")
+    parser.add_argument("--ef", type=int, nargs="+", default=[32, 64, 128], help="hnsw ef values to try")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    if args.from_db:
+        X = from_db(args.from_db)
+        source = f"{args.from_db} embeddings from DB"
+    else:
+        X = synthetic(args.n, args.dim, args.topics, args.seed)
+        source = f"synthetic, {args.topics} topics"
+    print(f"{X.shape[0]} vectors x {X.shape[1]} dims ({source}), k={args.k}")
+    if X.shape[0] <= args.k:
+        print("Not enough vectors.")
+        return
+
+    truth, _, exact_s = timed_knn(X, args.k, KnnOptions(backend=EXACT))
+    print(f"{'mode':<24} {'seconds':>9} {'recall@k':>9}")
+    print(f"{'exact':<24} {exact_s:9.3f} {1.0:9.3f}")
+
+    started = time.perf_counter()
+    flat = pca2d_knn(X, args.k)
+    print(f"{'pca2d (old)':<24} {time.perf_counter() - started:9.3f} {recall_at_k(flat, truth):9.3f}")
+
+    for nprobe in args.nprobe:
+        idx, _, seconds = timed_knn(X, args.k, KnnOptions(backend=IVF, nlist=args.nlist, nprobe=nprobe, random_state=args.seed))
+        print(f"{'ivf nprobe=' + str(nprobe):<24} {seconds:9.3f} {recall_at_k(idx, truth):9.3f}")
+
+    for ef in args.ef:
+        try:
+            idx, _, seconds = timed_knn(X, args.k, KnnOptions(backend=HNSW, ef=ef, random_state=args.seed))
+        except RuntimeError as e:
+            print(f"{'hnsw':<24} skipped: {e}")
+            break
+        print(f"{'hnsw ef=' + str(ef):<24} {seconds:9.3f} {recall_at_k(idx, truth):9.3f}")
+
+    # Sanity check: blocked search agrees with a single unblocked pass
+    check = min(2000, X.shape[0])
+    small, _ = exact_knn(X[:check], args.k, block_size=check)
+    blocked, _ = exact_knn(X[:check], args.k, block_size=97)
+    print(f"blocked == unblocked on {check} rows: {bool(recall_at_k(blocked, small) == 1.0)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of assistant text sanitizing (openai_integration/sanitize.py).
+
+Runs the single-pass sanitizer and its streaming variant over a set of
+realistic assistant replies (welcome template, faculty and job answers with
+URLs and markdown links, long lists) and compares them with the previous
+multi-pass implementation, kept below as the baseline. Streaming is fed in
+model-sized deltas of a few characters.
+
+    python scripts/bench_sanitize.py
+    python scripts/bench_sanitize.py --repeat 2000 --delta 4
+"""
+import argparse
+import random
+import re
+import sys
+import time
+import urllib.parse
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from openai_integration.sanitize import StreamingSanitizer, sanitize_assistant_text  # noqa: E402
+
+SAMPLES: Dict[str, str] = {
+    "welcome": (
+        "Hej 👋 Dobrodošao na Explore UNIZG! Ovdje možeš pronaći poslove, događaje i studentske udruge te "
+        "informacije o fakultetima i poslodavcima. Pregled poslova, Događaji ovog tjedna, Studentske udruge, "
+        "Fakulteti, Pitaj me što te zanima."
+    ),
+    "faculty": (
+        "Ako te zanima računarstvo, pogledaj **Fakultet elektrotehnike i računarstva (FER)** 💡\n\n"
+        "- Preddiplomski studij: Računarstvo, Elektrotehnika i informacijska tehnologija\n"
+        "- Istraživanja: umjetna inteligencija, robotika, obrada signala\n"
+        "- Laboratoriji: LARICS, ZEMRIS\n\n"
+        "Više informacija: [FER](https://www.fer.hr/studiji?utm_source=chatgpt.com&utm_medium=referral) "
+        "ili na stranici Sveučilišta https://www.unizg.hr/studiji?utm_source=chatgpt.com. "
+        "Za upise pogledaj i https://www.srce.unizg.hr/?ref=abc te postani.unizg.hr.\n\n"
+        "[Izradi AI životopis]"
+    ),
+    "jobs": (
+        "Evo nekoliko prijedloga za studentske poslove 👇\n\n"
+        "1. *Junior Data Analyst* – Infobip, Zagreb (hibridno) – https://www.infobip.com/careers?utm_campaign=x\n"
+        "2. *Frontend praksa* – Rimac Technology – https://www.rimac-automobili.com/careers/?gclid=123\n"
+        "3. *Student asistent u laboratoriju* – [fer.hr/laboratoriji](https://www.fer.hr/laboratoriji?x=1)\n"
+        "4. *Marketing praksa* – Studentski centar – https://www.sczg.unizg.hr/posao/\n\n"
+        "Koje vještine želiš istaknuti (npr. Python, marketing, dizajn)?"
+    ),
+    "english": (
+        "Hi! I can help you find jobs, events, and student organizations at the University of Zagreb. "
+        "For example, **eSTIEM Zagreb** runs case-study competitions and **BEST Zagreb** organises hackathons. "
+        "See [best-zagreb.org](https://best-zagreb.org/?utm_source=chatgpt.com) for upcoming events, "
+        "or browse all associations at https://www.unizg.hr/studenti/udruge?utm_source=chatgpt.com. "
+        "What would you like to explore first?"
+    ),
+}
+
+
+def long_sample() -> str:
+    # A long list-style answer: many plain lines, a few links scattered through it
+    lines = []
+    for i in range(60):
+        line = f"- Udruga {i}: projekti iz područja održivosti, podatkovne znanosti i poduzetništva 🌱"
+        if i % 15 == 0:
+            line += f" (https://udruga{i}.unizg.hr/o-nama?utm_source=chatgpt.com)"
+        lines.append(line)
+    return "Studentske udruge koje bi te mogle zanimati:\n\n" + "\n".join(lines)
+
+
+SAMPLES["long_list"] = long_sample()
+
+
+# --- Previous implementation (baseline) ---
+
+def _legacy_strip_query(url: str) -> str:
+    try:
+        parts = urllib.parse.urlsplit(url)
+        return urllib.parse.urlunsplit((parts.scheme, parts.netloc, parts.path, "", parts.fragment))
+    except Exception:
+        return url
+
+
+_LEGACY_URL = re.compile(r"https?://[^\s)]+")
+_LEGACY_MD = re.compile(r"\[([^\]]+)\]\((https?://[^\s)]+)\)")
+_LEGACY_SLUG = re.compile(r"^[\w.-]+(\.[\w.-]+)+(\/[\w./-]*)?$")
+
+
+def _legacy_sanitize(text: str, first_url: Optional[str]) -> Tuple[str, Optional[str]]:
+    sanitized = text.replace("*", "")
+    if first_url is None:
+        match = _LEGACY_URL.search(sanitized)
+        if match:
+            first_url = match.group(0)
+
+    def replace_url(match: re.Match) -> str:
+        url = match.group(0)
+        clean = _legacy_strip_query(url)
+        if first_url and url == first_url:
+            return clean
+        return urllib.parse.urlsplit(clean).netloc or "link"
+
+    sanitized = _LEGACY_URL.sub(replace_url, sanitized)
+
+    def replace_md_link(m: re.Match) -> str:
+        visible = m.group(1).strip()
+        url = _legacy_strip_query(m.group(2))
+        return visible if _LEGACY_SLUG.match(visible) else url
+
+    return _LEGACY_MD.sub(replace_md_link, sanitized), first_url
+
+
+def _legacy_open_link_start(text: str) -> int:
+    pos = text.find("[")
+    while pos != -1:
+        close = text.find("]", pos + 1)
+        if close == -1 or close + 1 == len(text):
+            return pos
+        if text[close + 1] == "(" and not re.search(r"[\s)]", text[close + 2:]):
+            return pos
+        pos = text.find("[", pos + 1)
+    return -1
+
+
+class LegacyStreamingSanitizer:
+    def __init__(self) -> None:
+        self._buffer = ""
+        self._first_url: Optional[str] = None
+        self._started = False
+
+    def _emit(self, piece: str) -> str:
+        if not self._started:
+            piece = piece.lstrip()
+            if not piece:
+                return ""
+            self._started = True
+        out, self._first_url = _legacy_sanitize(piece, self._first_url)
+        return out
+
+    def feed(self, delta: str) -> str:
+        self._buffer += (delta or "").replace("*", "")
+        limit = len(self._buffer)
+        pending = _legacy_open_link_start(self._buffer)
+        if pending != -1:
+            limit = pending
+        links = [m.span() for m in _LEGACY_MD.finditer(self._buffer)]
+        cut = -1
+        for i in range(limit - 1, -1, -1):
+            if self._buffer[i].isspace() and not any(start < i < end for start, end in links):
+                cut = i
+                break
+        while cut > 0 and self._buffer[cut - 1].isspace():
+            cut -= 1
+        if cut <= 0:
+            return ""
+        piece, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        return self._emit(piece)
+
+    def finish(self) -> str:
+        piece, self._buffer = self._buffer.rstrip(), ""
+        return self._emit(piece) if piece else ""
+
+
+def legacy_sanitize(text: str) -> str:
+    return _legacy_sanitize(text, None)[0]
+
+
+# --- Benchmark ---
+
+def split_deltas(text: str, size: int, rng: random.Random) -> List[str]:
+    # Model deltas are a token or two: vary the size around the mean
+    deltas = []
+    i = 0
+    while i < len(text):
+        step = max(1, int(rng.expovariate(1.0 / size)))
+        deltas.append(text[i : i + step])
+        i += step
+    return deltas
+
+
+def per_call_us(fn: Callable[[], object], repeat: int) -> float:
+    fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def stream(factory: Callable[[], object], deltas: List[str]) -> str:
+    sanitizer = factory()
+    out = [sanitizer.feed(d) for d in deltas]
+    out.append(sanitizer.finish())
+    return "".join(out)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark sanitize_assistant_text and StreamingSanitizer")
+    parser.add_argument("--repeat", type=int, default=1000, help="Calls per measurement (default: 1000)")
+    parser.add_argument("--delta", type=int, default=4, help="Mean streamed delta size in characters (default: 4)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    rng = random.Random(args.seed)
+
+    print(f"{'sample':<10} {'chars':>6} {'deltas':>6} | {'full old':>9} {'full new':>9} {'x':>5} | "
+          f"{'stream old':>10} {'stream new':>10} {'x':>5} | same")
+    for name, text in SAMPLES.items():
+        deltas = split_deltas(text, args.delta, rng)
+        full_old = per_call_us(lambda: legacy_sanitize(text), args.repeat)
+        full_new = per_call_us(lambda: sanitize_assistant_text(text), args.repeat)
+        stream_repeat = max(1, args.repeat // 10)
+        stream_old = per_call_us(lambda: stream(LegacyStreamingSanitizer, deltas), stream_repeat)
+        stream_new = per_call_us(lambda: stream(StreamingSanitizer, deltas), stream_repeat)
+        streamed = stream(StreamingSanitizer, deltas)
+        full = sanitize_assistant_text(text)
+        # New streaming output must equal the one-shot result; "same" also compares with the old output
+        assert streamed == full.strip(), f"{name}: streamed output differs from sanitize_assistant_text"
+        same = "yes" if full == legacy_sanitize(text) else "no"
+        print(f"{name:<10} {len(text):>6} {len(deltas):>6} | {full_old:8.1f}u {full_new:8.1f}u {full_old / full_new:5.1f} | "
+              f"{stream_old:9.1f}u {stream_new:9.1f}u {stream_old / stream_new:5.1f} | {same}")
+    print("u = microseconds per reply; stream = all deltas of one reply plus finish()")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,11 @@ import json
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
+import numpy as np
+
 # Make project importable
-PROJECT_ROOT = Path("/home/pitfa/Documents/explore_unizg").resolve()
-BACKEND_DIR = PROJECT_ROOT / "backend"
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+PROJECT_ROOT = BACKEND_DIR.parent
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 if str(BACKEND_DIR) not in sys.path:
@@ -36,7 +38,7 @@ def faculty_to_dict(f: Faculty) -> Dict[str, Any]:
         "typical_outputs": f.typical_outputs,
         "keywords": f.keywords,
         "url": f.url,
-        "embedding": f.embedding,
+        "embedding": f.embedding.tolist() if f.embedding is not None else None,
     }
 
 
@@ -45,6 +47,24 @@ def export_faculties() -> List[Dict[str, Any]]:
     return [faculty_to_dict(f) for f in faculties]
 
 
+def split_embeddings(data: List[Dict[str, Any]]) -> np.ndarray:
+    """
+    Move embeddings out of the records into a float32 matrix; each record
+    keeps an "embedding_row" index into it (None when it has no embedding).
+    """
+    rows: List[List[float]] = []
+    for item in data:
+        emb = item.pop("embedding", None)
+        if emb:
+            item["embedding_row"] = len(rows)
+            rows.append(emb)
+        else:
+            item["embedding_row"] = None
+    if not rows:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.asarray(rows, dtype=np.float32)
+
+
 def main(argv: Optional[List[str]] = None) -> None:
     import argparse
 
@@ -57,9 +77,21 @@ def main(argv: Optional[List[str]] = None) -> None:
         default="",
         help="Output file path. If omitted, prints to stdout.",
     )
+    parser.add_argument(
+        "--embeddings-npy",
+        type=str,
+        default="",
+        help="Optional .npy sidecar for embeddings; the JSON then stores row indices instead of float lists.",
+    )
     args = parser.parse_args(argv)
 
     data = export_faculties()
+    if args.embeddings_npy:
+        npy_path = Path(args.embeddings_npy).expanduser().resolve()
+        npy_path.parent.mkdir(parents=True, exist_ok=True)
+        matrix = split_embeddings(data)
+        np.save(npy_path, matrix)
+        print(f"Wrote {matrix.shape[0]} embeddings to {npy_path}", file=sys.stderr)
     if args.out:
         out_path = Path(args.out).expanduser().resolve()
         out_path.parent.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI embeddings endpoint, for exercising the
+batch embedding client (concurrency, 429 handling, resume) offline.
+
+Vectors are deterministic per text (seeded by its hash), so reruns and
+cache hits can be compared exactly.
+
+    python scripts/fake_embeddings_server.py --port 8765 --rate-limit-every 5 --retry-after 1
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake python scripts/main.py
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+import numpy as np
+
+
+def fake_vector(text: str, dim: int) -> List[float]:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vec = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return (vec / np.linalg.norm(vec)).tolist()
+
+
+class FakeEmbeddingsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, dim: int, latency: float, rate_limit_every: int, retry_after: float, fail_after: int):
+        super().__init__(address, Handler)
+        self.dim = dim
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.fail_after = fail_after
+        self.requests = 0
+        self.inputs = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+
+class Handler(BaseHTTPRequestHandler):
+    server: FakeEmbeddingsServer
+
+    def log_message(self, format, *args):  # noqa: A002
+        pass
+
+    def _json(self, status: int, body: dict, headers: Optional[dict] = None) -> None:
+        raw = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_POST(self):
+        srv = self.server
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        if not self.path.endswith("/embeddings"):
+            return self._json(404, {"error": {"message": "not found"}})
+        with srv._lock:
+            srv.requests += 1
+            n = srv.requests
+            srv._in_flight += 1
+            srv.max_in_flight = max(srv.max_in_flight, srv._in_flight)
+        try:
+            if srv.rate_limit_every and n % srv.rate_limit_every == 0:
+                return self._json(
+                    429,
+                    {"error": {"message": "Rate limit reached", "type": "requests"}},
+                    {"Retry-After": f"{srv.retry_after:g}"},
+                )
+            if srv.fail_after and n > srv.fail_after:
+                return self._json(400, {"error": {"message": "Simulated hard failure"}})
+            time.sleep(srv.latency)
+            texts = body.get("input") or []
+            texts = [texts] if isinstance(texts, str) else texts
+            with srv._lock:
+                srv.inputs += len(texts)
+            data = [{"object": "embedding", "index": i, "embedding": fake_vector(t, srv.dim)} for i, t in enumerate(texts)]
+            return self._json(200, {
+                "object": "list",
+                "data": data,
+                "model": body.get("model"),
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            })
+        finally:
+            with srv._lock:
+                srv._in_flight -= 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake OpenAI embeddings server for local testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per successful request (default: 0.2)")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every Nth request with 429 (default: never)")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s (default: 1)")
+    parser.add_argument("--fail-after", type=int, default=0, help="Answer 400 to every request after the Nth (default: never)")
+    args = parser.parse_args()
+
+    server = FakeEmbeddingsServer(
+        (args.host, args.port), args.dim, args.latency, args.rate_limit_every, args.retry_after, args.fail_after
+    )
+    print(f"Fake embeddings API on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"{server.requests} requests, {server.inputs} inputs embedded, max {server.max_in_flight} in flight")
+
+
+if __name__ == "__main__":
+    main()
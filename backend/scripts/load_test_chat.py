@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Concurrent load test for the OpenAI-bound endpoints.
+
+Fires N requests at /api/message/ (or /api/embed-student/) with a fixed
+number in flight and reports throughput and latency / time-to-first-byte
+percentiles. Pair it with the stub API so upstream latency is fixed and
+free:
+
+    python scripts/stub_openai_server.py --delay 1.0 &
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=stub \\
+        uvicorn asgi:application --port 8000 --workers 1 &
+    python scripts/load_test_chat.py --concurrency 200 --requests 1000
+
+Run it again against a thread-per-request server (e.g. wsgi.py under
+`manage.py runserver --nothreading`) to compare: there every request holds
+the worker for the full upstream delay.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List, Optional, Tuple
+
+import httpx
+
+
+async def _one(client: httpx.AsyncClient, url: str, body: dict) -> Tuple[float, Optional[float], bool]:
+    """
+    Returns (latency, time to first byte, ok).
+    """
+    start = time.perf_counter()
+    ttfb: Optional[float] = None
+    try:
+        async with client.stream("POST", url, json=body) as resp:
+            async for _ in resp.aiter_bytes():
+                if ttfb is None:
+                    ttfb = time.perf_counter() - start
+            ok = resp.status_code == 200
+    except httpx.HTTPError:
+        ok = False
+    return time.perf_counter() - start, ttfb, ok
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+async def run(args: argparse.Namespace) -> None:
+    base = args.url.rstrip("/")
+    if args.endpoint == "embed":
+        url = f"{base}/api/embed-student/"
+    else:
+        url = f"{base}/api/message/"
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(args.timeout)
+    results: List[Tuple[float, Optional[float], bool]] = []
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(i)
+
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        student_id = args.student_id
+        if args.endpoint == "embed" and student_id is None:
+            # Give the embed endpoint a conversation to work on
+            resp = await client.post(f"{base}/api/message/", json={"text": "Zanima me računarstvo i robotika."})
+            resp.raise_for_status()
+            student_id = resp.json()["student_id"]
+
+        async def worker() -> None:
+            while True:
+                try:
+                    i = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                if args.endpoint == "embed":
+                    body = {"student_id": student_id}
+                else:
+                    body = {"text": f"Load test poruka {i}", "stream": args.stream}
+                results.append(await _one(client, url, body))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        wall = time.perf_counter() - started
+
+    latencies = [lat for lat, _, ok in results if ok]
+    ttfbs = [t for _, t, ok in results if ok and t is not None]
+    errors = sum(1 for _, _, ok in results if not ok)
+    print(f"Endpoint:            {url}{' (stream)' if args.stream and args.endpoint == 'message' else ''}")
+    print(f"Requests:            {len(results)} ({errors} failed), concurrency {args.concurrency}")
+    print(f"Wall time:           {wall:.2f}s")
+    print(f"Throughput:          {len(latencies) / wall:.1f} req/s" if wall > 0 else "Throughput: n/a")
+    if latencies:
+        print(
+            f"Latency p50/p95/max: {_percentile(latencies, 50):.3f}s / "
+            f"{_percentile(latencies, 95):.3f}s / {max(latencies):.3f}s"
+        )
+        print(f"TTFB p50/p95:        {_percentile(ttfbs, 50):.3f}s / {_percentile(ttfbs, 95):.3f}s")
+        print(f"Mean latency:        {statistics.mean(latencies):.3f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test /api/message/ and /api/embed-student/")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Backend base URL")
+    parser.add_argument("--endpoint", choices=["message", "embed"], default="message")
+    parser.add_argument("--concurrency", type=int, default=100, help="Requests kept in flight")
+    parser.add_argument("--requests", type=int, default=500, help="Total requests")
+    parser.add_argument("--stream", action="store_true", help="Use the streaming mode of /api/message/")
+    parser.add_argument("--student-id", type=int, default=None, help="Student for --endpoint embed")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,12 +3,12 @@ import sys
 import json
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List
 from dotenv import load_dotenv
 
 # Ensure project root and backend are importable
-PROJECT_ROOT = Path("/home/pitfa/Documents/explore_unizg").resolve()
-BACKEND_DIR = PROJECT_ROOT / "backend"
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+PROJECT_ROOT = BACKEND_DIR.parent
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 if str(BACKEND_DIR) not in sys.path:
@@ -23,7 +23,13 @@ from django.apps import apps as django_apps  # noqa: E402
 if not django_apps.ready:
     django.setup()
 
-from graph_integration.models import Faculty  # noqa: E402
+from graph_integration.bulk import bulk_upsert_faculties  # noqa: E402
+from graph_integration.records import faculty_row  # noqa: E402
+from openai_integration.embedding_cache import get_embedding_cache  # noqa: E402
+from openai_integration.batch_embeddings import BatchEmbedder  # noqa: E402
+from graph_integration.edges import FACULTY  # noqa: E402
+from graph_integration.incremental import update_graph_nodes  # noqa: E402
+from django.conf import settings  # noqa: E402
 
 
 try:
@@ -42,9 +48,8 @@ if not OPENAI_API_KEY:
     )
 
 
-DATA_PATH = Path("/home/pitfa/Documents/explore_unizg/unizg_faculties.json")
+DATA_PATH = Path(os.environ.get("FACULTIES_DATA_PATH", PROJECT_ROOT / "unizg_faculties.json"))
 EMBED_MODEL = "text-embedding-3-small"
-BATCH_SIZE = 64
 
 
 client = OpenAI(api_key=OPENAI_API_KEY)
@@ -84,74 +89,21 @@ def load_faculties() -> List[Dict[str, str]]:
 
 
 def generate_all_embeddings(texts: List[str]) -> List[List[float]]:
-    embeddings: List[List[float]] = []
-    for i in range(0, len(texts), BATCH_SIZE):
-        batch = texts[i : i + BATCH_SIZE]
-        resp = client.embeddings.create(model=EMBED_MODEL, input=batch)
-        batch_embeddings = [item.embedding for item in resp.data]
-        embeddings.extend(batch_embeddings)
-        print(f"Embedded {i + len(batch)}/{len(texts)}")
+    cache = get_embedding_cache()
+    # Only texts missing from the embedding cache reach the API; finished
+    # batches are cached immediately, so an interrupted run resumes on rerun
+    embedder = BatchEmbedder(client, EMBED_MODEL, cache=cache, log=print)
+
+    hits_before, misses_before = cache.hits, cache.misses
+    embeddings = embedder.embed(texts)
     if len(embeddings) != len(texts):
         raise RuntimeError(
             f"Embedding count mismatch. Expected {len(texts)}, got {len(embeddings)}"
         )
+    print(f"Embedding cache: {cache.hits - hits_before} hits, {cache.misses - misses_before} misses")
     return embeddings
 
 
-def upsert_faculty_with_embedding(record: Dict[str, str], embedding: List[float]) -> Tuple[Faculty, bool]:
-    name = (record.get("Name") or "").strip()
-    abbr = (record.get("Abbreviation") or "").strip()
-    domain_areas = (record.get("Domain areas") or "").strip()
-    programs = (record.get("Programs") or "").strip()
-    research_topics = (record.get("Research topics") or "").strip()
-    methods_and_tech = (record.get("Methods & tech") or "").strip()
-    affiliations_and_labs = (record.get("Affiliations & labs") or "").strip()
-    typical_outputs = (record.get("Typical outputs") or "").strip()
-    keywords = (record.get("Keywords") or "").strip()
-    url = (record.get("URL") or "").strip()
-
-    obj, created = Faculty.objects.get_or_create(
-        abbreviation=abbr,
-        defaults={
-            "name": name,
-            "domain_areas": domain_areas,
-            "programs": programs,
-            "research_topics": research_topics,
-            "methods_and_tech": methods_and_tech,
-            "affiliations_and_labs": affiliations_and_labs,
-            "typical_outputs": typical_outputs,
-            "keywords": keywords,
-            "url": url,
-            "embedding": embedding,
-        },
-    )
-
-    if not created:
-        changed = False
-        for field, value in {
-            "name": name,
-            "domain_areas": domain_areas,
-            "programs": programs,
-            "research_topics": research_topics,
-            "methods_and_tech": methods_and_tech,
-            "affiliations_and_labs": affiliations_and_labs,
-            "typical_outputs": typical_outputs,
-            "keywords": keywords,
-            "url": url,
-        }.items():
-            if getattr(obj, field) != value:
-                setattr(obj, field, value)
-                changed = True
-        # Always update embedding to freshly generated one
-        if obj.embedding != embedding:
-            obj.embedding = embedding
-            changed = True
-        if changed:
-            obj.save()
-
-    return obj, created
-
-
 def main() -> None:
     records = load_faculties()
     prepared: List[FacultyPrepared] = [
@@ -163,16 +115,14 @@ def main() -> None:
     embeddings: List[List[float]] = generate_all_embeddings(texts)
 
     print("Upserting faculties with embeddings ...")
-    created_count = 0
-    updated_count = 0
-    for item, emb in zip(prepared, embeddings):
-        _, created = upsert_faculty_with_embedding(item.data, emb)
-        if created:
-            created_count += 1
-        else:
-            updated_count += 1
-
-    print(f"Done. Created: {created_count}, Updated: {updated_count}")
+    # One snapshot query, then bulk INSERT/UPDATE of changed columns only
+    result = bulk_upsert_faculties([{**faculty_row(item.data), "embedding": emb} for item, emb in zip(prepared, embeddings)])
+    changed_ids = result.embedding_changed
+    print(f"Done. {result.summary()} ({result.queries} queries)")
+
+    # Place changed nodes in the graph (falls back to a full rebuild past the drift threshold)
+    if changed_ids and settings.GRAPH_INCREMENTAL_MODE != "off":
+        update_graph_nodes(FACULTY, changed_ids, log=print)
 
 
 if __name__ == "__main__":
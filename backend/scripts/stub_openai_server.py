@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Minimal local stand-in for the OpenAI API, for load tests.
+
+Serves POST /v1/responses (plain and stream=true) and POST /v1/embeddings
+with a configurable latency, so the backend can be exercised without
+network access or API costs:
+
+    python scripts/stub_openai_server.py --port 8089 --delay 1.0
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=stub uvicorn asgi:application
+
+Responses report usage with simulated prompt caching (cached_tokens is the
+prefix shared with an earlier request under the same prompt_cache_key);
+--prefill-ms-per-1k adds first-token latency for the uncached part.
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+REPLY = (
+    "Hej 👋 Dobrodošao na Explore UNIZG! Ovdje možeš pronaći poslove, događaje i "
+    "studentske udruge te informacije o fakultetima. Više na https://www.unizg.hr/studiji"
+)
+
+
+def _fake_embedding(text: str, dim: int) -> List[float]:
+    # Deterministic per text, so repeated runs embed identically
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vec = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    vec /= float(np.linalg.norm(vec)) or 1.0
+    return vec.tolist()
+
+
+# Rough characters per token, and the provider's cache granularity in tokens
+_CHARS_PER_TOKEN = 4
+_CACHE_MIN_TOKENS = 1024
+_CACHE_BLOCK_TOKENS = 128
+
+
+def _prompt_text(payload: Dict[str, Any]) -> str:
+    # What prefix caching matches on: instructions, tools, then input items in order
+    parts = [payload.get("instructions") or "", json.dumps(payload.get("tools") or [], sort_keys=True)]
+    items = payload.get("input")
+    if isinstance(items, str):
+        items = [{"role": "user", "content": items}]
+    parts.extend(json.dumps(item, sort_keys=True, ensure_ascii=False) for item in items or [])
+    return "\n".join(parts)
+
+
+def _common_prefix(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def _response_object(model: str, text: str, usage: Tuple[int, int] = (100, 0)) -> Dict[str, Any]:
+    input_tokens, cached_tokens = usage
+    return {
+        "id": "resp_stub",
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": model,
+        "status": "completed",
+        "output": [{
+            "type": "message",
+            "id": "msg_stub",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }],
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {
+            "input_tokens": input_tokens,
+            "input_tokens_details": {"cached_tokens": cached_tokens},
+            "output_tokens": len(text.split()),
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": input_tokens + len(text.split()),
+        },
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "StubOpenAI/1.0"
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _prompt_usage(self, payload: Dict[str, Any]) -> Tuple[int, int]:
+        """
+        (input_tokens, cached_tokens) for a Responses request, simulating
+        prefix caching: the longest prefix shared with an earlier request
+        under the same prompt_cache_key, in whole cache blocks.
+        """
+        prompt = _prompt_text(payload)
+        input_tokens = len(prompt) // _CHARS_PER_TOKEN + 1
+        key = payload.get("prompt_cache_key") or ""
+        with self.server.cache_lock:
+            seen = self.server.prompt_cache.setdefault(key, [])
+            shared = max((_common_prefix(prompt, earlier) for earlier in seen), default=0)
+            seen.append(prompt)
+            del seen[:-20]
+        cached = shared // _CHARS_PER_TOKEN // _CACHE_BLOCK_TOKENS * _CACHE_BLOCK_TOKENS
+        return input_tokens, cached if cached >= _CACHE_MIN_TOKENS else 0
+
+    def _prefill_delay(self, usage: Tuple[int, int]) -> float:
+        # Uncached input tokens are what delays the first output token
+        return (usage[0] - usage[1]) / 1000.0 * self.server.prefill_ms_per_1k / 1000.0
+
+    def _send_json(self, status: int, data: Dict[str, Any], headers: Dict[str, str] = None) -> None:
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:  # noqa: N802
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "Invalid JSON", "type": "invalid_request_error"}})
+            return
+
+        if random.random() < self.server.rate_limit:
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached (stub)", "type": "requests", "code": "rate_limit_exceeded"}},
+                {"Retry-After": str(self.server.retry_after)},
+            )
+            return
+
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path.endswith("/embeddings"):
+            self._embeddings(payload)
+        elif path.endswith("/responses"):
+            usage = self._prompt_usage(payload)
+            if payload.get("stream"):
+                self._responses_stream(payload, usage)
+            else:
+                time.sleep(self.server.delay + self._prefill_delay(usage))
+                self._send_json(200, _response_object(payload.get("model", "gpt-4.1"), REPLY, usage))
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+
+    def _embeddings(self, payload: Dict[str, Any]) -> None:
+        inputs = payload.get("input")
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        time.sleep(self.server.embed_delay)
+        data = [
+            {"object": "embedding", "index": i, "embedding": _fake_embedding(str(text), self.server.dim)}
+            for i, text in enumerate(inputs or [])
+        ]
+        tokens = sum(len(str(text).split()) for text in inputs or [])
+        self._send_json(200, {
+            "object": "list",
+            "data": data,
+            "model": payload.get("model", "text-embedding-3-small"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    def _responses_stream(self, payload: Dict[str, Any], usage: Tuple[int, int]) -> None:
+        model = payload.get("model", "gpt-4.1")
+        words = REPLY.split(" ")
+        # Spread the configured latency over first token and the deltas
+        step = self.server.delay / (len(words) + 1)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        def send(event: Dict[str, Any]) -> None:
+            self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        seq = 0
+        send({"type": "response.created", "sequence_number": seq, "response": {**_response_object(model, ""), "status": "in_progress", "output": []}})
+        time.sleep(step + self._prefill_delay(usage))
+        for i, word in enumerate(words):
+            seq += 1
+            send({
+                "type": "response.output_text.delta",
+                "sequence_number": seq,
+                "item_id": "msg_stub",
+                "output_index": 0,
+                "content_index": 0,
+                "delta": word if i == 0 else " " + word,
+                "logprobs": [],
+            })
+            time.sleep(step)
+        send({"type": "response.completed", "sequence_number": seq + 1, "response": _response_object(model, REPLY, usage)})
+        self.close_connection = True
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Accept bursts of concurrent connections from load tests
+    request_queue_size = 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local stub of the OpenAI Responses and Embeddings APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--delay", type=float, default=1.0, help="Seconds per /v1/responses call")
+    parser.add_argument(
+        "--prefill-ms-per-1k", type=float, default=0.0,
+        help="Extra first-token latency per 1k uncached input tokens (simulated prompt caching)",
+    )
+    parser.add_argument("--embed-delay", type=float, default=0.2, help="Seconds per /v1/embeddings call")
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimensionality")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds on injected 429s")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = StubServer((args.host, args.port), StubHandler)
+    server.delay = args.delay
+    server.prefill_ms_per_1k = args.prefill_ms_per_1k
+    server.prompt_cache = {}
+    server.cache_lock = threading.Lock()
+    server.embed_delay = args.embed_delay
+    server.dim = args.dim
+    server.rate_limit = args.rate_limit
+    server.retry_after = args.retry_after
+    server.verbose = args.verbose
+    print(f"Stub OpenAI API on http://{args.host}:{args.port}/v1 (delay={args.delay}s, dim={args.dim})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
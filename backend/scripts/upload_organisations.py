@@ -3,12 +3,12 @@ import sys
 import json
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List
 from dotenv import load_dotenv
 
 # Ensure project root and backend are importable
-PROJECT_ROOT = Path("/home/pitfa/Documents/explore_unizg").resolve()
-BACKEND_DIR = PROJECT_ROOT / "backend"
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+PROJECT_ROOT = BACKEND_DIR.parent
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 if str(BACKEND_DIR) not in sys.path:
@@ -23,7 +23,13 @@ from django.apps import apps as django_apps  # noqa: E402
 if not django_apps.ready:
     django.setup()
 
-from graph_integration.models import Organisation  # noqa: E402
+from graph_integration.bulk import bulk_upsert_organisations  # noqa: E402
+from graph_integration.records import organisation_row, stringify  # noqa: E402
+from openai_integration.embedding_cache import get_embedding_cache  # noqa: E402
+from openai_integration.batch_embeddings import BatchEmbedder  # noqa: E402
+from graph_integration.edges import ORGANISATION  # noqa: E402
+from graph_integration.incremental import update_graph_nodes  # noqa: E402
+from django.conf import settings  # noqa: E402
 
 try:
     from openai import OpenAI  # noqa: E402
@@ -41,28 +47,12 @@ if not OPENAI_API_KEY:
         "OPENAI_API_KEY environment variable is not set. Export it before running this script."
     )
 
-DATA_PATH = Path("/home/pitfa/Documents/explore_unizg/udruge.json")
+DATA_PATH = Path(os.environ.get("ORGANISATIONS_DATA_PATH", PROJECT_ROOT / "udruge.json"))
 EMBED_MODEL = "text-embedding-3-small"
-BATCH_SIZE = 64
 
 client = OpenAI(api_key=OPENAI_API_KEY)
 
 
-def _stringify(value: Any) -> str:
-    if value is None:
-        return ""
-    if isinstance(value, (list, tuple)):
-        # Join elements as strings, ignoring empties
-        return "; ".join([str(x) for x in value if str(x).strip()])
-    if isinstance(value, (dict,)):
-        # Compact JSON form for dictionaries
-        try:
-            return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
-        except Exception:
-            return str(value)
-    return str(value)
-
-
 def build_org_text(record: Dict[str, Any]) -> str:
     parts: List[str] = []
     # Preserve labels similar to faculties script
@@ -84,7 +74,7 @@ def build_org_text(record: Dict[str, Any]) -> str:
     ]
     for json_key, label in field_order:
         raw = record.get(json_key, None)
-        text = _stringify(raw).strip()
+        text = stringify(raw).strip()
         if text:
             parts.append(f"{label}: {text}")
     return "\n".join(parts)
@@ -104,98 +94,21 @@ def load_orgs() -> List[Dict[str, Any]]:
 
 
 def generate_all_embeddings(texts: List[str]) -> List[List[float]]:
-    embeddings: List[List[float]] = []
-    for i in range(0, len(texts), BATCH_SIZE):
-        batch = texts[i : i + BATCH_SIZE]
-        resp = client.embeddings.create(model=EMBED_MODEL, input=batch)
-        batch_embeddings = [item.embedding for item in resp.data]
-        embeddings.extend(batch_embeddings)
-        print(f"Embedded {i + len(batch)}/{len(texts)}")
+    cache = get_embedding_cache()
+    # Only texts missing from the embedding cache reach the API; finished
+    # batches are cached immediately, so an interrupted run resumes on rerun
+    embedder = BatchEmbedder(client, EMBED_MODEL, cache=cache, log=print)
+
+    hits_before, misses_before = cache.hits, cache.misses
+    embeddings = embedder.embed(texts)
     if len(embeddings) != len(texts):
         raise RuntimeError(
             f"Embedding count mismatch. Expected {len(texts)}, got {len(embeddings)}"
         )
+    print(f"Embedding cache: {cache.hits - hits_before} hits, {cache.misses - misses_before} misses")
     return embeddings
 
 
-def upsert_org_with_embedding(record: Dict[str, Any], embedding: List[float]) -> Tuple[Organisation, bool]:
-    # Extract fields with defaults
-    name = _stringify(record.get("name")).strip()
-    abbreviation = _stringify(record.get("abbreviation")).strip()
-    scope = _stringify(record.get("scope")).strip()
-    mission = _stringify(record.get("mission")).strip()
-    domains = record.get("domains") or []
-    core_activities = record.get("core_activities") or []
-    flagship_projects = record.get("flagship_projects") or []
-    target_members = _stringify(record.get("target_members")).strip()
-    affiliations = record.get("affiliations") or []
-    partnerships = record.get("partnerships", None)
-    skills_outcomes = record.get("skills_outcomes") or []
-    keywords = record.get("keywords") or []
-    url = _stringify(record.get("url")).strip()
-    social = record.get("social", None)
-
-    # Upsert policy: prefer abbreviation when present; else fallback to unique name
-    unique_lookup: Dict[str, Any]
-    if abbreviation:
-        unique_lookup = {"abbreviation": abbreviation}
-    else:
-        unique_lookup = {"name": name}
-
-    obj, created = Organisation.objects.get_or_create(
-        **unique_lookup,
-        defaults={
-            "name": name,
-            "abbreviation": abbreviation,
-            "scope": scope,
-            "mission": mission,
-            "domains": domains,
-            "core_activities": core_activities,
-            "flagship_projects": flagship_projects,
-            "target_members": target_members,
-            "affiliations": affiliations,
-            "partnerships": partnerships,
-            "skills_outcomes": skills_outcomes,
-            "keywords": keywords,
-            "url": url,
-            "social": social,
-            "embedding": embedding,
-        },
-    )
-
-    if not created:
-        changed = False
-        # Update scalar and JSON fields
-        updates: Dict[str, Any] = {
-            "name": name,
-            "abbreviation": abbreviation,
-            "scope": scope,
-            "mission": mission,
-            "domains": domains,
-            "core_activities": core_activities,
-            "flagship_projects": flagship_projects,
-            "target_members": target_members,
-            "affiliations": affiliations,
-            "partnerships": partnerships,
-            "skills_outcomes": skills_outcomes,
-            "keywords": keywords,
-            "url": url,
-            "social": social,
-        }
-        for field, value in updates.items():
-            if getattr(obj, field) != value:
-                setattr(obj, field, value)
-                changed = True
-        # Always refresh embedding
-        if obj.embedding != embedding:
-            obj.embedding = embedding
-            changed = True
-        if changed:
-            obj.save()
-
-    return obj, created
-
-
 def main() -> None:
     records = load_orgs()
     prepared: List[OrganisationPrepared] = [
@@ -206,15 +119,14 @@ def main() -> None:
     embeddings: List[List[float]] = generate_all_embeddings(texts)
 
     print("Upserting organisations with embeddings ...")
-    created_count = 0
-    updated_count = 0
-    for item, emb in zip(prepared, embeddings):
-        _, created = upsert_org_with_embedding(item.data, emb)
-        if created:
-            created_count += 1
-        else:
-            updated_count += 1
-    print(f"Done. Created: {created_count}, Updated: {updated_count}")
+    # One snapshot query per lookup field, then bulk INSERT/UPDATE of changed columns only
+    result = bulk_upsert_organisations([{**organisation_row(item.data), "embedding": emb} for item, emb in zip(prepared, embeddings)])
+    changed_ids = result.embedding_changed
+    print(f"Done. {result.summary()} ({result.queries} queries)")
+
+    # Place changed nodes in the graph (falls back to a full rebuild past the drift threshold)
+    if changed_ids and settings.GRAPH_INCREMENTAL_MODE != "off":
+        update_graph_nodes(ORGANISATION, changed_ids, log=print)
 
 
 if __name__ == "__main__":
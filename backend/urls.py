@@ -18,7 +18,16 @@ from django.contrib import admin
 from django.urls import path
 from django.http import HttpResponse
 from openai_integration.views import process_message, embed_student_and_knn
-from graph_integration.views import upsert_faculty, list_faculty_edges, get_faculty, get_organisation, info
+from graph_integration.views import (
+    upsert_faculty,
+    bulk_upsert_faculties,
+    bulk_upsert_organisations,
+    list_faculty_edges,
+    get_faculty,
+    get_organisation,
+    info,
+)
+from jobs.views import jobs, job_status
 
 
 def home(_request):
@@ -29,10 +38,14 @@ urlpatterns = [
     path('api/message/', process_message, name='process_message'),
     path('api/embed-student/', embed_student_and_knn, name='embed_student_and_knn'),
     path('api/faculties/upsert/', upsert_faculty, name='upsert_faculty'),
+    path('api/faculties/bulk-upsert/', bulk_upsert_faculties, name='bulk_upsert_faculties'),
+    path('api/organisations/bulk-upsert/', bulk_upsert_organisations, name='bulk_upsert_organisations'),
     path('api/faculties/edges/', list_faculty_edges, name='list_faculty_edges'),
     path('api/faculties/get/', get_faculty, name='get_faculty'),
     path('api/organisations/get/', get_organisation, name='get_organisation'),
     path('api/info/', info, name='info'),
+    path('api/jobs/', jobs, name='jobs'),
+    path('api/jobs/<int:job_id>/', job_status, name='job_status'),
     path('admin/', admin.site.urls),
 ]
 
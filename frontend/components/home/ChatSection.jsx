@@ -5,7 +5,7 @@ import { motion, AnimatePresence } from "motion/react";
 import CardSpotlight from "@/components/ui/CardSpotlight";
 import { useToast } from "@/components/ui/Toast";
 import Tooltip from "@/components/ui/Tooltip";
-import { processMessage, embedStudentAndKnn } from "@/lib/api/chat";
+import { streamMessage, embedStudentAndKnn } from "@/lib/api/chat";
 import { getStudentId, setStudentId, clearStudentId } from "@/lib/storage";
 
 export default function ChatSection() {
@@ -95,7 +95,24 @@ export default function ChatSection() {
     setIsSending(true);
     try {
       const currentId = getStudentId();
-      const { answer, studentId } = await processMessage({ text: trimmed, studentId: currentId ?? undefined });
+      let streamed = false;
+      const { answer, studentId } = await streamMessage({
+        text: trimmed,
+        studentId: currentId ?? undefined,
+        onStart: (id) => {
+          if (id != null) setStudentId(id);
+        },
+        // Grow the assistant bubble as chunks arrive
+        onDelta: (chunk) => {
+          const first = !streamed;
+          streamed = true;
+          setMessages((prev) =>
+            first
+              ? [...prev, { text: chunk, sender: "assistant" }]
+              : [...prev.slice(0, -1), { ...prev[prev.length - 1], text: prev[prev.length - 1].text + chunk }]
+          );
+        },
+      });
 
       // Persist/refresh student id
       if (studentId != null) {
@@ -103,7 +120,12 @@ export default function ChatSection() {
       }
 
       if (answer && answer.trim()) {
-        setMessages((prev) => [...prev, { text: answer, sender: "assistant" }]);
+        // Final saved answer replaces the streamed text
+        setMessages((prev) =>
+          streamed
+            ? [...prev.slice(0, -1), { ...prev[prev.length - 1], text: answer }]
+            : [...prev, { text: answer, sender: "assistant" }]
+        );
       } else {
         showToast("Agent još nema odgovor.", "info");
       }
@@ -40,6 +40,89 @@ export async function processMessage({ text, studentId }) {
 }
 
 
+function parseSseEvent(raw) {
+	let event = "message";
+	const data = [];
+	for (const line of raw.split("\n")) {
+		if (line.startsWith("event:")) event = line.slice(6).trim();
+		else if (line.startsWith("data:")) data.push(line.slice(5).trimStart());
+	}
+	let payload = null;
+	try {
+		payload = data.length ? JSON.parse(data.join("\n")) : null;
+	} catch {
+		payload = null;
+	}
+	return { event, payload };
+}
+
+// Streaming variant of processMessage: calls onDelta(text) for each chunk
+// of the reply as it arrives and resolves with the final answer.
+export async function streamMessage({ text, studentId, onStart, onDelta }) {
+	const base = getBaseUrl();
+	const url = `${base}/api/message/`;
+
+	const body = { text: String(text ?? "").trim(), stream: true };
+	if (studentId != null) {
+		body.student_id = studentId;
+	}
+
+	const resp = await fetch(url, {
+		method: "POST",
+		headers: {
+			"Content-Type": "application/json",
+			Accept: "text/event-stream",
+		},
+		body: JSON.stringify(body),
+	});
+
+	if (!resp.ok || !resp.body) {
+		const isJson = resp.headers.get("content-type")?.includes("application/json");
+		const data = isJson ? await resp.json() : null;
+		const message = data?.error || `Request failed with status ${resp.status}`;
+		const error = new Error(message);
+		error.status = resp.status;
+		error.payload = data;
+		throw error;
+	}
+
+	const reader = resp.body.getReader();
+	const decoder = new TextDecoder();
+	let buffer = "";
+	let result = null;
+	for (;;) {
+		const { value, done } = await reader.read();
+		if (done) break;
+		buffer += decoder.decode(value, { stream: true });
+		let sep;
+		while ((sep = buffer.indexOf("\n\n")) !== -1) {
+			const { event, payload } = parseSseEvent(buffer.slice(0, sep));
+			buffer = buffer.slice(sep + 2);
+			if (event === "start") {
+				onStart?.(payload?.student_id ?? null);
+			} else if (event === "delta" && typeof payload?.text === "string") {
+				onDelta?.(payload.text);
+			} else if (event === "done") {
+				result = {
+					answer: typeof payload?.answer === "string" ? payload.answer : "",
+					studentId: payload?.student_id ?? null,
+				};
+			} else if (event === "error") {
+				const error = new Error(payload?.error || "Stream error");
+				error.status = 500;
+				error.payload = payload;
+				throw error;
+			}
+		}
+	}
+	if (!result) {
+		const error = new Error("Stream ended unexpectedly");
+		error.status = 500;
+		throw error;
+	}
+	return result;
+}
+
 export async function embedStudentAndKnn({ studentId, name }) {
 	const base = getBaseUrl();
 	const url = `${base}/api/embed-student/`;